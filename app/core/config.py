@@ -1,7 +1,7 @@
 import logging
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -56,6 +56,9 @@ except ImportError:
 # ⚙️ Application Settings
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Runtime for a Hugging Face model; see app/services/model_backends.py
+ModelBackend = Literal["torch", "torch-dynamic-int8", "onnxruntime"]
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -81,16 +84,66 @@ class Settings(BaseSettings):
     # NLP models
     SPACY_MODEL_ID: str = "en_core_web_sm"
     SENTENCE_TRANSFORMER_MODEL_ID: str = "sentence-transformers/all-MiniLM-L6-v2"
-    SENTENCE_TRANSFORMER_BATCH_SIZE: int = 2
+    SENTENCE_TRANSFORMER_BATCH_SIZE: int = 32
+    # Synonym ranking: "accurate" re-encodes the sentence for every candidate;
+    # "fast" scores candidates against precomputed word vectors and re-encodes
+    # only the best SYNONYM_FAST_RERANK_K per word
+    SYNONYM_RANKING: Literal["accurate", "fast"] = "accurate"
+    SYNONYM_FAST_RERANK_K: int = 3
 
     GRAMMAR_MODEL_ID: str = "vennify/t5-base-grammar-correction"
-    GRAMMAR_MODEL_MAX_LENGTH: int = 512
+    GRAMMAR_MODEL_MAX_LENGTH: int = 512  # Upper bound on new tokens per sentence
     GRAMMAR_MODEL_NUM_BEAMS: int = 4
+    # Adaptive decoding: max new tokens from the input's length bucket, greedy
+    # decoding once this many sentences are already queued for the model
+    GRAMMAR_ADAPTIVE_DECODING: bool = True
+    GRAMMAR_LENGTH_BUCKETS: List[int] = [16, 32, 64, 128]
+    GRAMMAR_GREEDY_QUEUE_DEPTH: int = 32
+    GRAMMAR_BATCH_SIZE: int = 8
+    GRAMMAR_BATCH_MAX_WAIT_MS: float = 15.0
+    # Sentences scoring below the threshold are treated as clean and skip the model
+    # (tune with: python -m app.utils.grammar_prefilter). Off by default: on the
+    # bundled corpus no threshold gets the miss rate near zero (17.5% at 0.5,
+    # 22.5% at 1.0), so enabling it trades correctness for throughput
+    GRAMMAR_PREFILTER_ENABLED: bool = False
+    GRAMMAR_PREFILTER_THRESHOLD: float = 1.0
     PARAPHRASE_MODEL_ID: str = "humarin/chatgpt_paraphraser_on_T5_base"
+    # Sentences are sent to the paraphraser this many at a time; the encoder
+    # outputs of recent sentences are kept so asking for more variants skips the encoder
+    PARAPHRASE_BATCH_SIZE: int = 4
+    PARAPHRASE_ENCODER_CACHE_SIZE: int = 64
+    PARAPHRASE_MAX_VARIANTS: int = 10
     TONE_MODEL_ID: str = "boltuix/NeuroFeel"
     TONE_CONFIDENCE_THRESHOLD: float = 10
     TRANSLATION_MODEL_ID: str = "Helsinki-NLP/opus-mt-en-ROMANCE"
 
+    # Per-model backend. ONNX exports are cached under MODELS_DIR, int8 models are
+    # quantized at load, and any conversion failure falls back to torch
+    # ("onnxruntime" needs optimum[onnxruntime])
+    GRAMMAR_MODEL_BACKEND: ModelBackend = "torch"
+    PARAPHRASE_MODEL_BACKEND: ModelBackend = "torch"
+    TONE_MODEL_BACKEND: ModelBackend = "torch"
+    TRANSLATION_MODEL_BACKEND: ModelBackend = "torch"
+
+    # Batched inference (defaults for every HF model without its own settings)
+    INFERENCE_MAX_BATCH_SIZE: int = 8
+    INFERENCE_MAX_WAIT_MS: float = 10.0
+    INFERENCE_MAX_CONCURRENCY: int = 1
+
+    # Model serving: "local" loads models in each worker, "host" forwards
+    # batches to the shared model-host process (python -m app.services.model_host).
+    # The auth key has no default and must be shared by the host and its workers
+    # (the Docker image generates one per container). While the host can't be
+    # reached, workers run batches on their own copy of the model if
+    # MODEL_HOST_LOCAL_FALLBACK is on, retrying the host after MODEL_HOST_RETRY_SECONDS
+    MODEL_SERVING_MODE: str = "local"
+    MODEL_HOST_SOCKET: str = str(APP_DATA_ROOT_DIR / "model_host.sock")
+    MODEL_HOST_AUTHKEY: Optional[str] = None
+    MODEL_HOST_POOL_SIZE: int = 4
+    MODEL_HOST_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    MODEL_HOST_LOCAL_FALLBACK: bool = True
+    MODEL_HOST_RETRY_SECONDS: float = 30.0
+
     WORDNET_NLTK_ID: str = "/corpora/wordnet" # todo: make sure to unzip later
 
     SUPPORTED_TRANSLATION_LANGUAGES: List[str] = [
@@ -104,6 +157,27 @@ class Settings(BaseSettings):
 
     # Data dirs
     INCLUSIVE_RULES_DIR: str = "app/data/en"
+    INCLUSIVE_RULE_PACK_PATH: str = str(MODELS_DIR / "inclusive_rules.pack")
+    SYNONYM_INDEX_PATH: str = str(MODELS_DIR / "synonym_index.sqlite")
+    WORD_FREQUENCY_PATH: str = str(NLTK_DATA_DIR / "brown_word_freq.npy")
+    WORD_EMBEDDING_INDEX_DIR: str = str(MODELS_DIR / "word_embeddings")
+
+    # Threads for blocking analyzer work (spaCy parses, scoring); work left
+    # behind by a timed-out analyzer can never use more than this
+    ANALYZER_WORKER_THREADS: int = 4
+
+    # Rule hot reload: how often rule files are checked for changes
+    RULE_HOT_RELOAD: bool = True
+    RULE_RELOAD_POLL_SECONDS: float = 5.0
+
+    # Caching
+    SENTENCE_CACHE_MAX_ENTRIES: int = 5000
+    # Memory for cached sentence-transformer vectors, per model (stored as float16)
+    EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Document sessions (kept in memory, per worker)
+    DOCUMENT_SESSION_MAX_SESSIONS: int = 500
+    DOCUMENT_SESSION_TTL_SECONDS: int = 1800
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 📦 App-wide constants
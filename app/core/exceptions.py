@@ -50,4 +50,10 @@ class ModelDownloadFailedError(ServiceError):
             model_id=model_id,
             feature_name=feature_name
         )
-        self.original_error = original_error
\ No newline at end of file
+        self.original_error = original_error
+
+
+class ModelHostUnavailableError(ServiceError):
+    """Raised when an HTTP worker can't reach the model-host process."""
+    def __init__(self, detail: str):
+        super().__init__(status_code=503, detail=detail, error_type="ModelHostUnavailable")
@@ -19,7 +19,8 @@ from app.core.exceptions import ServiceError, ModelNotDownloadedError # Import c
 
 from app.routers import (
     grammar, tone, voice, inclusive_language,
-    readability, paraphrase, translate, synonyms, rewrite, analyze
+    readability, paraphrase, translate, synonyms, rewrite, analyze, metrics,
+    documents
 )
 
 # Configure logging at the very beginning
@@ -81,9 +82,11 @@ for router, tag in [
     (readability.router, "Readability"),
     (rewrite.router, "Rewrite"),
     (analyze.router, "Analyze"),
+    (documents.router, "Documents"),
     (paraphrase.router, "Paraphrasing"),
     (translate.router, "Translation"),
-    (synonyms.router, "Synonyms")
+    (synonyms.router, "Synonyms"),
+    (metrics.router, "Metrics")
 ]:
     app.include_router(router, tags=[tag])
 
@@ -1,15 +1,25 @@
+import json
 import logging
 import asyncio
+import threading
 import time
+from collections import Counter
 from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status
-from app.schemas.base import TextOnlyRequest
+from fastapi.responses import StreamingResponse
+from app.schemas.base import AnalyzeRequest, AnalyzerOptions
 from app.services.grammar import GrammarCorrector
 from app.services.tone_classification import ToneClassifier
 from app.services.inclusive_language import InclusiveLanguageChecker
 from app.services.voice_detection import VoiceDetector
 from app.services.readability import ReadabilityScorer
 from app.services.synonyms import SynonymSuggester
+from app.utils.analysis_context import AnalysisContext, build_analysis_context
+from app.utils.batching import current_priority
+from app.utils.cancellation import current_cancel_event
+from app.utils.grammar_utils import rebase_issue
+from app.utils.line_index import LineIndex
 from app.core.security import verify_api_key
 from app.core.config import APP_NAME
 from app.core.exceptions import ServiceError, ModelNotDownloadedError
@@ -20,6 +30,18 @@ logger = logging.getLogger(f"{APP_NAME}.routers.analyze")
 # Define router
 router = APIRouter(prefix="/analyze", tags=["Analysis"])
 
+# Upper bound on any single analyzer's run time
+ANALYZER_TIMEOUT_SECONDS = 30
+
+# Every analyzer /analyze can run, in response order
+ANALYZERS = ("grammar", "tone", "inclusive_language", "voice", "readability", "synonyms")
+
+# Analyzers that read the shared spaCy parse
+CONTEXT_ANALYZERS = {"grammar", "inclusive_language", "voice", "readability", "synonyms"}
+
+# Analyzers that return what they have when their budget runs out, instead of timing out
+PARTIAL_ANALYZERS = {"grammar"}
+
 # Initialize service instances at module level for reuse across requests
 grammar_service = GrammarCorrector()
 tone_service = ToneClassifier()
@@ -49,20 +71,161 @@ def format_error_response(error: Exception, error_type: str, message: str, **kwa
         **kwargs
     }
 
+def format_analysis_result(key: str, result: Any) -> dict:
+    """
+    Turns a service's return value or exception into the per-analyzer entry
+    used in every /analyze response.
+    """
+    if isinstance(result, Exception):
+        if isinstance(result, asyncio.TimeoutError):
+            return format_error_response(
+                result,
+                error_type="TimeoutError",
+                message=str(result)
+            )
+        elif isinstance(result, ModelNotDownloadedError):
+            return format_error_response(
+                result,
+                error_type="ModelNotDownloaded",
+                message=result.detail,
+                model_id=result.model_id,
+                feature_name=result.feature_name
+            )
+        elif isinstance(result, ServiceError):
+            return format_error_response(
+                result,
+                error_type=result.error_type,
+                message=result.detail
+            )
+        else:
+            return format_error_response(
+                result,
+                error_type="InternalServiceError",
+                message=f"An unexpected error occurred: {str(result)}"
+            )
+
+    if not isinstance(result, dict):
+        logger.error(f"Service '{key}' returned non-dict result: {type(result)}")
+        return format_error_response(
+            None,
+            error_type="InvalidServiceResponse",
+            message=f"Service '{key}' returned an invalid response type."
+        )
+    return {"status": "partial" if result.get("partial") else "success", "data": result}
+
+
+def selected_analyzers(payload: AnalyzeRequest) -> List[str]:
+    """Returns the requested analyzers in response order; all of them when none are named."""
+    if not payload.analyzers:
+        return list(ANALYZERS)
+    return [key for key in ANALYZERS if key in payload.analyzers]
+
+
+def analyzer_options(payload: AnalyzeRequest, key: str) -> AnalyzerOptions:
+    return payload.options.get(key) or AnalyzerOptions()
+
+
+def analyzer_timeout(key: str, options: AnalyzerOptions) -> float:
+    """
+    Hard timeout for an analyzer. Analyzers that can return partial results
+    enforce their budget themselves and keep the default ceiling here.
+    """
+    if options.budget_ms is None or key in PARTIAL_ANALYZERS:
+        return ANALYZER_TIMEOUT_SECONDS
+    return min(options.budget_ms / 1000, ANALYZER_TIMEOUT_SECONDS)
+
+
+async def build_shared_context(text: str) -> Optional[AnalysisContext]:
+    """
+    Parses once and shares the Doc with every spaCy-based analyzer.
+    If the shared parse fails, each service falls back to parsing on its own.
+    """
+    try:
+        return await build_analysis_context(text)
+    except Exception as e:
+        logger.error(f"Failed to build shared analysis context: {e}", exc_info=True)
+        return None
+
+
+def build_analysis_tasks(
+    text: str,
+    context: Optional[AnalysisContext],
+    payload: AnalyzeRequest,
+    sentence_frames: Optional[asyncio.Queue] = None
+) -> Dict[str, Awaitable]:
+    """
+    Creates one coroutine per selected analyzer. When `sentence_frames` is
+    given, grammar also publishes a sentence frame per corrected sentence to
+    that queue.
+    """
+    grammar_budget = analyzer_options(payload, "grammar").budget_ms
+    factories = {
+        "grammar": lambda: (
+            stream_grammar_sentences(text, context, sentence_frames)
+            if sentence_frames is not None
+            else grammar_service.correct(
+                text, context=context, budget_s=grammar_budget / 1000 if grammar_budget else None
+            )
+        ),
+        "tone": lambda: tone_service.classify(text),
+        "inclusive_language": lambda: inclusive_service.check(text, context=context),
+        "voice": lambda: voice_service.classify(text, context=context),
+        "readability": lambda: readability_service.compute(text, context=context),
+        "synonyms": lambda: synonyms_service.suggest(text, context=context),
+    }
+    return {key: factories[key]() for key in selected_analyzers(payload)}
+
+
+def run_options(payload: AnalyzeRequest, key: str) -> Dict[str, Any]:
+    """Keyword arguments for run_analyzer from the request's per-analyzer options."""
+    options = analyzer_options(payload, key)
+    return {"timeout": analyzer_timeout(key, options), "priority": options.priority}
+
+
+async def run_analyzer(
+    key: str, coro: Awaitable, timeout: float = ANALYZER_TIMEOUT_SECONDS, priority: int = 0
+) -> Tuple[str, Any]:
+    """
+    Runs one analyzer with timing and error capture. Returns (key, result or exception).
+    On timeout the analyzer is cancelled, which also withdraws its queued model work,
+    and its cancel event is set so worker-thread work stops at its next checkpoint.
+    """
+    start_time = time.time()
+    # Model calls made by this analyzer are queued at its priority
+    current_priority.set(priority)
+    cancel_event = threading.Event()
+    current_cancel_event.set(cancel_event)
+    try:
+        result = await asyncio.wait_for(coro, timeout=timeout)
+        return key, result
+    except asyncio.TimeoutError:
+        return key, asyncio.TimeoutError(f"Analysis for '{key}' timed out after {timeout} seconds")
+    except Exception as e:
+        return key, e
+    finally:
+        # Whatever the outcome, nothing this analyzer started should keep running
+        cancel_event.set()
+        end_time = time.time()
+        logger.info(f"Analysis for '{key}' completed in {end_time - start_time:.2f} seconds")
+
+
 @router.post("/", dependencies=[Depends(verify_api_key)])
-async def analyze_text_endpoint(payload: TextOnlyRequest):
+async def analyze_text_endpoint(payload: AnalyzeRequest):
     """
     Performs a comprehensive analysis of the provided text, including grammar correction,
     tone classification, inclusive language checking, voice detection, readability scoring,
     and synonym suggestions.
 
     Args:
-        payload (TextOnlyRequest): Request body containing the text to analyze.
+        payload (AnalyzeRequest): Request body containing the text to analyze and,
+            optionally, which analyzers to run and a latency budget (`budget_ms`)
+            and queue `priority` per analyzer.
 
     Returns:
         dict: A dictionary with an 'analysis_results' key containing results for each analysis.
               Each result follows this structure:
               - Successful analysis: {"status": "success", "data": {...}}
+              - Budget ran out, partial data: {"status": "partial", "data": {..., "partial": true}}
               - Failed analysis: {"status": "error", "error_type": "...", "message": "...", "timestamp": "...", ...}
 
     Raises:
@@ -74,77 +237,114 @@ async def analyze_text_endpoint(payload: TextOnlyRequest):
 
     logger.info(f"Received comprehensive analysis request for text (first 50 chars): '{text[:50]}...'")
 
-    # Define analysis tasks
-    tasks = {
-        "grammar": grammar_service.correct(text),
-        "tone": tone_service.classify(text),
-        "inclusive_language": inclusive_service.check(text),
-        "voice": voice_service.classify(text),
-        "readability": readability_service.compute(text),
-        "synonyms": synonyms_service.suggest(text),
-    }
-
-    results = {}
-    coroutine_tasks = []
-
-    # Wrap each task with timing and error handling
-    for key, coro in tasks.items():
-        async def wrapped_coro(key=key, coro=coro, timeout=30):
-            start_time = time.time()
-            try:
-                result = await asyncio.wait_for(coro, timeout=timeout)
-                return key, result
-            except asyncio.TimeoutError:
-                return key, asyncio.TimeoutError(f"Analysis for '{key}' timed out after {timeout} seconds")
-            except Exception as e:
-                return key, e
-            finally:
-                end_time = time.time()
-                logger.info(f"Analysis for '{key}' completed in {end_time - start_time:.2f} seconds")
-        coroutine_tasks.append(wrapped_coro())
+    context = await build_shared_context(text) if CONTEXT_ANALYZERS.intersection(selected_analyzers(payload)) else None
+    tasks = build_analysis_tasks(text, context, payload)
 
     # Execute all tasks concurrently
-    raw_results = await asyncio.gather(*coroutine_tasks)
-
-    # Process results
-    for key, result in raw_results:
-        if isinstance(result, Exception):
-            if isinstance(result, asyncio.TimeoutError):
-                results[key] = format_error_response(
-                    result,
-                    error_type="TimeoutError",
-                    message=str(result)
-                )
-            elif isinstance(result, ModelNotDownloadedError):
-                results[key] = format_error_response(
-                    result,
-                    error_type="ModelNotDownloaded",
-                    message=result.detail,
-                    model_id=result.model_id,
-                    feature_name=result.feature_name
-                )
-            elif isinstance(result, ServiceError):
-                results[key] = format_error_response(
-                    result,
-                    error_type=result.error_type,
-                    message=result.detail
-                )
-            else:
-                results[key] = format_error_response(
-                    result,
-                    error_type="InternalServiceError",
-                    message=f"An unexpected error occurred: {str(result)}"
-                )
-        else:
-            if not isinstance(result, dict):
-                logger.error(f"Service '{key}' returned non-dict result: {type(result)}")
-                results[key] = format_error_response(
-                    None,
-                    error_type="InvalidServiceResponse",
-                    message=f"Service '{key}' returned an invalid response type."
-                )
-            else:
-                results[key] = {"status": "success", "data": result}
+    raw_results = await asyncio.gather(*(
+        run_analyzer(key, coro, **run_options(payload, key)) for key, coro in tasks.items()
+    ))
+
+    results = {key: format_analysis_result(key, result) for key, result in raw_results}
 
     logger.info(f"Comprehensive analysis complete for text (first 50 chars): '{text[:50]}...'")
-    return {"analysis_results": results}
\ No newline at end of file
+    return {"analysis_results": results}
+
+
+@router.post("/stream", dependencies=[Depends(verify_api_key)])
+async def analyze_text_stream_endpoint(payload: AnalyzeRequest, per_sentence: bool = False):
+    """
+    Streaming variant of the comprehensive analysis. Responds with NDJSON, one
+    frame per line, as each analyzer finishes, so fast analyzers are not held
+    back by slow ones:
+
+        {"analyzer": "voice", "status": "success", "data": {...}}
+        {"analyzer": "grammar", "status": "error", "error_type": "...", ...}
+
+    With `per_sentence=true`, grammar also emits a frame for every sentence as
+    it is corrected, before its final frame:
+
+        {"analyzer": "grammar", "frame": "sentence", "status": "success", "data": {...}}
+
+    A final frame has status "partial" only when the analyzer's budget ran out
+    and it returned what it had. The stream ends with
+    {"analyzer": null, "status": "complete"}.
+
+    Analyzer selection, budgets and priorities work as for POST /analyze/.
+    """
+    text = payload.text.strip()
+    if not text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Input text cannot be empty.")
+
+    logger.info(f"Received streaming analysis request for text (first 50 chars): '{text[:50]}...'")
+
+    async def frames() -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        needs_context = CONTEXT_ANALYZERS.intersection(selected_analyzers(payload))
+        context = await build_shared_context(text) if needs_context else None
+        tasks = build_analysis_tasks(text, context, payload, sentence_frames=queue if per_sentence else None)
+
+        async def run_and_publish(key: str, coro: Awaitable) -> None:
+            options = run_options(payload, key)
+            budget_ms = analyzer_options(payload, key).budget_ms
+            if per_sentence and key == "grammar" and budget_ms:
+                # Streamed sentences are already delivered, so the budget is a hard stop here
+                options["timeout"] = min(budget_ms / 1000, ANALYZER_TIMEOUT_SECONDS)
+            key, result = await run_analyzer(key, coro, **options)
+            await queue.put({"analyzer": key, **format_analysis_result(key, result)})
+
+        running = [asyncio.ensure_future(run_and_publish(key, coro)) for key, coro in tasks.items()]
+        try:
+            remaining = len(running)
+            while remaining:
+                frame = await queue.get()
+                # Every analyzer sends exactly one final frame, after any sentence frames
+                if frame.get("frame") != "sentence":
+                    remaining -= 1
+                yield json.dumps(frame, default=str) + "\n"
+            yield json.dumps({"analyzer": None, "status": "complete"}) + "\n"
+        finally:
+            # Client disconnected or stream finished: stop anything still running
+            for task in running:
+                task.cancel()
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+async def stream_grammar_sentences(text: str, context: Optional[AnalysisContext], queue: asyncio.Queue) -> dict:
+    """
+    Grammar correction that publishes a sentence frame per sentence as it
+    completes, then returns the same result as GrammarCorrector.correct.
+    """
+    segments = grammar_service._segments(text, context)
+    line_index = LineIndex(text)
+    sentence_results: Dict[int, Tuple[str, List[dict]]] = {}
+    rules = grammar_service.rules
+    decoding_log: Counter = Counter()
+
+    async for idx, seg, corrected, issues in grammar_service.iter_sentence_results(
+        segments, use_spans=context is not None, rules=rules, decoding_log=decoding_log
+    ):
+        rebased = [rebase_issue(issue, seg.start, text, line_index) for issue in issues]
+        sentence_results[idx] = (corrected, rebased)
+        await queue.put({
+            "analyzer": "grammar",
+            "frame": "sentence",
+            "status": "success",
+            "data": {
+                "sentence_index": idx,
+                "offset": seg.start,
+                "original_sentence": seg.text,
+                "corrected_sentence": corrected,
+                "issues": rebased,
+            }
+        })
+
+    corrected_sentences = [sentence_results.get(idx, (seg.text, []))[0] for idx, seg in enumerate(segments)]
+    return {
+        "original_text": text,
+        "corrected_text_suggestion": "".join(corrected_sentences).strip(),
+        "issues": [issue for idx in sorted(sentence_results) for issue in sentence_results[idx][1]],
+        "rule_version": rules.version,
+        "decoding": grammar_service.decoding_summary(decoding_log)
+    }
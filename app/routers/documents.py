@@ -0,0 +1,45 @@
+# app/routers/documents.py
+import logging
+from fastapi import APIRouter, Depends, status
+
+from app.schemas.base import TextOnlyRequest, DocumentEditRequest
+from app.services.document_session import DocumentSessionManager
+from app.core.security import verify_api_key
+from app.core.config import APP_NAME
+
+logger = logging.getLogger(f"{APP_NAME}.routers.documents")
+
+router = APIRouter(prefix="/documents", tags=["Documents"])
+
+# Sessions are held in memory by this instance, so it must live as long as the app
+document_sessions = DocumentSessionManager()
+
+
+@router.post("", dependencies=[Depends(verify_api_key)])
+async def create_document_endpoint(payload: TextOnlyRequest):
+    """
+    Opens an editing session for a document and returns its grammar analysis
+    together with the `document_id` to send subsequent edits to.
+    """
+    logger.info(f"Opening document session for text of {len(payload.text)} chars")
+    return await document_sessions.create(payload.text)
+
+
+@router.patch("/{document_id}", dependencies=[Depends(verify_api_key)])
+async def edit_document_endpoint(document_id: str, payload: DocumentEditRequest):
+    """
+    Applies text edits to a document session and returns the updated analysis.
+
+    Each edit replaces [start, end) with `text`, in the coordinates left by the
+    previous edit. Only sentences that changed are re-analyzed. When
+    `base_version` is given and the session has moved on, responds with 409.
+    A 404 means the session expired or lives on another worker; open a new one.
+    """
+    edits = [(edit.start, edit.end, edit.text) for edit in payload.edits]
+    return await document_sessions.edit(document_id, edits, base_version=payload.base_version)
+
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_api_key)])
+async def delete_document_endpoint(document_id: str):
+    """Closes a document session."""
+    document_sessions.delete(document_id)
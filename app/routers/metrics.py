@@ -0,0 +1,31 @@
+# app/routers/metrics.py
+import logging
+from fastapi import APIRouter, Depends
+
+from app.core.security import verify_api_key
+from app.core.config import APP_NAME
+from app.services.base import spacy_model_registry
+from app.services.grammar import grammar_prefilter
+from app.services.inference import get_inference_engine_stats
+from app.services.rule_registry import rule_registry
+from app.utils.sentence_cache import get_sentence_cache_stats
+from app.utils.embedding_cache import get_embedding_cache_stats
+
+logger = logging.getLogger(f"{APP_NAME}.routers.metrics")
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/", dependencies=[Depends(verify_api_key)])
+async def metrics_endpoint():
+    """
+    Reports in-process model and cache statistics for this worker.
+    """
+    return {
+        "spacy_models": spacy_model_registry.stats(),
+        "sentence_caches": get_sentence_cache_stats(),
+        "embedding_caches": get_embedding_cache_stats(),
+        "inference_engines": get_inference_engine_stats(),
+        "rule_sets": rule_registry.stats(),
+        "grammar_prefilter": grammar_prefilter.stats(),
+    }
@@ -2,7 +2,7 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status # Import HTTPException and status for validation
 
-from app.schemas.base import TextOnlyRequest
+from app.schemas.base import ParaphraseRequest
 from app.services.paraphrase import Paraphraser # Import the service class
 from app.core.security import verify_api_key
 from app.core.config import APP_NAME # For logger naming
@@ -17,9 +17,11 @@ paraphraser_service = Paraphraser()
 
 
 @router.post("/generate", dependencies=[Depends(verify_api_key)])
-async def paraphrase_text_endpoint(payload: TextOnlyRequest):
+async def paraphrase_text_endpoint(payload: ParaphraseRequest):
     """
-    Generates a paraphrase for the provided text.
+    Generates a paraphrase for the provided text. With `return_multiple`, each
+    sentence gets `num_variants` alternatives; send a single sentence again
+    with a higher `num_variants` to get more alternatives for just that one.
     """
     text = payload.text.strip()
     if not text:
@@ -31,7 +33,9 @@ async def paraphrase_text_endpoint(payload: TextOnlyRequest):
         # Directly call the async service method
         # ModelNotDownloadedError will be raised here if model is missing,
         # and caught by the global exception handler in app/main.py
-        result = await paraphraser_service.paraphrase(text)
+        result = await paraphraser_service.paraphrase(
+            text, return_multiple=payload.return_multiple, num_variants=payload.num_variants
+        )
 
         logger.info(f"Paraphrasing successful for text (first 50 chars): '{text[:50]}...'")
         return {"paraphrase": result} # Consistent key for response
@@ -20,6 +20,13 @@ readability_scorer_service = ReadabilityScorer()
 async def readability_score_endpoint(payload: TextOnlyRequest):
     """
     Computes various readability scores for the provided text.
+
+    `detailed_scores` holds Flesch reading ease, Flesch-Kincaid grade, Gunning
+    Fog, SMOG and Coleman-Liau for the whole text. Each entry in
+    `readability_issues` carries the same scores for its sentence, except SMOG,
+    which needs at least three sentences. Gunning Fog counts every word of three
+    or more syllables as complex; proper nouns and words that reach three
+    syllables through a suffix (-es, -ed, -ing) are not excluded.
     """
     text = payload.text.strip()
     if not text:
@@ -3,7 +3,7 @@ import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from functools import lru_cache
 
-from app.schemas.base import TextOnlyRequest
+from app.schemas.base import SynonymRequest
 from app.services.synonyms import SynonymSuggester # Import the service class
 from app.core.security import verify_api_key
 from app.core.config import APP_NAME
@@ -27,11 +27,12 @@ def get_synonym_suggester_service() -> SynonymSuggester:
 
 @router.post("/suggest", dependencies=[Depends(verify_api_key)])
 async def suggest_synonyms_endpoint(
-    payload: TextOnlyRequest,
+    payload: SynonymRequest,
     synonym_suggester_service: SynonymSuggester = Depends(get_synonym_suggester_service)
 ):
     """
-    Suggests synonyms for words in the provided text.
+    Suggests synonyms for words in the provided text. `ranking` picks the
+    "accurate" or "fast" ranking mode (defaults to the SYNONYM_RANKING setting).
     """
     text = payload.text.strip()
     if not text:
@@ -40,7 +41,7 @@ async def suggest_synonyms_endpoint(
     logger.info(f"Received synonym suggestion request for text (first 50 chars): '{text[:50]}...'")
 
     try:
-        result = await synonym_suggester_service.suggest(text)
+        result = await synonym_suggester_service.suggest(text, ranking=payload.ranking)
 
         logger.info(f"Synonym suggestion successful for text (first 50 chars): '{text[:50]}...'")
         return {"synonyms": result}
@@ -1,8 +1,28 @@
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
+from app.core.config import settings
+
+AnalyzerName = Literal["grammar", "tone", "inclusive_language", "voice", "readability", "synonyms"]
+
 class TextOnlyRequest(BaseModel):
     text: str = Field(..., example="Your input text here")
 
+class AnalyzerOptions(BaseModel):
+    budget_ms: Optional[int] = Field(None, gt=0, example=1500)
+    priority: int = Field(0, ge=-10, le=10, example=1)
+
+class AnalyzeRequest(TextOnlyRequest):
+    analyzers: Optional[List[AnalyzerName]] = Field(None, example=["grammar", "readability"])
+    options: Dict[AnalyzerName, AnalyzerOptions] = Field(default_factory=dict, example={"grammar": {"budget_ms": 1500, "priority": 1}})
+
+class ParaphraseRequest(TextOnlyRequest):
+    return_multiple: bool = Field(False, example=True)
+    num_variants: Optional[int] = Field(None, ge=1, le=settings.PARAPHRASE_MAX_VARIANTS, example=3)
+
+class SynonymRequest(TextOnlyRequest):
+    ranking: Optional[Literal["accurate", "fast"]] = Field(None, example="fast")
+
 class RewriteRequest(BaseModel):
     text: str = Field(..., example="Your input text here")
     instruction: str = Field(..., example="Rewrite this more concisely")
@@ -10,4 +30,14 @@ class RewriteRequest(BaseModel):
 
 class TranslateRequest(BaseModel):
     text: str = Field(..., example="Translate this")
-    target_lang: str = Field(..., example="fr")
\ No newline at end of file
+    target_lang: str = Field(..., example="fr")
+
+
+class TextEdit(BaseModel):
+    start: int = Field(..., ge=0, example=0)
+    end: int = Field(..., ge=0, example=4)
+    text: str = Field("", example="That")
+
+class DocumentEditRequest(BaseModel):
+    edits: List[TextEdit] = Field(..., min_length=1)
+    base_version: Optional[int] = Field(None, example=3)
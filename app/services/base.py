@@ -1,7 +1,8 @@
 import logging
+import threading
 import time
 from functools import lru_cache
-from typing import Tuple, Optional
+from typing import Any, Dict, Tuple, Optional
 
 import torch
 from transformers import (
@@ -22,6 +23,7 @@ from app.core.config import (
 )
 from app.core.config import settings
 from app.core.exceptions import ModelNotDownloadedError
+from app.services.model_backends import load_model_with_backend
 
 logger = logging.getLogger(__name__)
 
@@ -29,22 +31,117 @@ logger = logging.getLogger(__name__)
 # 🧠 SpaCy Loader
 # ───────────────────────────────────────────────────────────────
 
-@lru_cache(maxsize=1)
-def load_spacy_model(model_id: str = SPACY_MODEL_ID, disable: Optional[Tuple[str, ...]] = None):
-    import spacy
-    from spacy.util import is_package
+class SpacyPipelineView:
+    """
+    A component-restricted view over a shared spaCy pipeline.
+    Calls run the full model with some components skipped, so callers that only
+    need e.g. sentence boundaries don't force a second copy of the model.
+    """
+
+    def __init__(self, nlp, disable: Tuple[str, ...]):
+        self._nlp = nlp
+        # Only pass through components the pipeline actually has
+        self.disable = [name for name in disable if name in nlp.pipe_names]
+
+    def __call__(self, text: str):
+        return self._nlp(text, disable=self.disable)
+
+    def pipe(self, texts, **kwargs):
+        kwargs.setdefault("disable", self.disable)
+        return self._nlp.pipe(texts, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._nlp, name)
+
+
+class SpacyModelRegistry:
+    """
+    Loads each spaCy model once per process and serves component-restricted
+    views of it, so full-pipeline and sentence-only callers share one copy.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._views: Dict[Tuple[str, Tuple[str, ...]], SpacyPipelineView] = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, model_id: str, **load_kwargs):
+        import spacy
+        from spacy.util import is_package
 
-    logger.info(f"Loading spaCy model: {model_id}")
-    disable = disable or ()
+        logger.info(f"Loading spaCy model: {model_id}")
+        start = time.time()
 
-    if is_package(model_id):
-        return spacy.load(model_id, disable=disable)
+        if is_package(model_id):
+            nlp = spacy.load(model_id, **load_kwargs)
+        else:
+            possible_path = MODELS_DIR / model_id
+            if not possible_path.exists():
+                raise RuntimeError(f"Could not find spaCy model '{model_id}' at {possible_path}")
+            nlp = spacy.load(str(possible_path), **load_kwargs)
 
-    possible_path = MODELS_DIR / model_id
-    if possible_path.exists():
-        return spacy.load(str(possible_path), disable=disable)
+        elapsed = time.time() - start
+        self.load_count += 1
+        self.load_seconds += elapsed
+        logger.info(f"[spaCy {model_id}] loaded in {round(elapsed, 2)}s")
+        return nlp
+
+    def get(self, model_id: str = SPACY_MODEL_ID, disable: Optional[Tuple[str, ...]] = None):
+        nlp = self._models.get(model_id)
+        if nlp is None:
+            with self._lock:
+                nlp = self._models.get(model_id)
+                if nlp is None:
+                    self.misses += 1
+                    nlp = self._load(model_id)
+                    self._models[model_id] = nlp
+                else:
+                    self.hits += 1
+        else:
+            self.hits += 1
+
+        if not disable:
+            return nlp
+
+        view_key = (model_id, tuple(sorted(disable)))
+        view = self._views.get(view_key)
+        if view is None:
+            view = self._views.setdefault(view_key, SpacyPipelineView(nlp, view_key[1]))
+        return view
+
+    def load_private(self, model_id: str = SPACY_MODEL_ID, exclude: Tuple[str, ...] = ()):
+        """
+        Loads a separate copy of the model that is never handed to anyone
+        else, e.g. to build rule patterns on a vocab no request is parsing with.
+        """
+        return self._load(model_id, exclude=list(exclude))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "loaded_models": list(self._models),
+            "load_count": self.load_count,
+            "load_seconds": round(self.load_seconds, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+spacy_model_registry = SpacyModelRegistry()
+
+
+def load_spacy_model(model_id: str = SPACY_MODEL_ID, disable: Optional[Tuple[str, ...]] = None):
+    """Returns the shared spaCy pipeline, or a view of it with the given components disabled."""
+    return spacy_model_registry.get(model_id, disable)
 
-    raise RuntimeError(f"Could not find spaCy model '{model_id}' at {possible_path}")
+def load_private_spacy_model(model_id: str = SPACY_MODEL_ID, exclude: Tuple[str, ...] = ()):
+    """Returns a new, unshared copy of a spaCy model without the `exclude` components."""
+    return spacy_model_registry.load_private(model_id, exclude)
 
 # ───────────────────────────────────────────────────────────────
 # 🔤 SentenceTransformer Loader
@@ -84,8 +181,8 @@ def _select_model_loader(task: str):
         raise ValueError(f"Unsupported Hugging Face task: '{task}'")
 
 @lru_cache(maxsize=2)
-def load_hf_pipeline(model_id: str, task: str, feature_name: str, **kwargs):
-    logger.info(f"Loading HF pipeline: {feature_name} ({model_id})")
+def load_hf_pipeline(model_id: str, task: str, feature_name: str, backend: str = "torch", **kwargs):
+    logger.info(f"Loading HF pipeline: {feature_name} ({model_id}, backend={backend})")
 
     try:
         model_loader = _select_model_loader(task)
@@ -106,14 +203,15 @@ def load_hf_pipeline(model_id: str, task: str, feature_name: str, **kwargs):
                 cache_dir=HF_MODEL_CACHE_DIR
             )
 
-        model = load_model()
+        model, used_backend = load_model_with_backend(model_id, task, backend, load_model)
         tokenizer = load_tokenizer()
 
         return pipeline(
             task=task,
             model=model,
             tokenizer=tokenizer,
-            device=0 if torch.cuda.is_available() else -1,
+            # Quantized and ONNX Runtime models run on the CPU
+            device=0 if torch.cuda.is_available() and used_backend == "torch" else -1,
             **kwargs
         )
 
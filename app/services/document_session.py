@@ -0,0 +1,275 @@
+# === app/services/document_session.py ===
+
+import asyncio
+import logging
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Set, Tuple
+
+from app.core.config import settings, APP_NAME
+from app.core.exceptions import ServiceError
+from app.services.grammar import GrammarCorrector
+from app.utils.grammar_utils import rebase_issue
+from app.utils.line_index import LineIndex
+from app.utils.text_splitter import SentenceSegment, split_text_into_paragraph_segments, split_text_into_sentences
+
+logger = logging.getLogger(f"{APP_NAME}.services.document_session")
+
+# (corrected sentence, sentence-relative issues), as produced by the grammar service
+SentenceResult = Tuple[str, List[dict]]
+
+# (start, end, replacement) in the coordinates of the text before this edit
+Edit = Tuple[int, int, str]
+
+
+def _shift_offset(pos: int, start: int, end: int, replacement: str) -> int:
+    """Maps an offset in the text before an edit to the text after it."""
+    if pos <= start:
+        return pos
+    if pos >= end:
+        return pos + len(replacement) - (end - start)
+    return start + len(replacement)
+
+
+@dataclass(eq=False)
+class Paragraph:
+    start: int
+    text: str
+    sentences: List[SentenceSegment]  # Offsets relative to the paragraph
+    results: List[Optional[SentenceResult]] = field(default_factory=list)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+class DocumentSession:
+    """
+    Server-side copy of a document being edited, with its paragraph and
+    sentence segmentation and the grammar result for every sentence.
+
+    An edit only re-segments the paragraphs it touches (plus a neighbour when
+    it reaches into the gap between paragraphs, where it may merge or split
+    them). Paragraphs after the edit are shifted, not re-parsed, and sentences
+    whose text survived the edit keep their result, so only new or changed
+    sentences go back to the model.
+    """
+
+    def __init__(self, session_id: str, text: str):
+        self.id = session_id
+        self.text = text
+        self.version = 0
+        self.touched = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.paragraphs: List[Paragraph] = self._segment(text, 0)
+        self._dirty: Set[Paragraph] = set(self.paragraphs)
+        self.rule_version: Optional[str] = None  # Grammar rules the stored results were built with
+
+    @staticmethod
+    def _segment(text: str, base: int) -> List[Paragraph]:
+        paragraphs = []
+        for para in split_text_into_paragraph_segments(text):
+            sentences = split_text_into_sentences(para.text)
+            paragraphs.append(Paragraph(
+                start=base + para.start, text=para.text, sentences=sentences, results=[None] * len(sentences)
+            ))
+        return paragraphs
+
+    def _validate(self, edits: Sequence[Edit]) -> None:
+        # Check the whole batch up front so a bad edit can't leave the session half-applied
+        length = len(self.text)
+        for n, (start, end, replacement) in enumerate(edits):
+            if not 0 <= start <= end <= length:
+                raise ServiceError(
+                    status_code=422,
+                    detail=f"Edit {n} range [{start}, {end}) is outside the document (length {length}).",
+                    error_type="InvalidEdit"
+                )
+            length += len(replacement) - (end - start)
+
+    def _apply_edit(self, start: int, end: int, replacement: str) -> Tuple[int, int]:
+        """Applies one edit and returns the re-segmented range in the new text."""
+        self.text = self.text[:start] + replacement + self.text[end:]
+        delta = len(replacement) - (end - start)
+        paras = self.paragraphs
+
+        if paras:
+            first = bisect_left(paras, start, key=lambda p: p.end)  # first paragraph ending at/after start
+            last = bisect_right(paras, end, key=lambda p: p.start) - 1  # last paragraph starting at/before end
+            # An edit reaching into a gap can merge or split the paragraphs on either side of it
+            lo = first - 1 if first == len(paras) or start < paras[first].start else first
+            hi = last + 1 if last < 0 or end > paras[last].end else last
+            lo = min(max(lo, 0), len(paras) - 1)
+            hi = min(max(hi, 0), len(paras) - 1)
+            region_start = min(start, paras[lo].start)
+            region_end = max(end, paras[hi].end) + delta
+        else:
+            lo, hi = 0, -1
+            region_start, region_end = 0, len(self.text)
+
+        replaced = paras[lo:hi + 1]
+        new_paras = self._segment(self.text[region_start:region_end], region_start)
+
+        # Sentences whose text survived the edit keep their result
+        previous = {
+            seg.text: result
+            for para in replaced
+            for seg, result in zip(para.sentences, para.results)
+            if result is not None
+        }
+        for para in new_paras:
+            para.results = [previous.get(seg.text) for seg in para.sentences]
+
+        for para in paras[hi + 1:]:
+            para.start += delta
+        paras[lo:hi + 1] = new_paras
+        self._dirty.difference_update(replaced)
+        self._dirty.update(new_paras)
+        return region_start, region_end
+
+    def apply_edits(self, edits: Sequence[Edit]) -> Optional[Tuple[int, int]]:
+        """
+        Applies edits in order, each in the coordinates left by the one before.
+        Returns the span of the new text that was re-segmented.
+        """
+        self._validate(edits)
+        changed: Optional[Tuple[int, int]] = None
+        for start, end, replacement in edits:
+            region = self._apply_edit(start, end, replacement)
+            if changed is not None:
+                # Carry the earlier span through this edit before merging the two
+                moved = tuple(_shift_offset(pos, start, end, replacement) for pos in changed)
+                region = (min(moved[0], region[0]), max(moved[1], region[1]))
+            changed = region
+        self.version += 1
+        return changed
+
+    async def refresh(self, grammar: GrammarCorrector) -> int:
+        """
+        Runs grammar on every sentence without a result. Returns how many were sent.
+        If the grammar rules were reloaded since the last run, every sentence is stale.
+        Sentences whose model call failed keep no result, so the next refresh
+        retries them instead of serving the rule-only fallback for good.
+        """
+        rules = grammar.rules
+        if rules.version != self.rule_version:
+            for para in self.paragraphs:
+                para.results = [None] * len(para.sentences)
+            self._dirty = set(self.paragraphs)
+            self.rule_version = rules.version
+
+        stale = [(para, i) for para in self._dirty for i, result in enumerate(para.results) if result is None]
+        segments = [para.sentences[i] for para, i in stale]
+        failed: Set[int] = set()
+        async for idx, _, corrected, issues in grammar.iter_sentence_results(segments, rules=rules, failed=failed):
+            if idx not in failed:
+                para, i = stale[idx]
+                para.results[i] = (corrected, issues)
+        self._dirty = {stale[idx][0] for idx in failed}
+        return len(stale)
+
+    def grammar_result(self) -> dict:
+        line_index = LineIndex(self.text)
+        issues = []
+        corrected_parts = []
+        cursor = 0
+        for para in self.paragraphs:
+            for seg, result in zip(para.sentences, para.results):
+                corrected, sentence_issues = result or (seg.text, [])
+                offset = para.start + seg.start
+                # Splice corrections into the original so spacing between sentences is preserved
+                corrected_parts.append(self.text[cursor:offset])
+                corrected_parts.append(corrected)
+                cursor = offset + len(seg.text)
+                issues.extend(rebase_issue(issue, offset, self.text, line_index) for issue in sentence_issues)
+        corrected_parts.append(self.text[cursor:])
+        return {
+            "corrected_text_suggestion": "".join(corrected_parts),
+            "issues": issues,
+            "rule_version": self.rule_version
+        }
+
+    def sentence_count(self) -> int:
+        return sum(len(para.sentences) for para in self.paragraphs)
+
+    def pending_count(self) -> int:
+        """Sentences with no grammar result yet (their model call failed); reported uncorrected."""
+        return sum(result is None for para in self.paragraphs for result in para.results)
+
+
+class DocumentSessionManager:
+    """
+    Creates, edits and expires document sessions. Sessions live in this
+    process only, so with several workers a client must be routed back to the
+    same one (or recreate the session on a 404).
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.DOCUMENT_SESSION_MAX_SESSIONS,
+        ttl_seconds: int = settings.DOCUMENT_SESSION_TTL_SECONDS
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_seconds
+        self.grammar = GrammarCorrector()
+        self._sessions: "OrderedDict[str, DocumentSession]" = OrderedDict()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.pop(session_id)
+            logger.info(f"Expired document session {session_id}")
+
+    def _get(self, session_id: str) -> DocumentSession:
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise ServiceError(
+                status_code=404,
+                detail=f"Document session '{session_id}' not found or expired.",
+                error_type="DocumentSessionNotFound"
+            )
+        session.touched = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def _respond(self, session: DocumentSession, changed: Optional[Tuple[int, int]]) -> dict:
+        reanalyzed = await session.refresh(self.grammar)
+        return {
+            "document_id": session.id,
+            "version": session.version,
+            "changed_range": {"start": changed[0], "end": changed[1]} if changed else None,
+            "sentences": session.sentence_count(),
+            "reanalyzed_sentences": reanalyzed,
+            "pending_sentences": session.pending_count(),
+            "grammar": session.grammar_result(),
+        }
+
+    async def create(self, text: str) -> dict:
+        session = await asyncio.to_thread(DocumentSession, uuid.uuid4().hex, text)
+        self._sessions[session.id] = session
+        self._expire()
+        async with session.lock:
+            return await self._respond(session, (0, len(text)))
+
+    async def edit(self, session_id: str, edits: Sequence[Edit], base_version: Optional[int] = None) -> dict:
+        session = self._get(session_id)
+        async with session.lock:
+            if base_version is not None and base_version != session.version:
+                raise ServiceError(
+                    status_code=409,
+                    detail=f"Document is at version {session.version}, not {base_version}.",
+                    error_type="DocumentVersionConflict"
+                )
+            changed = await asyncio.to_thread(session.apply_edits, edits)
+            return await self._respond(session, changed)
+
+    def delete(self, session_id: str) -> None:
+        self._get(session_id)
+        self._sessions.pop(session_id, None)
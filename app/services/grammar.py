@@ -2,105 +2,291 @@
 
 import asyncio
 import logging
+from collections import Counter
+from dataclasses import dataclass
 from functools import cached_property
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import AsyncIterator, List, Dict, Optional, Set, Tuple
 
 from app.core.config import settings
 from app.core.exceptions import ServiceError
 from app.utils.text_splitter import split_text_into_sentences, SentenceSegment
-from app.utils.grammar_loader import load_rules_from_json
+from app.utils.analysis_context import AnalysisContext, resolve_context
+from app.utils.grammar_loader import load_rules_from_json, compute_rules_version, resolve_rule_path
 from app.utils.grammar_rules import RegexRule, ClassificationRule, always_true
-from app.utils.grammar_utils import generate_diff_issues_for_sentence
-from app.services.base import load_hf_pipeline, load_spacy_model
+from app.utils.grammar_utils import generate_diff_issues_for_sentence, rebase_issue
+from app.utils.grammar_prefilter import GrammarPrefilter
+from app.utils.decoding_policy import DecodingPolicySelector, estimate_tokens
+from app.utils.rewrite_engine import RewriteEngine
+from app.utils.line_index import LineIndex
+from app.utils.sentence_cache import SentenceResultCache, get_sentence_cache
+from app.utils.cancellation import run_blocking
+from app.services.base import load_spacy_model
+from app.services.inference import InferenceEngine, get_inference_engine
+from app.services.rule_registry import rule_registry
 
 logger = logging.getLogger(f"{settings.APP_NAME}.services.grammar")
 
+POST_PROCESSING_RULES_PATH = "app/data/rules/post_processing_rules.json"
+CLASSIFICATION_RULES_PATH = "app/data/rules/classification_rules.json"
+
+# (sentence index, segment, corrected sentence, sentence-relative issue dicts)
+SentenceResult = Tuple[int, SentenceSegment, str, List[dict]]
+
+# Shared by every GrammarCorrector, so its routed/skipped counts cover the whole process
+grammar_prefilter = GrammarPrefilter(
+    threshold=settings.GRAMMAR_PREFILTER_THRESHOLD, enabled=settings.GRAMMAR_PREFILTER_ENABLED
+)
+
+
+@dataclass(frozen=True)
+class GrammarRuleSet:
+    """One version of the grammar rule files. Replaced, never mutated, on reload."""
+    version: str
+    post_processing_rules: Tuple[RegexRule, ...]
+    classification_rules: Tuple[ClassificationRule, ...]
+    rewriter: RewriteEngine  # post_processing_rules compiled into one pass
+
+
+def _grammar_rule_files() -> List[Path]:
+    return [Path(resolve_rule_path(POST_PROCESSING_RULES_PATH)), Path(resolve_rule_path(CLASSIFICATION_RULES_PATH))]
+
+
+def _load_grammar_rules() -> Tuple[str, GrammarRuleSet]:
+    post_processing_rules = load_rules_from_json(POST_PROCESSING_RULES_PATH, "post_processing")
+    classification_rules = load_rules_from_json(CLASSIFICATION_RULES_PATH, "classification")
+
+    if not classification_rules:
+        logger.warning("No classification rules loaded. Adding a default fallback rule.")
+        classification_rules.append(ClassificationRule(
+            condition=always_true,
+            output=("Grammar", "Unclassified change.", "low", "No explanation available."),
+            tag_specific='any'
+        ))
+
+    version = compute_rules_version(POST_PROCESSING_RULES_PATH, CLASSIFICATION_RULES_PATH)
+    return version, GrammarRuleSet(
+        version, tuple(post_processing_rules), tuple(classification_rules), RewriteEngine(post_processing_rules)
+    )
+
+
 class GrammarCorrector:
     def __init__(self):
-        self.max_length = settings.GRAMMAR_MODEL_MAX_LENGTH or 128
-        self.num_beams = settings.GRAMMAR_MODEL_NUM_BEAMS or 4
-        self.batch_size = getattr(settings, "GRAMMAR_BATCH_SIZE", 5)
-
-        self.post_processing_rules: List[RegexRule] = load_rules_from_json(
-            "app/data/rules/post_processing_rules.json", "post_processing"
-        )
-        self.classification_rules: List[ClassificationRule] = load_rules_from_json(
-            "app/data/rules/classification_rules.json", "classification"
+        self.decoding = DecodingPolicySelector(
+            num_beams=settings.GRAMMAR_MODEL_NUM_BEAMS or 4,
+            buckets=settings.GRAMMAR_LENGTH_BUCKETS,
+            max_new_tokens_cap=settings.GRAMMAR_MODEL_MAX_LENGTH or 128,
+            greedy_queue_depth=settings.GRAMMAR_GREEDY_QUEUE_DEPTH,
+            adaptive=settings.GRAMMAR_ADAPTIVE_DECODING,
         )
 
-        if not self.classification_rules:
-            logger.warning("No classification rules loaded. Adding a default fallback rule.")
-            self.classification_rules.append(ClassificationRule(
-                condition=always_true,
-                output=("Grammar", "Unclassified change.", "low", "No explanation available."),
-                tag_specific='any'
-            ))
+        # Rules live in the registry: shared by every instance and reloaded when the files change
+        rule_registry.register("grammar", files=_grammar_rule_files, build=_load_grammar_rules)
+
+        # Per-sentence (corrected_sentence, sentence-relative issues), so unchanged
+        # sentences are never sent through the model again.
+        self.cache = get_sentence_cache("grammar", max_entries=settings.SENTENCE_CACHE_MAX_ENTRIES)
+
+    @property
+    def rules(self) -> GrammarRuleSet:
+        """The active rule set. Take it once per request and pass it along."""
+        return rule_registry.get("grammar").rules
+
+    @property
+    def rule_version(self) -> str:
+        return self.rules.version
 
     @cached_property
-    def pipeline(self):
-        logger.info("Loading grammar correction pipeline...")
-        return load_hf_pipeline(
-            model_id=settings.GRAMMAR_MODEL_ID,
-            task="text2text-generation",
-            feature_name="Grammar Correction"
-        )
+    def engine(self) -> InferenceEngine:
+        # Shared by every GrammarCorrector in the process, so sentences from all
+        # in-flight requests are batched together
+        return get_inference_engine("grammar")
 
     @cached_property
     def spacy_nlp(self):
         logger.info("Loading spaCy model for grammar processing...")
         return load_spacy_model()
 
-    async def correct(self, text: str) -> dict:
-        if not text.strip():
-            raise ServiceError(status_code=400, detail="Input text is empty.")
+    def _cache_key(self, sentence: str, rules: GrammarRuleSet) -> str:
+        # Keyed on the rule version, so a rule reload never serves results built with old rules
+        return SentenceResultCache.make_key(
+            sentence,
+            settings.GRAMMAR_MODEL_ID,
+            f"{rules.version}:{self.decoding.cache_key}:{grammar_prefilter.cache_key}"
+        )
 
-        sentence_segments: List[SentenceSegment] = split_text_into_sentences(text)
-        corrected_map: Dict[int, str] = {}
-        all_issues = []
-        corrected_sentences = []
+    def decoding_summary(self, decoding_log: Counter) -> dict:
+        """The decoding configuration plus how many sentences took each path, for the response."""
+        return {**self.decoding.describe(), "sentences": dict(decoding_log)}
 
-        indexed_sentences = [(idx, seg.text) for idx, seg in enumerate(sentence_segments) if seg.text.strip()]
+    async def _correct_sentence(
+        self, idx: int, seg: SentenceSegment, use_span: bool, rules: GrammarRuleSet,
+        decoding_log: Optional[Counter] = None, failed: Optional[Set[int]] = None
+    ) -> SentenceResult:
+        """
+        Corrects one uncached sentence and caches the outcome. The rule-based
+        rewrites run first; if the rewritten sentence is already cached or the
+        pre-filter finds it likely clean, the model is skipped. Otherwise the
+        model sees the rewritten sentence, decoded with the policy chosen for
+        its length and the current load, and its output gets the same rewrites.
+        Results decoded greedily because of load are not cached, so the
+        sentence gets full beam search next time.
+        """
+        original = seg.text
+        rewritten = rules.rewriter.rewrite(original)
+        corrected = rewritten
+        succeeded = False
+        original_doc = seg.span.as_doc() if use_span and seg.span is not None else None
+        cached = self.cache.get(self._cache_key(rewritten, rules)) if rewritten != original else None
+        likely_clean = False
+        if cached is None and grammar_prefilter.enabled:
+            # Parsed off the event loop, so scoring never stalls other requests
+            if rewritten != original:
+                rewritten_doc = await run_blocking(self.spacy_nlp, rewritten)
+            else:
+                # The same parse serves the diff below
+                if original_doc is None:
+                    original_doc = await run_blocking(self.spacy_nlp, original)
+                rewritten_doc = original_doc
+            likely_clean = not grammar_prefilter.is_suspect(rewritten_doc)
 
-        for i in range(0, len(indexed_sentences), self.batch_size):
-            batch = indexed_sentences[i:i + self.batch_size]
-            indices, texts = zip(*batch)
+        cacheable = True
+        if cached is not None:
+            corrected = cached[0]
+            succeeded = True
+            path = "cached"
+        elif likely_clean:
+            succeeded = True
+            path = "likely_clean"
+        else:
+            policy = self.decoding.select(estimate_tokens(rewritten), self.engine.queue_depth())
+            cacheable = not policy.under_load
+            path = policy.label
             try:
-                batch_results: List[Any] = await asyncio.to_thread(
-                    self.pipeline,
-                    list(texts),
-                    max_length=self.max_length,
-                    num_beams=self.num_beams,
-                    early_stopping=True,
-                    do_sample=False
+                result = await self.engine.submit(
+                    rewritten,
+                    length=len(rewritten.split()),
+                    **policy.generate_kwargs()
                 )
+                gen = result.get('generated_text') if isinstance(result, dict) else result[0].get('generated_text')
+                corrected = rules.rewriter.rewrite(gen.strip()) if gen else rewritten
+                succeeded = True
+            except Exception as e:
+                logger.error(f"Grammar correction failed for sentence {idx}: {e}")
+                path = "failed"
+                if failed is not None:
+                    failed.add(idx)
+        if decoding_log is not None:
+            decoding_log[path] += 1
 
-                if not isinstance(batch_results, list):
-                    batch_results = [batch_results]
+        issues = generate_diff_issues_for_sentence(
+            original_sentence=original,
+            corrected_sentence=corrected,
+            global_offset_start=0,
+            full_text=original,
+            spacy_nlp=self.spacy_nlp,
+            rules=rules.classification_rules,
+            original_doc=original_doc
+        )
+        sentence_result = (corrected, [i.to_dict() for i in issues])
+        # Failed sentences fall back to the rule-based rewrites only and are not cached
+        if succeeded and cacheable:
+            self.cache.put(self._cache_key(original, rules), sentence_result)
+        return idx, seg, *sentence_result
 
-                for idx_in_batch, (sent_idx, original_text) in enumerate(batch):
-                    result = batch_results[idx_in_batch]
-                    gen = result.get('generated_text') if isinstance(result, dict) else result[0].get('generated_text')
-                    corrected_map[sent_idx] = gen.strip() if gen else original_text
-            except Exception as e:
-                logger.error(f"Batch processing error: {e}", exc_info=True)
-                for sent_idx, orig_text in batch:
-                    corrected_map[sent_idx] = orig_text
+    def _segments(self, text: str, context: Optional[AnalysisContext]) -> List[SentenceSegment]:
+        return context.sentences if context else split_text_into_sentences(text)
+
+    async def iter_sentence_results(
+        self, segments: List[SentenceSegment], use_spans: bool = False, rules: Optional[GrammarRuleSet] = None,
+        decoding_log: Optional[Counter] = None, failed: Optional[Set[int]] = None
+    ) -> AsyncIterator[SentenceResult]:
+        """
+        Yields (index, segment, corrected_sentence, sentence-relative issues) for
+        each sentence as soon as it is ready: cache hits first, then model results
+        in completion order. Set use_spans only when the segments come from a
+        tagged parse (the shared AnalysisContext). All sentences use one rule set:
+        `rules`, or the active one when the iteration starts. If `decoding_log`
+        is given, it counts how each sentence was handled (cached, likely clean,
+        or the decoding policy label). If `failed` is given, the index of every
+        sentence whose model call failed (and so only got the rule-based
+        rewrites) is added to it before that sentence is yielded.
+        """
+        rules = rules or self.rules
+        pending = []
+        for idx, seg in enumerate(segments):
+            cached = self.cache.get(self._cache_key(seg.text, rules))
+            if cached is not None:
+                if decoding_log is not None:
+                    decoding_log["cached"] += 1
+                yield (idx, seg, *cached)
+            else:
+                pending.append(asyncio.ensure_future(
+                    self._correct_sentence(idx, seg, use_spans, rules, decoding_log, failed)
+                ))
+
+        try:
+            for next_done in asyncio.as_completed(pending):
+                yield await next_done
+        finally:
+            # Stop queued work if the consumer goes away early
+            for task in pending:
+                task.cancel()
+
+    async def correct(
+        self, text: str, context: Optional[AnalysisContext] = None, budget_s: Optional[float] = None
+    ) -> dict:
+        """
+        Corrects every sentence. With a `budget_s`, sentences still pending when
+        it runs out are cancelled and left uncorrected, and the result is marked
+        partial instead of failing as a whole.
+        """
+        if not text.strip():
+            raise ServiceError(status_code=400, detail="Input text is empty.")
+
+        context = resolve_context(context, text)
+        sentence_segments = self._segments(text, context)
+        sentence_results: Dict[int, Tuple[str, List[dict]]] = {}
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget_s if budget_s is not None else None
+        rules = self.rules
+        decoding_log: Counter = Counter()
+        results = self.iter_sentence_results(
+            sentence_segments, use_spans=context is not None, rules=rules, decoding_log=decoding_log
+        )
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    idx, _, corrected, issues = await asyncio.wait_for(results.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    logger.info(f"Grammar budget of {budget_s:.2f}s ran out with "
+                                f"{len(sentence_segments) - len(sentence_results)} sentences pending.")
+                    break
+                sentence_results[idx] = (corrected, issues)
+        finally:
+            await results.aclose()
+
+        line_index = LineIndex(text)
+        all_issues = []
+        corrected_sentences = []
 
         for idx, seg in enumerate(sentence_segments):
-            original = seg.text
-            corrected = corrected_map.get(idx, original)
+            corrected, issues = sentence_results.get(idx, (seg.text, []))
             corrected_sentences.append(corrected)
-            all_issues.extend(generate_diff_issues_for_sentence(
-                original_sentence=original,
-                corrected_sentence=corrected,
-                global_offset_start=seg.start,
-                full_text=text,
-                spacy_nlp=self.spacy_nlp,
-                rules=self.classification_rules
-            ))
-
-        return {
+            all_issues.extend(rebase_issue(issue, seg.start, text, line_index) for issue in issues)
+
+        result = {
             "original_text": text,
             "corrected_text_suggestion": "".join(corrected_sentences).strip(),
-            "issues": [i.to_dict() for i in all_issues]
+            "issues": all_issues,
+            "rule_version": rules.version,
+            "decoding": self.decoding_summary(decoding_log)
         }
+        if len(sentence_results) < len(sentence_segments):
+            result["partial"] = True
+            result["pending_sentences"] = len(sentence_segments) - len(sentence_results)
+        return result
@@ -1,142 +1,154 @@
 import logging
-import yaml
-import asyncio
 from pathlib import Path
-from typing import List, Dict, Set, Tuple, Union
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Tuple, Union, Optional
+import threading
 import time
-import re
+from bisect import bisect_right
 
-from spacy.matcher import PhraseMatcher
+from spacy.matcher import Matcher, PhraseMatcher
+from spacy.tokens import Doc
 import spacy
 
 
-from app.services.base import load_spacy_model
+from app.services.base import load_private_spacy_model, load_spacy_model
 from app.core.config import APP_NAME, SPACY_MODEL_ID, INCLUSIVE_RULES_DIR
 from app.core.exceptions import ServiceError
+from app.utils.analysis_context import AnalysisContext, resolve_context
+from app.utils.interval_set import IntervalSet
+from app.utils.inclusive_rule_pack import load_rule_pack, wildcard_regex
+from app.utils.cancellation import run_blocking
+from app.services.rule_registry import rule_registry
 
 logger = logging.getLogger(f"{APP_NAME}.services.inclusive_language")
 
+# Rule sets are built on a private tokenizer-only copy of the spaCy model.
+# Building patterns adds strings to the vocab, and reloads run on a background
+# thread while requests parse with the shared pipeline, so they must never
+# touch its vocab. Matching works across the two: patterns and tokens are
+# compared by string hash, which doesn't depend on the vocab.
+_build_nlp = None
+_build_lock = threading.Lock()
+
+@dataclass(frozen=True)
+class InclusiveRuleSet:
+    """Everything needed to match one version of the rules. Replaced, never mutated, on reload."""
+    version: str  # Content hash of the rule pack
+    rules_data: Mapping[str, Dict]  # rule_id -> rule
+    matcher: PhraseMatcher  # Single words and multi-word phrases
+    wildcard_matcher: Matcher  # Wildcard terms (e.g. "make * great again")
+    # Wildcard matcher key -> {"rule_id", "original_term", "gender", "regex"}
+    wildcard_rules: Mapping[str, Dict]
+    # Lowercase single word -> (rule_id, gender) of the first rule that lists it
+    single_word_index: Mapping[str, Tuple[str, Optional[str]]]
+    # rule_id -> {lowercase term: gender}, for resolving the gender of phrase matches
+    rule_term_genders: Mapping[str, Mapping[str, Optional[str]]]
+
+
 class InclusiveLanguageChecker:
     """
     A class to check text for inconsiderate language based on a set of YAML rules.
     It utilizes spaCy for NLP capabilities like tokenization, sentence detection,
-    and part-of-speech tagging, and supports phrase matching, regex patterns,
-    and single-word exact matches.
+    and part-of-speech tagging. All rules are compiled into token matchers when
+    they load, so a check is one pass over the Doc however many rules there are.
     """
     def __init__(self, rules_directory: str = INCLUSIVE_RULES_DIR):
         self._nlp = None # spaCy NLP pipeline
-        self.matcher = None # spaCy PhraseMatcher for multi-word phrases
-        self.rules_data: Dict[str, Dict] = {} # Stores all loaded rule data by rule_id
-        self.single_word_rules: Set[str] = set() # Set of single inconsiderate words
-        self.regex_rules: List[Dict] = []  # List of dictionaries for wildcard patterns
         self.rules_directory = Path(rules_directory)
-        self._load_inclusive_rules(self.rules_directory)
+        # Rule sets live in the registry, so checkers for the same directory share
+        # one copy and pick up edits to the YAML files without a restart
+        self._rules_name = f"inclusive_language:{self.rules_directory}"
+        rule_registry.register(
+            self._rules_name,
+            files=lambda: list(self.rules_directory.glob("*.yml")),
+            build=lambda: self._versioned(self._load_inclusive_rules(self.rules_directory))
+        )
+
+    @staticmethod
+    def _versioned(rule_set: "InclusiveRuleSet") -> Tuple[str, "InclusiveRuleSet"]:
+        return rule_set.version, rule_set
+
+    @property
+    def rule_set(self) -> "InclusiveRuleSet":
+        """The active rule set. Take it once per check and use it throughout."""
+        return rule_registry.get(self._rules_name).rules
+
+    @property
+    def rules_version(self) -> str:
+        return self.rule_set.version
 
     def _get_nlp(self):
         """
-        Lazily loads the spaCy NLP model and initializes the PhraseMatcher.
+        Lazily loads the spaCy NLP model.
         This ensures the model is only loaded when first needed.
         """
         if self._nlp is None:
             self._nlp = load_spacy_model(SPACY_MODEL_ID)
-            # Initialize PhraseMatcher for case-insensitive matching
-            self.matcher = PhraseMatcher(self._nlp.vocab, attr="LOWER")
-            logger.info("Loaded spaCy NLP model and initialized PhraseMatcher.")
+            logger.info("Loaded spaCy NLP model for inclusive language checks.")
         return self._nlp
 
-    def _load_inclusive_rules(self, rules_path: Path) -> None:
+    def _get_build_nlp(self):
+        """The private pipeline rule sets are built on; call with _build_lock held."""
+        global _build_nlp
+        if _build_nlp is None:
+            _build_nlp = load_private_spacy_model(SPACY_MODEL_ID, exclude=tuple(self._get_nlp().pipe_names))
+        return _build_nlp
+
+    def _load_inclusive_rules(self, rules_path: Path) -> "InclusiveRuleSet":
         """
-        Loads rules from YAML files in the specified directory.
-        Separates rules into single words, multi-word phrases (for PhraseMatcher),
-        and regex patterns (for wildcards).
+        Loads the compiled rule pack for the YAML files in the specified
+        directory (building it if the rules changed) and sets up matching.
+        Single words and multi-word phrases go into one case-insensitive
+        PhraseMatcher and wildcard terms into a token Matcher. Also builds the
+        read-only term indexes used to resolve matches without rescanning the rules.
         """
         if not rules_path.is_dir():
             logger.error(f"Inclusive language rules directory not found: {rules_path}")
             raise ServiceError(status_code=500, detail=f"Rules directory not found: {rules_path}")
 
-        nlp = self._get_nlp()
-        
-        # Clear existing rules and matcher patterns before loading new ones
-        self.rules_data.clear()
-        self.single_word_rules.clear()
-        self.regex_rules.clear()
-        if self.matcher:
-            self.matcher.clear() 
-            logger.info("Cleared existing PhraseMatcher patterns.")
-
-        # Iterate through all YAML files in the rules directory
-        for yaml_file in rules_path.glob("*.yml"):
-            try:
-                with yaml_file.open(encoding="utf-8") as f:
-                    rules = yaml.safe_load(f)
-
-                if not isinstance(rules, list):
-                    logger.warning(f"Skipping non-list rule file: {yaml_file.name}")
-                    continue
-
-                for rule in rules:
-                    # Generate a unique rule ID if not explicitly provided in the YAML
-                    rule_id_base = yaml_file.stem
-                    rule_idx = len(self.rules_data) # Use current size for unique ID
-                    rule_id = rule.get("id") or f"{rule_id_base}_{rule_idx}"
-
-                    inconsiderate_terms = rule.get("inconsiderate", [])
-
-                    # Handle both list and dictionary formats for 'inconsiderate' terms
-                    # Dictionary format allows associating additional data (like gender)
-                    terms_to_process = []
-                    if isinstance(inconsiderate_terms, dict):
-                        terms_to_process = [(k, v) for k, v in inconsiderate_terms.items()]
-                    elif isinstance(inconsiderate_terms, list):
-                        terms_to_process = [(t, None) for t in inconsiderate_terms] # No gender info for list items
-                    else:
-                        logger.warning(f"Invalid 'inconsiderate' field in rule {rule_id}: {inconsiderate_terms}")
-                        continue
-
-                    # Store the complete rule data for later retrieval
-                    self.rules_data[rule_id] = rule
-
-                    for term, gender in terms_to_process:
-                        term_lower = str(term).lower().strip()
-                        if not term_lower:
-                            logger.warning(f"Skipping empty term in rule {rule_id}")
-                            continue
-                        # Skip single-character terms unless they are common single-letter words like 'a' or 'i'
-                        if len(term_lower) <= 1 and term_lower not in ["a", "i"]:
-                             logger.warning(f"Skipping single-character term (unless 'a' or 'i'): {term_lower} in rule {rule_id}")
-                             continue
-
-                        # Handle wildcard patterns (e.g., "make * great again")
-                        if "*" in term_lower:
-                            # Create a regex pattern, escaping special characters and replacing '*' with '\S+'
-                            # '\S+' matches one or more non-whitespace characters.
-                            # '\b' ensures word boundaries.
-                            regex_pattern = re.escape(term_lower).replace(r"\*", r"\S+")
-                            regex_pattern = rf"\b{regex_pattern}\b"
-                            self.regex_rules.append({
-                                "rule_id": rule_id,
-                                "pattern": re.compile(regex_pattern, re.IGNORECASE),
-                                "original_term": term_lower,
-                                "gender": gender # Store gender info if available
-                            })
-                        elif " " in term_lower:
-                            # For multi-word phrases, create a spaCy Doc object and add to PhraseMatcher
-                            pattern = nlp.make_doc(term_lower)
-                            self.matcher.add(rule_id, [pattern])
-                        else:
-                            # For single words, add to a set for efficient lookup
-                            self.single_word_rules.add(term_lower)
-
-            except yaml.YAMLError as e:
-                logger.error(f"YAML error in file {yaml_file.name}: {e}")
-            except Exception as e:
-                logger.error(f"Unexpected error loading rules from {yaml_file.name}: {e}")
-
-        logger.info(f"Total rules loaded: {len(self.rules_data)}")
-        logger.debug(f"Single words to flag: {sorted(list(self.single_word_rules))}")
-        logger.debug(f"Regex patterns: {[r['original_term'] for r in self.regex_rules]}")
-
-    async def check(self, text: str) -> Dict[str, List[Dict]]:
+        # Builds of different rule directories share the private pipeline, so they take turns
+        with _build_lock:
+            return self._build_rule_set(rules_path, self._get_build_nlp())
+
+    def _build_rule_set(self, rules_path: Path, nlp) -> "InclusiveRuleSet":
+        pack = load_rule_pack(rules_path, nlp)
+
+        # Build into fresh matchers and swap them in once loading is done
+        matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+        for rule_id, words in pack["phrases"]:
+            # Patterns are stored pre-tokenized, so no tokenizer run is needed here
+            matcher.add(rule_id, [Doc(nlp.vocab, words=words)])
+
+        wildcard_matcher = Matcher(nlp.vocab)
+        wildcard_rules: Dict[str, Dict] = {}
+        for key, wildcard in pack["wildcards"].items():
+            wildcard_matcher.add(key, [wildcard["pattern"]])
+            wildcard_rules[key] = {
+                **{k: v for k, v in wildcard.items() if k != "pattern"},
+                "regex": wildcard_regex(wildcard["original_term"]),
+            }
+
+        rule_set = InclusiveRuleSet(
+            version=pack["hash"],
+            rules_data=MappingProxyType(pack["rules"]),
+            matcher=matcher,
+            wildcard_matcher=wildcard_matcher,
+            wildcard_rules=MappingProxyType(wildcard_rules),
+            single_word_index=MappingProxyType({
+                term: (rule_id, gender) for term, (rule_id, gender) in pack["single_words"].items()
+            }),
+            rule_term_genders=MappingProxyType({
+                rule_id: MappingProxyType(terms) for rule_id, terms in pack["term_genders"].items()
+            }),
+        )
+
+        logger.info(f"Total rules loaded: {len(rule_set.rules_data)} (rule pack {rule_set.version})")
+        logger.debug(f"Single words to flag: {sorted(rule_set.single_word_index)}")
+        logger.debug(f"Wildcard patterns: {[r['original_term'] for r in rule_set.wildcard_rules.values()]}")
+        return rule_set
+
+    async def check(self, text: str, context: Optional[AnalysisContext] = None) -> Dict[str, List[Dict]]:
         """
         Checks the input text for inconsiderate language based on the loaded rules.
         Identifies matches, resolves overlaps, and provides suggestions and context.
@@ -148,93 +160,49 @@ class InclusiveLanguageChecker:
         start_time = time.time()
         try:
             nlp = self._get_nlp()
-            # Process the text with spaCy asynchronously to avoid blocking
-            doc = await asyncio.to_thread(nlp, text)
+            # One rule set for the whole check, even if a reload lands meanwhile
+            rules = self.rule_set
+            context = resolve_context(context, text)
+            # Reuse the request's shared parse, or process the text with spaCy off the event loop
+            doc = context.doc if context else await run_blocking(nlp, text)
             
             # List to store all potential matches found across different rule types
             all_potential_matches: List[Dict] = []
 
-            # 1. Collect matches from PhraseMatcher (multi-word phrases)
-            for match_id, start, end in self.matcher(doc):
+            # 1. Collect single-word and phrase matches from the PhraseMatcher
+            for match_id, start, end in rules.matcher(doc):
                 span = doc[start:end]
-                rule_id = nlp.vocab.strings[match_id]
-                rule = self.rules_data.get(rule_id)
-                
+                # Match keys live in the vocab the rule set was built on
+                rule_id = rules.matcher.vocab.strings[match_id]
+                rule = rules.rules_data.get(rule_id)
+
                 # Validate context if a rule is found and context condition applies
                 if rule and self._is_valid_context(span, rule):
-                    term = span.text
-                    gender = None
-                    # Attempt to retrieve gender information if the rule's 'inconsiderate' field is a dictionary
-                    inconsiderate_terms_data = rule.get("inconsiderate", {})
-                    if isinstance(inconsiderate_terms_data, dict):
-                        gender = next(
-                            (g for t, g in inconsiderate_terms_data.items() if t.lower() == term.lower()),
-                            None
-                        )
-
                     all_potential_matches.append({
                         "start_char": span.start_char,
                         "end_char": span.end_char,
-                        "term": term,
+                        "term": span.text,
                         "rule_id": rule_id,
-                        "gender": gender
+                        "gender": rules.rule_term_genders.get(rule_id, {}).get(span.text.lower())
                     })
 
-            # 2. Collect matches from Regex patterns
-            for regex_rule_data in self.regex_rules:
-                rule_id = regex_rule_data["rule_id"]
-                pattern = regex_rule_data["pattern"]
-                gender = regex_rule_data["gender"]
-                rule = self.rules_data.get(rule_id)
-
-                # Find all occurrences of the regex pattern in the original text
-                for match in pattern.finditer(text):
-                    start_char, end_char = match.span()
-                    term = text[start_char:end_char]
-                    
-                    # Create a spaCy span for the matched text to use for context validation
-                    matched_span_in_doc = doc.char_span(start_char, end_char)
-                    
-                    if matched_span_in_doc and rule and self._is_valid_context(matched_span_in_doc, rule):
-                        all_potential_matches.append({
-                            "start_char": start_char,
-                            "end_char": end_char,
-                            "term": term,
-                            "rule_id": rule_id,
-                            "gender": gender
-                        })
-                    # Log if a regex match cannot be mapped to a valid spaCy span for context checking
-                    elif not matched_span_in_doc:
-                        logger.debug(f"Regex match '{term}' at ({start_char},{end_char}) could not be mapped to a spaCy span.")
-
-
-            # 3. Collect matches from single word rules
-            for token in doc:
-                token_lower = token.text.lower()
-                # Check if the token is in our set of single inconsiderate words
-                if token_lower in self.single_word_rules:
-                    rule_id = None
-                    gender = None
-                    # Find the corresponding rule_id and gender for this single word
-                    for r_id, r_data in self.rules_data.items():
-                        inconsiderate_terms_data = r_data.get("inconsiderate", {})
-                        if isinstance(inconsiderate_terms_data, dict) and token_lower in inconsiderate_terms_data:
-                            rule_id = r_id
-                            gender = inconsiderate_terms_data[token_lower]
-                            break
-                        elif isinstance(inconsiderate_terms_data, list) and token_lower in [t.lower() for t in inconsiderate_terms_data]:
-                            rule_id = r_id
-                            break
-
-                    # Validate context before adding to potential matches
-                    if rule_id and self._is_valid_context(token, self.rules_data[rule_id]):
-                        all_potential_matches.append({
-                            "start_char": token.idx,
-                            "end_char": token.idx + len(token.text),
-                            "term": token.text,
-                            "rule_id": rule_id,
-                            "gender": gender
-                        })
+            # 2. Collect wildcard matches from the token Matcher
+            for match_id, start, end in rules.wildcard_matcher(doc):
+                span = doc[start:end]
+                wildcard_rule = rules.wildcard_rules[rules.wildcard_matcher.vocab.strings[match_id]]
+                # The Matcher proposes every way to cut the wildcard chunks; keep the ones the term's regex accepts
+                if not wildcard_rule["regex"].fullmatch(span.text):
+                    continue
+                rule = rules.rules_data.get(wildcard_rule["rule_id"])
+
+                if rule and self._is_valid_context(span, rule):
+                    all_potential_matches.append({
+                        "start_char": span.start_char,
+                        "end_char": span.end_char,
+                        "term": span.text,
+                        "rule_id": wildcard_rule["rule_id"],
+                        "gender": wildcard_rule["gender"]
+                    })
 
             # Sort all potential matches:
             # 1. By start character (earlier matches first)
@@ -243,15 +211,11 @@ class InclusiveLanguageChecker:
 
             final_results: List[Dict] = []
             # Keep track of text ranges that have already been covered by an accepted match
-            covered_ranges: List[Tuple[int, int]] = [] 
+            covered_ranges = IntervalSet()
 
-            def is_covered(start, end, covered_ranges):
-                """Checks if the given span (start, end) overlaps with any already covered range."""
-                for c_start, c_end in covered_ranges:
-                    # Check for any overlap
-                    if max(c_start, start) < min(c_end, end): 
-                        return True
-                return False
+            # Sentence start offsets, for finding a match's sentence by binary search
+            sentences = list(doc.sents)
+            sentence_starts = [sent.start_char for sent in sentences]
 
             issue_counter = 1
             for match_info in all_potential_matches:
@@ -259,18 +223,15 @@ class InclusiveLanguageChecker:
                 end_char = match_info["end_char"]
 
                 # Only add the match if it doesn't overlap with an already accepted match
-                if not is_covered(start_char, end_char, covered_ranges):
+                if covered_ranges.add(start_char, end_char):
                     rule_id = match_info["rule_id"]
-                    rule = self.rules_data[rule_id]
+                    rule = rules.rules_data[rule_id]
                     term = match_info["term"]
                     gender = match_info["gender"]
 
                     # Find the sentence containing the match for context
-                    context_sent = None
-                    for sent in doc.sents:
-                        if sent.start_char <= start_char < sent.end_char:
-                            context_sent = sent
-                            break
+                    sent_idx = bisect_right(sentence_starts, start_char) - 1
+                    context_sent = sentences[sent_idx] if sent_idx >= 0 and start_char < sentences[sent_idx].end_char else None
                     # Fallback to full text if sentence boundary isn't clear or match spans sentences
                     context = context_sent.text if context_sent else text 
 
@@ -303,15 +264,11 @@ class InclusiveLanguageChecker:
                     }
                     final_results.append(issue)
                     issue_counter += 1
-                    # Add the current match's span to covered ranges
-                    covered_ranges.append((start_char, end_char))
-                    # Keep covered_ranges sorted by start_char for potential future optimizations
-                    covered_ranges.sort()
 
 
             end_time = time.time()
             logger.info(f"Inclusive check completed in {end_time - start_time:.2f} seconds. Found {len(final_results)} issues.")
-            return {"issues": final_results}
+            return {"issues": final_results, "rule_version": rules.version}
 
         except Exception as e:
             logger.error(f"Inclusive check error: {e}", exc_info=True)
@@ -0,0 +1,305 @@
+# === app/services/inference.py ===
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.modeling_outputs import BaseModelOutput
+
+from app.core.config import settings, APP_NAME
+from app.core.exceptions import ModelHostUnavailableError
+from app.services.base import load_hf_pipeline
+from app.services.model_backends import active_backend
+from app.services.model_host import get_model_host_client
+from app.utils.batching import MicroBatchScheduler
+
+logger = logging.getLogger(f"{APP_NAME}.services.inference")
+
+# Pipelines that decode token by token and so can be stopped mid-batch
+GENERATION_TASKS = ("text2text-generation", "translation", "summarization")
+
+
+class _BatchCancelled(StoppingCriteria):
+    """Ends generation as soon as nobody is waiting for the batch any more."""
+
+    def __init__(self, is_cancelled: Callable[[], bool]):
+        self.is_cancelled = is_cancelled
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.is_cancelled(), dtype=torch.bool, device=input_ids.device)
+
+
+class InferenceEngine:
+    """
+    Async front-end for one Hugging Face pipeline.
+
+    Callers `await submit(item, **call_kwargs)` from the event loop. Items that
+    share the same call kwargs are coalesced into batches by a
+    MicroBatchScheduler. Every batch runs on this engine's own bounded thread
+    pool, whose size is the per-model concurrency limit, so model calls never
+    block the event loop and a single model can't take every core.
+
+    In "host" serving mode the batch is forwarded to the model-host process
+    instead of running a pipeline loaded in this worker. If the host can't be
+    reached and MODEL_HOST_LOCAL_FALLBACK is on, the batch runs on a pipeline
+    loaded here instead, so requests keep working while the host restarts.
+
+    Queued items whose callers were cancelled never reach the model, and a
+    generation batch stops decoding once all of its callers have gone, so a
+    timed-out request frees its model slot within one decoding step.
+
+    With `encoder_cache_size`, a seq2seq engine keeps the encoder outputs of
+    its most recent inputs and calls `generate` with them directly, so
+    regenerating the same input (e.g. for more variants) skips the encoder.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_id: str,
+        task: str,
+        feature_name: str,
+        pipeline_kwargs: Optional[Dict[str, Any]] = None,
+        backend: str = "torch",
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_concurrency: int = 1,
+        encoder_cache_size: int = 0,
+    ):
+        self.name = name
+        self.model_id = model_id
+        self.task = task
+        self.feature_name = feature_name
+        self.pipeline_kwargs = pipeline_kwargs or {}
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"{name}-infer")
+        self._schedulers: Dict[str, MicroBatchScheduler] = {}
+        self._pipeline = None
+        self._pipeline_lock = threading.Lock()
+
+        self.encoder_cache_size = max(0, encoder_cache_size)
+        self._encoder_cache: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._encoder_cache_lock = threading.Lock()
+        self.encoder_hits = 0
+        self.encoder_misses = 0
+
+    @property
+    def pipeline(self):
+        """Loads the underlying pipeline on first use. Raises ModelNotDownloadedError if it is missing."""
+        if self._pipeline is None:
+            with self._pipeline_lock:
+                if self._pipeline is None:
+                    self._pipeline = load_hf_pipeline(
+                        model_id=self.model_id,
+                        task=self.task,
+                        feature_name=self.feature_name,
+                        backend=self.backend,
+                        **self.pipeline_kwargs
+                    )
+        return self._pipeline
+
+    def _run_batch(
+        self, call_kwargs: Dict[str, Any], items: List[Any], is_cancelled: Callable[[], bool]
+    ) -> List[Any]:
+        """Runs one batch on a worker thread and returns one output per item."""
+        if settings.MODEL_SERVING_MODE == "host":
+            try:
+                return get_model_host_client().run_batch(self.name, items, call_kwargs)
+            except ModelHostUnavailableError as e:
+                if not settings.MODEL_HOST_LOCAL_FALLBACK:
+                    raise
+                logger.warning(f"{e.detail} Running '{self.name}' batch in this worker instead.")
+
+        if self.task in GENERATION_TASKS:
+            call_kwargs = {**call_kwargs, "stopping_criteria": StoppingCriteriaList([_BatchCancelled(is_cancelled)])}
+        if self._reuses_encoder():
+            return self._generate_with_cached_encoder(items, call_kwargs)
+        outputs = self.pipeline(items, **call_kwargs)
+        if not isinstance(outputs, list):
+            outputs = [outputs]
+        return outputs
+
+    def _reuses_encoder(self) -> bool:
+        # ONNX Runtime models run their encoder as a separate session, outside this path
+        return (
+            self.encoder_cache_size > 0
+            and self.task == "text2text-generation"
+            and active_backend(self.model_id) != "onnxruntime"
+            and hasattr(getattr(self.pipeline, "model", None), "get_encoder")
+        )
+
+    def _encode(self, items: List[str]) -> List[torch.Tensor]:
+        """Returns each item's unpadded encoder hidden states, running the encoder only for uncached items."""
+        states: Dict[str, torch.Tensor] = {}
+        with self._encoder_cache_lock:
+            for item in items:
+                cached = self._encoder_cache.get(item)
+                if cached is not None:
+                    self._encoder_cache.move_to_end(item)
+                    states[item] = cached
+            missing = [item for item in dict.fromkeys(items) if item not in states]
+            # Counted under the lock too, since batches may run on several engine threads
+            self.encoder_hits += len(states)
+            self.encoder_misses += len(missing)
+
+        if missing:
+            tokenizer, model = self.pipeline.tokenizer, self.pipeline.model
+            inputs = tokenizer(missing, return_tensors="pt", padding=True, truncation=True).to(model.device)
+            with torch.no_grad():
+                hidden = model.get_encoder()(**inputs).last_hidden_state
+            with self._encoder_cache_lock:
+                for item, item_hidden, mask in zip(missing, hidden, inputs["attention_mask"]):
+                    states[item] = item_hidden[mask.bool()]
+                    self._encoder_cache[item] = states[item]
+                while len(self._encoder_cache) > self.encoder_cache_size:
+                    self._encoder_cache.popitem(last=False)
+        return [states[item] for item in items]
+
+    def _generate_with_cached_encoder(self, items: List[str], call_kwargs: Dict[str, Any]) -> List[Any]:
+        """Same outputs as the text2text pipeline, but decoding from (cached) encoder outputs."""
+        tokenizer, model = self.pipeline.tokenizer, self.pipeline.model
+        states = self._encode(items)
+
+        # Re-pad the per-item states into one batch
+        max_len = max(state.shape[0] for state in states)
+        hidden = states[0].new_zeros((len(states), max_len, states[0].shape[-1]))
+        attention_mask = torch.zeros((len(states), max_len), dtype=torch.long, device=hidden.device)
+        for i, state in enumerate(states):
+            hidden[i, :state.shape[0]] = state
+            attention_mask[i, :state.shape[0]] = 1
+
+        with torch.no_grad():
+            output_ids = model.generate(
+                encoder_outputs=BaseModelOutput(last_hidden_state=hidden),
+                attention_mask=attention_mask,
+                **call_kwargs
+            )
+        texts = tokenizer.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        per_item = call_kwargs.get("num_return_sequences", 1)
+        outputs = [
+            [{"generated_text": text} for text in texts[i * per_item:(i + 1) * per_item]]
+            for i in range(len(items))
+        ]
+        # Like the pipeline: a dict per input for one sequence, a list of dicts for several
+        return [output[0] for output in outputs] if per_item == 1 else outputs
+
+    def _get_scheduler(self, call_kwargs: Dict[str, Any]) -> MicroBatchScheduler:
+        # Only items generated with identical settings can share a batch
+        key = ",".join(f"{k}={v}" for k, v in sorted(call_kwargs.items()))
+        scheduler = self._schedulers.get(key)
+        if scheduler is None:
+            scheduler = self._schedulers.setdefault(key, MicroBatchScheduler(
+                f"{self.name}[{key}]" if key else self.name,
+                partial(self._run_batch, dict(call_kwargs)),
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_wait_ms,
+                executor=self._executor,
+                cancellable=True,
+            ))
+        return scheduler
+
+    async def submit(self, item: Any, length: Optional[int] = None, **call_kwargs) -> Any:
+        """Queues one input and returns the pipeline's output for it."""
+        return await self._get_scheduler(call_kwargs).submit(item, length=length)
+
+    async def submit_many(self, items: List[Any], **call_kwargs) -> List[Any]:
+        """Queues several inputs and returns their outputs in order. Raises the first failure."""
+        scheduler = self._get_scheduler(call_kwargs)
+        return list(await asyncio.gather(
+            *(scheduler.submit(item, length=len(str(item))) for item in items)
+        ))
+
+    def queue_depth(self) -> int:
+        """Items submitted to this engine and not yet answered, i.e. how busy the model is."""
+        return sum(scheduler.queue_depth for scheduler in list(self._schedulers.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model_id": self.model_id,
+            "serving_mode": settings.MODEL_SERVING_MODE,
+            "loaded": self._pipeline is not None,
+            "backend": self.backend,
+            "active_backend": active_backend(self.model_id),
+            **({"encoder_cache": {
+                "entries": len(self._encoder_cache),
+                "hits": self.encoder_hits,
+                "misses": self.encoder_misses,
+            }} if self.encoder_cache_size else {}),
+            "max_concurrency": self.max_concurrency,
+            "schedulers": [scheduler.stats() for scheduler in self._schedulers.values()],
+        }
+
+
+# ───────────────────────────────────────────────────────────────
+# 🗂️ Engine Registry
+# ───────────────────────────────────────────────────────────────
+
+ENGINE_SPECS: Dict[str, Dict[str, Any]] = {
+    "grammar": {
+        "model_id": settings.GRAMMAR_MODEL_ID,
+        "task": "text2text-generation",
+        "feature_name": "Grammar Correction",
+        "backend": settings.GRAMMAR_MODEL_BACKEND,
+        "max_batch_size": settings.GRAMMAR_BATCH_SIZE,
+        "max_wait_ms": settings.GRAMMAR_BATCH_MAX_WAIT_MS,
+    },
+    "paraphrase": {
+        "model_id": settings.PARAPHRASE_MODEL_ID,
+        "task": "text2text-generation",
+        "feature_name": "Paraphrasing",
+        "backend": settings.PARAPHRASE_MODEL_BACKEND,
+        "max_batch_size": settings.PARAPHRASE_BATCH_SIZE,
+        "encoder_cache_size": settings.PARAPHRASE_ENCODER_CACHE_SIZE,
+    },
+    "tone": {
+        "model_id": settings.TONE_MODEL_ID,
+        "task": "text-classification",
+        "feature_name": "Tone Classification",
+        "pipeline_kwargs": {"top_k": None},
+        "backend": settings.TONE_MODEL_BACKEND,
+    },
+    "translation": {
+        "model_id": settings.TRANSLATION_MODEL_ID,
+        "task": "translation",
+        "feature_name": "Translation",
+        "backend": settings.TRANSLATION_MODEL_BACKEND,
+    },
+}
+
+_ENGINES: Dict[str, InferenceEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_inference_engine(name: str) -> InferenceEngine:
+    """Returns the process-wide engine for a model, creating it on first use."""
+    engine = _ENGINES.get(name)
+    if engine is None:
+        with _ENGINES_LOCK:
+            engine = _ENGINES.get(name)
+            if engine is None:
+                spec = ENGINE_SPECS[name]
+                engine = InferenceEngine(
+                    name=name,
+                    max_batch_size=spec.get("max_batch_size", settings.INFERENCE_MAX_BATCH_SIZE),
+                    max_wait_ms=spec.get("max_wait_ms", settings.INFERENCE_MAX_WAIT_MS),
+                    max_concurrency=settings.INFERENCE_MAX_CONCURRENCY,
+                    **{k: v for k, v in spec.items() if k not in ("max_batch_size", "max_wait_ms")}
+                )
+                _ENGINES[name] = engine
+    return engine
+
+
+def get_inference_engine_stats() -> List[Dict[str, Any]]:
+    """Returns load state and batching statistics for every engine in this process."""
+    return [engine.stats() for engine in _ENGINES.values()]
@@ -0,0 +1,224 @@
+# === app/services/model_backends.py ===
+"""
+Alternative runtimes for the Hugging Face models.
+
+Each model can run on one of:
+  torch               the full-precision PyTorch model (default)
+  torch-dynamic-int8  the PyTorch model with Linear layers dynamically quantized to int8 (CPU)
+  onnxruntime         an ONNX export run by ONNX Runtime (needs `pip install optimum[onnxruntime]`)
+
+ONNX exports are cached under MODELS_DIR, keyed by model and library
+versions, so the export only happens on first use. int8 models are not
+cached: quantizing the Linear layers is quick next to loading the model, and
+re-quantizing avoids unpickling a whole model object from disk. Any failure
+to convert or load falls back to the PyTorch model, so a missing optional
+dependency never takes a feature down.
+
+Compare latency and memory of the backends with:
+    python -m app.services.model_backends [--models grammar tone] [--backends torch onnxruntime]
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import torch
+import transformers
+
+from app.core.config import settings, APP_NAME, MODELS_DIR, HF_MODEL_CACHE_DIR
+
+logger = logging.getLogger(f"{APP_NAME}.services.model_backends")
+
+BACKENDS = ("torch", "torch-dynamic-int8", "onnxruntime")
+
+ONNX_CACHE_DIR = MODELS_DIR / "onnx"
+
+# model_id -> backend the loaded model actually runs on (differs from the setting after a fallback)
+_ACTIVE_BACKENDS: Dict[str, str] = {}
+_ACTIVE_BACKENDS_LOCK = threading.Lock()
+
+
+def active_backend(model_id: str) -> Optional[str]:
+    return _ACTIVE_BACKENDS.get(model_id)
+
+
+def _artifact_name(model_id: str) -> str:
+    # Converted artifacts are only valid for the library versions that produced them
+    return f"{model_id.replace('/', '--')}-torch{torch.__version__}-transformers{transformers.__version__}"
+
+
+def onnx_artifact_dir(model_id: str) -> Path:
+    return ONNX_CACHE_DIR / _artifact_name(model_id)
+
+
+# ───────────────────────────────────────────────────────────────
+# ⚡ Backend Loaders
+# ───────────────────────────────────────────────────────────────
+
+def _load_dynamic_int8(model_id: str, load_torch_model: Callable[[], Any]) -> Any:
+    start_time = time.perf_counter()
+    model = torch.ao.quantization.quantize_dynamic(load_torch_model(), {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    logger.info(f"Quantized {model_id} to int8 in {time.perf_counter() - start_time:.2f}s (including load)")
+    return model
+
+
+def _ort_model_class(task: str):
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification
+
+    if task == "text-classification":
+        return ORTModelForSequenceClassification
+    if task in ("text2text-generation", "translation"):
+        return ORTModelForSeq2SeqLM
+    raise ValueError(f"No ONNX Runtime model class for task '{task}'")
+
+
+def _load_onnx(model_id: str, task: str) -> Any:
+    model_class = _ort_model_class(task)
+    artifact_dir = onnx_artifact_dir(model_id)
+    if (artifact_dir / "config.json").exists():
+        logger.info(f"Loading ONNX model for {model_id} from {artifact_dir}")
+        return model_class.from_pretrained(artifact_dir)
+
+    logger.info(f"Exporting {model_id} to ONNX (first use only)")
+    model = model_class.from_pretrained(
+        model_id,
+        export=True,
+        cache_dir=HF_MODEL_CACHE_DIR,
+        local_files_only=settings.OFFLINE_MODE
+    )
+    try:
+        ONNX_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=ONNX_CACHE_DIR, prefix=f".{artifact_dir.name}.")
+        try:
+            model.save_pretrained(tmp_dir)
+            os.chmod(tmp_dir, 0o755)
+            # Another worker may have finished the same export first; theirs is kept
+            if not artifact_dir.exists():
+                os.replace(tmp_dir, artifact_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"Saved ONNX model for {model_id} to {artifact_dir}")
+    except OSError as e:
+        logger.warning(f"Could not save ONNX model to {artifact_dir}: {e}")
+    return model
+
+
+def load_model_with_backend(
+    model_id: str, task: str, backend: str, load_torch_model: Callable[[], Any]
+) -> Tuple[Any, str]:
+    """
+    Loads the model on the requested backend. Returns (model, backend used),
+    which is "torch" if the requested backend could not be loaded.
+    """
+    model, used = None, "torch"
+    if backend != "torch":
+        try:
+            if backend == "torch-dynamic-int8":
+                model = _load_dynamic_int8(model_id, load_torch_model)
+            elif backend == "onnxruntime":
+                model = _load_onnx(model_id, task)
+            else:
+                raise ValueError(f"Unknown model backend '{backend}'. Expected one of {', '.join(BACKENDS)}.")
+            used = backend
+        except Exception as e:
+            logger.warning(f"Backend '{backend}' unavailable for {model_id}, falling back to torch: {e}", exc_info=True)
+
+    if model is None:
+        model = load_torch_model()
+    with _ACTIVE_BACKENDS_LOCK:
+        _ACTIVE_BACKENDS[model_id] = used
+    return model, used
+
+
+# ───────────────────────────────────────────────────────────────
+# 📊 Benchmark
+# ───────────────────────────────────────────────────────────────
+
+# Representative call settings per engine, matching how the services submit work
+_BENCHMARK_CALLS: Dict[str, Tuple[Callable[[str], str], Dict[str, Any]]] = {
+    "grammar": (lambda s: s, {"num_beams": 4, "max_new_tokens": 48, "early_stopping": True}),
+    "paraphrase": (lambda s: f"paraphrase: {s} </s>", {"num_beams": 5, "max_new_tokens": 64, "early_stopping": True}),
+    "translation": (lambda s: f">>fr<< {s}", {"num_beams": 1, "max_new_tokens": 64}),
+    "tone": (lambda s: s, {}),
+}
+
+
+def _benchmark_one(engine_name: str, backend: str, sentences, runs: int, batch_size: int, results) -> None:
+    """Runs in a fresh process so peak memory is measured for this backend alone."""
+    import resource
+
+    from app.services.base import load_hf_pipeline
+    from app.services.inference import ENGINE_SPECS
+
+    spec = ENGINE_SPECS[engine_name]
+    make_input, call_kwargs = _BENCHMARK_CALLS[engine_name]
+    inputs = [make_input(s) for s in sentences[:batch_size]]
+    try:
+        start = time.perf_counter()
+        pipe = load_hf_pipeline(
+            spec["model_id"], spec["task"], spec["feature_name"], backend=backend, **spec.get("pipeline_kwargs", {})
+        )
+        load_s = time.perf_counter() - start
+        pipe(inputs[:1], **call_kwargs)  # Warm-up
+
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            pipe(inputs, **call_kwargs)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results.put({
+            "model": engine_name,
+            "backend": backend,
+            "active_backend": active_backend(spec["model_id"]),
+            "load_s": round(load_s, 2),
+            "batch_p50_ms": round(timings[len(timings) // 2] * 1000, 1),
+            "batch_p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 1),
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+    except Exception as e:
+        results.put({"model": engine_name, "backend": backend, "error": str(e)})
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    from app.core.logging import configure_logging
+    from app.utils.grammar_prefilter import load_benchmark_corpus
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Compare latency and memory of the model backends.")
+    parser.add_argument("--models", nargs="+", default=list(_BENCHMARK_CALLS), choices=list(_BENCHMARK_CALLS))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    sentences = [text for text, _ in load_benchmark_corpus()]
+    context = multiprocessing.get_context("spawn")
+    columns = ("model", "backend", "active_backend", "load_s", "batch_p50_ms", "batch_p95_ms", "peak_rss_mb")
+    print(" ".join(f"{c:>14}" for c in columns))
+    for engine_name in args.models:
+        for backend in args.backends:
+            queue = context.Queue()
+            process = context.Process(
+                target=_benchmark_one, args=(engine_name, backend, sentences, args.runs, args.batch_size, queue)
+            )
+            process.start()
+            process.join()
+            try:
+                row = queue.get(timeout=5)
+            except Exception:
+                row = {"model": engine_name, "backend": backend, "error": f"exited with code {process.exitcode}"}
+            if "error" in row:
+                print(f"{engine_name:>14} {backend:>14} failed: {row['error']}")
+            else:
+                print(" ".join(f"{str(row[c]):>14}" for c in columns))
@@ -0,0 +1,186 @@
+# === app/services/model_host.py ===
+"""
+Dedicated model-host process.
+
+With MODEL_SERVING_MODE="host", HTTP workers don't load any Hugging Face
+models. Their InferenceEngines forward each batch over a local Unix socket to
+this process, which holds one copy of every model. Node memory then grows with
+the number of models rather than with the number of uvicorn workers. Batches
+arriving from different workers are coalesced again by the host's own engines.
+
+Run with:  python -m app.services.model_host
+The host and its workers must share MODEL_HOST_AUTHKEY. Connections are
+authenticated before anything is unpickled, so the key must be secret; there
+is deliberately no default.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings, APP_NAME
+from app.core.exceptions import ModelHostUnavailableError, ModelNotDownloadedError, ServiceError
+
+logger = logging.getLogger(f"{APP_NAME}.services.model_host")
+
+
+def _authkey() -> bytes:
+    if not settings.MODEL_HOST_AUTHKEY:
+        raise ServiceError(
+            status_code=500,
+            detail="MODEL_HOST_AUTHKEY must be set (to the same secret) for the model host and its workers."
+        )
+    return settings.MODEL_HOST_AUTHKEY.encode("utf-8")
+
+
+# ───────────────────────────────────────────────────────────────
+# 📡 Client (used by HTTP workers)
+# ───────────────────────────────────────────────────────────────
+
+class ModelHostClient:
+    """
+    Blocking client for the model host. It keeps a small pool of connections
+    so that concurrent engine threads don't serialize on a single socket.
+
+    Once the host can't be reached, calls fail fast with
+    ModelHostUnavailableError for `retry_after` seconds instead of each
+    waiting out the connect timeout again.
+    """
+
+    def __init__(self, address: str, pool_size: int = 4, connect_timeout: float = 10.0, retry_after: float = 30.0):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.retry_after = retry_after
+        self._pool: "queue.LifoQueue[Connection]" = queue.LifoQueue(maxsize=pool_size)
+        self._unavailable_until = 0.0
+
+    def _mark_unavailable(self, detail: str) -> ModelHostUnavailableError:
+        self._unavailable_until = time.monotonic() + self.retry_after
+        return ModelHostUnavailableError(detail)
+
+    def _connect(self) -> Connection:
+        if time.monotonic() < self._unavailable_until:
+            raise ModelHostUnavailableError(f"Model host at {self.address} was unreachable; retrying later.")
+        authkey = _authkey()
+        # The host may still be starting; retry until the socket accepts connections
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=authkey)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() >= deadline:
+                    raise self._mark_unavailable(f"Model host is not reachable at {self.address}: {e}")
+                time.sleep(0.2)
+
+    def run_batch(self, engine_name: str, items: List[Any], call_kwargs: Dict[str, Any]) -> List[Any]:
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        try:
+            conn.send((engine_name, items, call_kwargs))
+            reply = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise self._mark_unavailable(f"Lost connection to model host: {e}") from e
+
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+        status, payload = reply
+        if status == "ok":
+            return payload
+        if payload.get("error_type") == "ModelNotDownloaded":
+            raise ModelNotDownloadedError(payload["model_id"], payload["feature_name"], payload["detail"])
+        raise ServiceError(
+            status_code=payload.get("status_code", 500),
+            detail=payload.get("detail", "Model host error."),
+            error_type=payload.get("error_type", "ServiceError")
+        )
+
+
+_client: Optional[ModelHostClient] = None
+_client_lock = threading.Lock()
+
+
+def get_model_host_client() -> ModelHostClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ModelHostClient(
+                    settings.MODEL_HOST_SOCKET,
+                    pool_size=settings.MODEL_HOST_POOL_SIZE,
+                    connect_timeout=settings.MODEL_HOST_CONNECT_TIMEOUT_SECONDS,
+                    retry_after=settings.MODEL_HOST_RETRY_SECONDS
+                )
+    return _client
+
+
+# ───────────────────────────────────────────────────────────────
+# 🏠 Server (the model-host process)
+# ───────────────────────────────────────────────────────────────
+
+def _error_payload(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, ServiceError):
+        return e.to_dict()
+    return {"detail": str(e), "status_code": 500, "error_type": type(e).__name__}
+
+
+def _handle_connection(conn: Connection, loop: asyncio.AbstractEventLoop) -> None:
+    from app.services.inference import get_inference_engine
+
+    with conn:
+        while True:
+            try:
+                engine_name, items, call_kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                future = asyncio.run_coroutine_threadsafe(
+                    get_inference_engine(engine_name).submit_many(items, **call_kwargs), loop
+                )
+                conn.send(("ok", future.result()))
+            except Exception as e:
+                logger.error(f"Model host failed on '{engine_name}' batch: {e}", exc_info=True)
+                conn.send(("error", _error_payload(e)))
+
+
+def serve(address: str = None) -> None:
+    """Accepts worker connections on a Unix socket and serves batches until killed."""
+    address = address or settings.MODEL_HOST_SOCKET
+    authkey = _authkey()
+    # Engines inside the host must run their models locally, never forward again
+    settings.MODEL_SERVING_MODE = "local"
+
+    if os.path.exists(address):
+        os.unlink(address)
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="model-host-loop", daemon=True).start()
+
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        logger.info(f"Model host listening on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected model host connection: {e}")
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, loop), daemon=True).start()
+
+
+if __name__ == "__main__":
+    from app.core.logging import configure_logging
+
+    configure_logging()
+    serve()
@@ -1,11 +1,11 @@
 import logging
 import asyncio
-from functools import lru_cache
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 
-from app.services.base import load_hf_pipeline
+from app.services.inference import get_inference_engine
 from app.core.config import settings, APP_NAME
 from app.core.exceptions import ServiceError
+from app.utils.sentence_cache import SentenceResultCache, get_sentence_cache
 from app.utils.text_splitter import split_text_into_sentences
 
 logger = logging.getLogger(f"{APP_NAME}.services.paraphrase")
@@ -13,51 +13,98 @@ logger = logging.getLogger(f"{APP_NAME}.services.paraphrase")
 
 class Paraphraser:
     def __init__(self):
-        self._pipeline = None
-
-    @lru_cache(maxsize=1)
-    def _get_pipeline(self):
-        if self._pipeline is None:
-            logger.info("Loading paraphrasing pipeline...")
-            self._pipeline = load_hf_pipeline(
-                model_id=settings.PARAPHRASE_MODEL_ID,
-                task="text2text-generation",
-                feature_name="Paraphrasing"
-            )
-        return self._pipeline
+        self._engine = None
+        self.batch_size = max(1, settings.PARAPHRASE_BATCH_SIZE)
+        # Variants per (sentence, generation settings), so asking again for one
+        # sentence never re-paraphrases the rest of the document
+        self.cache = get_sentence_cache("paraphrase", max_entries=settings.SENTENCE_CACHE_MAX_ENTRIES)
+
+    def _get_engine(self):
+        if self._engine is None:
+            self._engine = get_inference_engine("paraphrase")
+        return self._engine
+
+    @staticmethod
+    def _generation_kwargs(num_sequences: int) -> dict:
+        return {
+            "max_length": 256,
+            "num_beams": max(5, num_sequences),
+            "num_return_sequences": num_sequences,
+            "early_stopping": True
+        }
 
-    async def paraphrase(self, text: str, return_multiple: bool = False) -> Dict[str, Union[str, List[Dict[str, str]]]]:
+    def _cache_key(self, sentence: str, num_sequences: int) -> str:
+        settings_key = ",".join(f"{k}={v}" for k, v in sorted(self._generation_kwargs(num_sequences).items()))
+        return SentenceResultCache.make_key(sentence, settings.PARAPHRASE_MODEL_ID, settings_key)
+
+    @staticmethod
+    def _variants(result_entry, fallback: str) -> List[str]:
+        # One output per prompt: a dict for a single sequence, a list of dicts for several
+        if isinstance(result_entry, dict):
+            result_entry = [result_entry]
+        return [
+            (r.get("generated_text") or r.get("translation_text") or r.get("text") or fallback).strip()
+            for r in result_entry
+        ]
+
+    async def _paraphrase_sentences(self, sentences: List[str], num_sequences: int) -> Dict[str, List[str]]:
+        """
+        Returns the variants for every distinct sentence: cached ones directly,
+        the rest streamed through the model `batch_size` sentences at a time, so
+        a long text never puts all of its sentences (times the beams) in flight.
+        """
+        engine = self._get_engine()
+        variants: Dict[str, List[str]] = {}
+        uncached = []
+        for sentence in dict.fromkeys(sentences):
+            cached = self.cache.get(self._cache_key(sentence, num_sequences))
+            if cached is not None:
+                variants[sentence] = cached
+            else:
+                uncached.append(sentence)
+
+        for start in range(0, len(uncached), self.batch_size):
+            window = uncached[start:start + self.batch_size]
+            results = await engine.submit_many(
+                [f"paraphrase: {sentence} </s>" for sentence in window],
+                **self._generation_kwargs(num_sequences)
+            )
+            for sentence, result_entry in zip(window, results):
+                variants[sentence] = self._variants(result_entry, sentence)
+                self.cache.put(self._cache_key(sentence, num_sequences), variants[sentence])
+        return variants
+
+    async def paraphrase(
+        self, text: str, return_multiple: bool = False, num_variants: Optional[int] = None
+    ) -> Dict[str, Union[str, List[Dict[str, str]]]]:
+        """
+        Paraphrases every sentence. With `return_multiple`, each sentence gets
+        `num_variants` alternatives (3 by default). Asking for more alternatives
+        for a sentence that was just paraphrased reuses its encoder pass.
+        """
         text = text.strip()
         if not text:
             raise ServiceError(status_code=400, detail="Input text is empty for paraphrasing.")
 
-        pipeline = self._get_pipeline()
-
         # Support both sync and async sentence splitter
         if asyncio.iscoroutinefunction(split_text_into_sentences):
             sentence_chunks = await split_text_into_sentences(text)
         else:
             sentence_chunks = split_text_into_sentences(text)
+        sentence_chunks = [chunk.text if hasattr(chunk, "text") else chunk for chunk in sentence_chunks]
 
         paraphrased_sentences = []
         structured_results = []
-
-        prompts = [f"paraphrase: {chunk.strip()} </s>" if chunk.strip() else "" for chunk in sentence_chunks]
+        num_sequences = min(num_variants or 3, settings.PARAPHRASE_MAX_VARIANTS) if return_multiple else 1
 
         try:
-            results = await asyncio.to_thread(
-                pipeline,
-                prompts,
-                max_length=256,
-                num_beams=5,
-                num_return_sequences=3 if return_multiple else 1,
-                early_stopping=True
+            variants = await self._paraphrase_sentences(
+                [chunk.strip() for chunk in sentence_chunks if chunk.strip()], num_sequences
             )
         except Exception as e:
             logger.error(f"Paraphrasing pipeline error: {e}", exc_info=True)
             raise ServiceError(status_code=500, detail="An error occurred during paraphrasing.") from e
 
-        # Handle both single and multiple return_sequences
         for idx, chunk in enumerate(sentence_chunks):
             original = chunk.strip()
             if not original:
@@ -66,25 +113,18 @@ class Paraphraser:
                 continue
 
             try:
-                result_entry = results[idx * (3 if return_multiple else 1):(idx + 1) * (3 if return_multiple else 1)]
-
+                paraphrases = variants[original]
                 if return_multiple:
-                    paraphrases = [
-                        r.get("generated_text") or r.get("translation_text") or r.get("text") or chunk
-                        for r in result_entry
-                    ]
                     structured_results.append({
                         "original": original,
                         "paraphrased_variants": paraphrases
                     })
-                    paraphrased_sentences.append(paraphrases[0].strip())
                 else:
-                    single_output = result_entry[0].get("generated_text") or result_entry[0].get("translation_text") or result_entry[0].get("text") or chunk
                     structured_results.append({
                         "original": original,
-                        "paraphrased": single_output.strip()
+                        "paraphrased": paraphrases[0]
                     })
-                    paraphrased_sentences.append(single_output.strip())
+                paraphrased_sentences.append(paraphrases[0])
 
             except Exception as e:
                 logger.warning(f"Paraphrasing fallback for sentence {idx + 1}: '{original[:50]}...' due to error: {e}", exc_info=True)
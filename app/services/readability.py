@@ -1,11 +1,15 @@
-import textstat
 import logging
-import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+import numpy as np
 
 from app.core.config import APP_NAME
 from app.core.exceptions import ServiceError
 from app.utils.text_splitter import split_text_into_sentences, SentenceSegment
+from app.utils.analysis_context import AnalysisContext, resolve_context
+from app.utils.line_index import LineIndex
+from app.utils.cancellation import AnalysisCancelled, checkpoint, run_blocking
+from app.utils.readability_engine import SCORE_NAMES, SENTENCE_SCORE_NAMES, readability_scores, sentence_statistics
 
 logger = logging.getLogger(f"{APP_NAME}.services.readability")
 
@@ -15,28 +19,69 @@ DIFFICULT_THRESHOLD = 60.0
 class ReadabilityScorer:
     """
     Computes overall readability and flags hard-to-read sentences for highlighting,
-    using sentence offsets from spaCy-based splitter.
+    using sentence offsets from spaCy-based splitter. The text is tokenized once;
+    document and per-sentence scores come from the same count arrays.
     """
 
-    def _run_scoring(self, text: str) -> Dict[str, Any]:
+    def _run_scoring(self, text: str, segments: List[SentenceSegment]) -> Dict[str, Any]:
+        checkpoint()
+        counts = sentence_statistics(text, [seg.start for seg in segments])
+        has_words = counts["words"] > 0
+        totals = {name: int(values.sum()) for name, values in counts.items()}
+        sentence_count = int(has_words.sum())
+
         # Overall stats
         stats = {
-            "sentence_count": textstat.sentence_count(text),
-            "word_count": textstat.lexicon_count(text, removepunct=True),
-            "syllable_count": textstat.syllable_count(text),
-            "average_words_per_sentence": round(textstat.avg_sentence_length(text), 2),
+            "sentence_count": sentence_count,
+            "word_count": totals["words"],
+            "syllable_count": totals["syllables"],
+            "average_words_per_sentence": round(totals["words"] / sentence_count, 2) if sentence_count else 0.0,
         }
 
         # Detailed overall scores (per-document)
-        detailed = {}
-        score = textstat.flesch_reading_ease(text)
-        detailed["flesch_reading_ease"] = {
-            "score": round(score, 2),
-            "interpretation": self._interpret(score),
-        }
+        document_scores = readability_scores(sentences=sentence_count, **totals)
+        detailed = {name: {"score": round(float(document_scores[name]), 2)} for name in SCORE_NAMES}
+        score = detailed["flesch_reading_ease"]["score"]
+        detailed["flesch_reading_ease"]["interpretation"] = self._interpret(score)
 
         summary = {"level": detailed["flesch_reading_ease"]["interpretation"]}
-        return {"statistics": stats, "overall_summary": summary, "detailed_scores": detailed}
+        result = {"statistics": stats, "overall_summary": summary, "detailed_scores": detailed}
+
+        checkpoint()
+        # Every sentence is scored in one pass; sentences without words are never flagged
+        sentence_scores = readability_scores(sentences=np.ones(len(segments)), **counts)
+        difficult = np.flatnonzero(has_words & (sentence_scores["flesch_reading_ease"] < DIFFICULT_THRESHOLD))
+        line_index = LineIndex(text)
+        result["readability_issues"] = [
+            self._issue(text, segments[i], line_index, {name: float(sentence_scores[name][i]) for name in SENTENCE_SCORE_NAMES})
+            for i in difficult
+        ]
+        return result
+
+    def _issue(self, text: str, seg: SentenceSegment, line_index: LineIndex, scores: Dict[str, float]) -> Dict[str, Any]:
+        sent_text = seg.text
+        sent_score = scores["flesch_reading_ease"]
+        line, column = line_index.line_col(seg.start)
+        return {
+            "offset": seg.start,
+            "length": seg.end - seg.start,
+            "original_segment": sent_text,
+            "context_before": text[max(0, seg.start - 20) : seg.start],
+            "context_after": text[seg.end : seg.end + 20],
+            "full_original_sentence_context": sent_text,
+            "display_context": (
+                f"{text[max(0, seg.start-20):seg.start]}"
+                f"<span class='highlight'>{sent_text}</span>"
+                f"{text[seg.end:seg.end+20]}"
+            ),
+            "message": f"Sentence readability score {round(sent_score,2)} is below threshold.",
+            "type": "Readability",
+            "line": line,
+            "column": column,
+            "severity": "Moderate",
+            "explanation": "This sentence may be difficult to read. Consider simplifying.",
+            "scores": {name: round(value, 2) for name, value in scores.items()},
+        }
 
     def _interpret(self, score: float) -> str:
         # Simplified interpretation matching Hemingway levels
@@ -54,50 +99,23 @@ class ReadabilityScorer:
             return "Difficult"
         return "Very Difficult"
 
-    async def compute(self, text: str) -> Dict[str, Any]:
+    async def compute(self, text: str, context: Optional[AnalysisContext] = None) -> Dict[str, Any]:
         text = text.strip()
         if not text:
             return {"statistics": {}, "overall_summary": {}, "detailed_scores": {}, "readability_issues": []}
 
         try:
-            # Overall readability
-            result = await asyncio.to_thread(self._run_scoring, text)
-
-            # Sentence-level analysis using spaCy splitter
-            segments: List[SentenceSegment] = split_text_into_sentences(text)
-            issues = []
-            for seg in segments:
-                sent_text = seg.text
-                sent_score = textstat.flesch_reading_ease(sent_text)
-                if sent_score < DIFFICULT_THRESHOLD:
-                    # line/column
-                    before = text[: seg.start]
-                    line = before.count("\n") + 1
-                    column = seg.start - (before.rfind("\n") + 1) + 1
-
-                    issues.append({
-                        "offset": seg.start,
-                        "length": seg.end - seg.start,
-                        "original_segment": sent_text,
-                        "context_before": text[max(0, seg.start - 20) : seg.start],
-                        "context_after": text[seg.end : seg.end + 20],
-                        "full_original_sentence_context": sent_text,
-                        "display_context": (
-                            f"{text[max(0, seg.start-20):seg.start]}"
-                            f"<span class='highlight'>{sent_text}</span>"
-                            f"{text[seg.end:seg.end+20]}"
-                        ),
-                        "message": f"Sentence readability score {round(sent_score,2)} is below threshold.",
-                        "type": "Readability",
-                        "line": line,
-                        "column": column,
-                        "severity": "Moderate",
-                        "explanation": "This sentence may be difficult to read. Consider simplifying."
-                    })
-
-            result["readability_issues"] = issues
-            return result
+            # Sentence offsets from the shared parse or the spaCy splitter
+            context = resolve_context(context, text)
+            if context:
+                segments: List[SentenceSegment] = context.sentences
+            else:
+                segments = await run_blocking(split_text_into_sentences, text)
+
+            return await run_blocking(self._run_scoring, text, segments)
 
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error computing readability for text: '{text[:50]}...'", exc_info=True)
             raise ServiceError(status_code=500, detail="Internal readability error.") from e
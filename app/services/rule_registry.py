@@ -0,0 +1,163 @@
+# === app/services/rule_registry.py ===
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings, APP_NAME
+
+logger = logging.getLogger(f"{APP_NAME}.services.rule_registry")
+
+T = TypeVar("T")
+
+# (file name, mtime in ns, size) for every watched file; None for a missing one
+FileSignature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+@dataclass(frozen=True)
+class RuleSnapshot(Generic[T]):
+    """One fully built rule set. Never mutated; a reload replaces it with a new snapshot."""
+    name: str
+    version: str
+    rules: T
+    loaded_at: float
+
+
+class _Entry:
+    def __init__(self, name: str, files: Callable[[], List[Path]], build: Callable[[], Tuple[str, Any]]):
+        self.name = name
+        self.files = files
+        self.build = build
+        self.snapshot: Optional[RuleSnapshot] = None
+        self.signature: Optional[FileSignature] = None
+        self.build_lock = threading.Lock()  # Held only while this entry's first build runs
+        self.checked_at = 0.0
+        self.reloading = False
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+
+
+class RuleRegistry:
+    """
+    Process-wide holder of rule sets that can change on disk while the app runs.
+
+    Each rule set is registered with a function listing its files and one that
+    builds it, returning (version, rules). Readers call `get()` once per request
+    and use that snapshot throughout, so a reload can never hand them a
+    half-built rule set. At most every `poll_seconds`, `get()` stats the files;
+    if they changed, the new rule set is built on a background thread while
+    readers keep getting the old snapshot, then swapped in by replacing one
+    reference (copy-on-write).
+
+    Builds never run under the registry-wide lock, which only guards entry
+    bookkeeping, so a slow build doesn't hold up other rule sets. A build runs
+    concurrently with requests that use the previous snapshot, so it must not
+    mutate anything those requests share (e.g. build matchers on a private
+    spaCy vocab, not the one requests parse with).
+    """
+
+    def __init__(self, poll_seconds: float = 5.0, enabled: bool = True):
+        self.poll_seconds = poll_seconds
+        self.enabled = enabled
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(files: List[Path]) -> FileSignature:
+        signature = []
+        for path in sorted(files):
+            try:
+                stat = path.stat()
+                signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((str(path), None, None))
+        return tuple(signature)
+
+    def register(
+        self,
+        name: str,
+        files: Callable[[], List[Path]],
+        build: Callable[[], Tuple[str, T]]
+    ) -> RuleSnapshot[T]:
+        """
+        Registers a rule set and builds it synchronously if it isn't loaded yet.
+        Registering an existing name returns the current snapshot. Concurrent
+        first registrations of one name wait for a single build.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = _Entry(name, files, build)
+                self._entries[name] = entry
+        if entry.snapshot is None:
+            with entry.build_lock:
+                if entry.snapshot is None:
+                    signature = self._signature(entry.files())
+                    version, rules = entry.build()
+                    with self._lock:
+                        entry.signature = signature
+                        entry.snapshot = RuleSnapshot(name, version, rules, time.time())
+                        entry.checked_at = time.monotonic()
+                    logger.info(f"Loaded rule set '{name}' version {version}")
+        return entry.snapshot
+
+    def get(self, name: str) -> RuleSnapshot:
+        """Returns the active snapshot, starting a background reload if the files changed."""
+        entry = self._entries[name]
+        if self.enabled and time.monotonic() - entry.checked_at >= self.poll_seconds:
+            self._check(entry)
+        return entry.snapshot
+
+    def _check(self, entry: _Entry) -> None:
+        with self._lock:
+            if entry.reloading or time.monotonic() - entry.checked_at < self.poll_seconds:
+                return
+            entry.checked_at = time.monotonic()
+            signature = self._signature(entry.files())
+            if signature == entry.signature:
+                return
+            entry.reloading = True
+        threading.Thread(
+            target=self._reload, args=(entry, signature), name=f"rules-reload-{entry.name}", daemon=True
+        ).start()
+
+    def _reload(self, entry: _Entry, signature: FileSignature) -> None:
+        try:
+            start_time = time.time()
+            version, rules = entry.build()
+            snapshot = RuleSnapshot(entry.name, version, rules, time.time())
+            with self._lock:
+                entry.snapshot = snapshot
+                entry.signature = signature
+                entry.reloads += 1
+                entry.last_error = None
+            logger.info(f"Reloaded rule set '{entry.name}' version {version} in {time.time() - start_time:.2f} seconds")
+        except Exception as e:
+            # Keep serving the last good rule set; the next change will retry
+            with self._lock:
+                entry.signature = signature
+                entry.failed_reloads += 1
+                entry.last_error = str(e)
+            logger.error(f"Reloading rule set '{entry.name}' failed, keeping version {entry.snapshot.version}: {e}", exc_info=True)
+        finally:
+            entry.reloading = False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": entry.name,
+                "version": entry.snapshot.version if entry.snapshot else None,
+                "loaded_at": entry.snapshot.loaded_at if entry.snapshot else None,
+                "reloads": entry.reloads,
+                "failed_reloads": entry.failed_reloads,
+                "last_error": entry.last_error,
+            }
+            for entry in self._entries.values()
+        ]
+
+
+rule_registry = RuleRegistry(poll_seconds=settings.RULE_RELOAD_POLL_SECONDS, enabled=settings.RULE_HOT_RELOAD)
@@ -1,8 +1,9 @@
 import logging
 import asyncio
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
 from functools import lru_cache
-from collections import defaultdict, Counter
+from collections import defaultdict
 
 from app.services.base import (
     load_spacy_model,
@@ -16,22 +17,27 @@ from app.core.config import (
     SENTENCE_TRANSFORMER_MODEL_ID
 )
 from app.core.exceptions import ServiceError
+from app.utils.sentence_cache import SentenceResultCache, get_sentence_cache
+from app.utils.embedding_cache import get_embedding_cache
+from app.utils.analysis_context import AnalysisContext, resolve_context
+from app.utils.synonym_index import SynonymIndex
+from app.utils.word_frequency import brown_frequencies
+from app.utils.word_embedding_index import WordEmbeddingIndex, index_dir_for, span_embeddings
+from app.utils.cancellation import AnalysisCancelled, checkpoint, run_blocking
 
-from sentence_transformers.util import cos_sim
+import numpy as np
 import nltk.corpus
-from nltk.corpus import brown, wordnet as wn
+from nltk.corpus import wordnet as wn
 
 logger = logging.getLogger(f"{APP_NAME}.services.synonyms")
 
 CONTENT_POS_TAGS = {"NOUN", "VERB", "ADJ", "ADV"}
 
-# Precompute frequency distribution from Brown corpus
-WORD_FREQ = Counter(brown.words())
-TOTAL_WORDS = sum(WORD_FREQ.values())
+# Sentences rich in content words, for comparing the ranking modes (see __main__)
+BENCHMARK_CORPUS_PATH = Path(__file__).parent.parent / "data" / "benchmarks" / "synonyms.jsonl"
 
 def is_low_value_word(word: str, threshold: float = 0.0005) -> bool:
-    frequency = WORD_FREQ[word.lower()] / TOTAL_WORDS
-    return frequency > threshold
+    return brown_frequencies().frequency(word.lower()) > threshold
 
 def meaning_overlap(w1: str, w2: str, pos: str) -> bool:
     syns1 = wn.synsets(w1, pos=pos)
@@ -42,22 +48,37 @@ def meaning_overlap(w1: str, w2: str, pos: str) -> bool:
 
 class SynonymSuggester:
     def __init__(self):
-        try:
-            ensure_nltk_resource("wordnet")
-        except RuntimeError as e:
-            logger.error(f"NLTK WordNet not available: {e}")
-            raise ServiceError(status_code=500, detail=f"Required NLTK resource (WordNet) is not available: {e}")
+        # WordNet itself is only needed when the precomputed index hasn't been built
+        self.synonym_index = SynonymIndex(Path(settings.SYNONYM_INDEX_PATH))
+        if not self.synonym_index.available:
+            try:
+                ensure_nltk_resource("wordnet")
+            except RuntimeError as e:
+                logger.error(f"NLTK WordNet not available: {e}")
+                raise ServiceError(status_code=500, detail=f"Required NLTK resource (WordNet) is not available: {e}")
 
         self.SPACY_TO_WORDNET_POS = {
-            "NOUN": wn.NOUN,
-            "VERB": wn.VERB,
-            "ADJ": wn.ADJ,
-            "ADV": wn.ADV,
+            "NOUN": "n",
+            "VERB": "v",
+            "ADJ": "a",
+            "ADV": "r",
         }
 
+        # Precomputed vocabulary vectors for the "fast" ranking mode
+        self.word_embeddings = WordEmbeddingIndex(
+            index_dir_for(Path(settings.WORD_EMBEDDING_INDEX_DIR), SENTENCE_TRANSFORMER_MODEL_ID)
+        )
+
         self._sentence_model = None
         self._nlp = None
 
+        # Per-sentence suggestions with sentence-relative offsets.
+        self.cache = get_sentence_cache("synonyms", max_entries=settings.SENTENCE_CACHE_MAX_ENTRIES)
+        # Sentence vectors, shared with any other feature using the same model
+        self.embedding_cache = get_embedding_cache(
+            SENTENCE_TRANSFORMER_MODEL_ID, max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
+        )
+
     def _get_sentence_model(self):
         if self._sentence_model is None:
             logger.info("Loading SentenceTransformer model for synonym comparison...")
@@ -80,17 +101,210 @@ class SynonymSuggester:
         }
         return sorted(synonyms)
 
+    @lru_cache(maxsize=5000)
+    def _get_wordnet_candidates_cached(self, word: str, pos: str) -> Tuple[str, ...]:
+        """Live WordNet lookup, used only when the synonym index isn't available."""
+        return tuple(
+            synonym for synonym in self._get_wordnet_synonyms_cached(word, pos)
+            if meaning_overlap(word, synonym, pos)
+        )
+
+    def _synonyms_for(self, token, pos: str) -> Tuple[str, ...]:
+        """Synonyms of the token that share definition words with it."""
+        if not self.synonym_index.available:
+            return self._get_wordnet_candidates_cached(token.text, pos)
+        # The index is keyed by WordNet lemma; inflected forms are found through spaCy's lemma
+        word = token.lower_
+        for form in (word, token.lemma_.lower()):
+            synonyms = self.synonym_index.get(form, pos)
+            if synonyms is not None:
+                return tuple(synonym for synonym in synonyms if synonym != word)
+        return ()
+
+    def _candidates(self, sent, tokens) -> Tuple[List[str], List[Tuple[Any, str]]]:
+        """Builds every single-word synonym substitution of the sentence worth scoring."""
+        original_sent = sent.text
+        sent_start = sent.start_char
+        altered_sents = []
+        key_map = []
+
+        for token in tokens:
+            wordnet_pos = self.SPACY_TO_WORDNET_POS.get(token.pos_)
+            if not wordnet_pos:
+                continue
+
+            synonyms = self._synonyms_for(token, wordnet_pos)
+            if not synonyms:
+                continue
+
+            token_start_in_sent = token.idx - sent_start
+            token_end_in_sent = token.idx - sent_start + len(token)
+
+            for synonym in synonyms:
+                candidate_sentence = (
+                    original_sent[:token_start_in_sent] + synonym + original_sent[token_end_in_sent:]
+                )
+                altered_sents.append(candidate_sentence)
+                key_map.append((token, synonym))
+
+        return altered_sents, key_map
+
+    def _shortlist(
+        self, sentences: List[Tuple[Any, List[Any]]], candidates: List[Tuple[List[str], List[Tuple[Any, str]]]], sentence_model
+    ) -> List[Tuple[List[str], List[Tuple[Any, str]]]]:
+        """
+        Fast ranking: keeps, per word, the SYNONYM_FAST_RERANK_K candidates whose
+        precomputed vectors are closest to the word's contextual embedding, so
+        only those substituted sentences get encoded in full.
+        """
+        active = [i for i, (altered_sents, _) in enumerate(candidates) if altered_sents]
+        if not active:
+            return candidates
+
+        spans = []
+        for i in active:
+            sent_start = sentences[i][0].start_char
+            spans.append([(token.idx - sent_start, token.idx - sent_start + len(token)) for token, _ in candidates[i][1]])
+        contexts = span_embeddings(
+            sentence_model, [sentences[i][0].text for i in active], spans, settings.SENTENCE_TRANSFORMER_BATCH_SIZE
+        )
+
+        k = max(1, settings.SYNONYM_FAST_RERANK_K)
+        shortlisted = list(candidates)
+        for i, sentence_contexts in zip(active, contexts):
+            altered_sents, key_map = candidates[i]
+            scores = self.word_embeddings.similarities([synonym for _, synonym in key_map], sentence_contexts)
+            by_token = defaultdict(list)
+            for j, (token, _) in enumerate(key_map):
+                by_token[token.i].append(j)
+            keep = sorted(j for js in by_token.values() for j in sorted(js, key=lambda j: -scores[j])[:k])
+            shortlisted[i] = ([altered_sents[j] for j in keep], [key_map[j] for j in keep])
+        return shortlisted
+
+    @staticmethod
+    def _rank(
+        sent, key_map: List[Tuple[Any, str]], similarities: np.ndarray, similarity_threshold: float, top_n: int
+    ) -> List[Dict[str, Any]]:
+        """Turns scored substitutions into suggestions, with offsets relative to the sentence start."""
+        sent_start = sent.start_char
+        scores_by_token = {}
+        for (token, synonym), similarity in zip(key_map, similarities):
+            if similarity_threshold <= similarity < 0.98 and synonym.lower() != token.text.lower():
+                scores_by_token.setdefault(token.i, (token, []))[1].append((float(similarity), synonym))
+
+        sentence_suggestions = []
+        for token, scores in scores_by_token.values():
+            sorted_unique = []
+            seen = set()
+            for _, suggestion in sorted(scores, key=lambda x: x[0], reverse=True):
+                if suggestion not in seen:
+                    sorted_unique.append(suggestion)
+                    seen.add(suggestion)
+                if len(sorted_unique) >= top_n:
+                    break
+            sentence_suggestions.append({
+                "original_word": token.text,
+                "start_char": token.idx - sent_start,
+                "end_char": token.idx - sent_start + len(token),
+                "suggestions": sorted_unique,
+                "context": sent.text,
+                "pos": token.pos_
+            })
+
+        return sentence_suggestions
+
+    def _suggest_for_sentences(
+        self,
+        sentences: List[Tuple[Any, List[Any]]],
+        sentence_model,
+        similarity_threshold: float,
+        top_n: int,
+        ranking: str = "accurate"
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Returns suggestions for each (sentence, candidate tokens) pair. Every
+        original and substituted sentence of the batch not already in the
+        embedding cache is encoded in one batch, and all similarities come
+        from one row-wise dot product of normalized embeddings (i.e. cosine
+        similarity). With "fast" ranking only the shortlisted substitutions
+        are encoded. Blocking; run it on a worker thread.
+        """
+        candidates = []
+        for sent, tokens in sentences:
+            checkpoint()
+            candidates.append(self._candidates(sent, tokens) if tokens else ([], []))
+        if ranking == "fast":
+            candidates = self._shortlist(sentences, candidates, sentence_model)
+        active = [i for i, (altered_sents, _) in enumerate(candidates) if altered_sents]
+        if not active:
+            return [[] for _ in sentences]
+
+        originals = [sentences[i][0].text for i in active]
+        altered = [text for i in active for text in candidates[i][0]]
+        # Row k of `altered` was built from original number owner[k]
+        owner = np.repeat(np.arange(len(active)), [len(candidates[i][0]) for i in active])
+
+        def encode(texts: List[str]) -> np.ndarray:
+            # In chunks, so a cancelled analysis stops between them rather than after the whole batch
+            chunk = settings.SENTENCE_TRANSFORMER_BATCH_SIZE * 4
+            parts = []
+            for start in range(0, len(texts), chunk):
+                checkpoint()
+                parts.append(sentence_model.encode(
+                    texts[start:start + chunk],
+                    batch_size=settings.SENTENCE_TRANSFORMER_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ))
+            return np.concatenate(parts)
+
+        embeddings = self.embedding_cache.encode(
+            originals + altered, encode, SENTENCE_TRANSFORMER_MODEL_ID, variant="normalized"
+        )
+        original_embeddings, altered_embeddings = embeddings[:len(originals)], embeddings[len(originals):]
+        similarities = np.einsum("ij,ij->i", altered_embeddings, original_embeddings[owner])
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in sentences]
+        offset = 0
+        for i in active:
+            key_map = candidates[i][1]
+            results[i] = self._rank(
+                sentences[i][0], key_map, similarities[offset:offset + len(key_map)], similarity_threshold, top_n
+            )
+            offset += len(key_map)
+        return results
+
     async def suggest(
-        self, text: str, similarity_threshold: float = 0.6, top_n: int = 5
-    ) -> Dict[str, List[Dict]]:
+        self,
+        text: str,
+        similarity_threshold: float = 0.6,
+        top_n: int = 5,
+        context: Optional[AnalysisContext] = None,
+        ranking: Optional[str] = None
+    ) -> Dict[str, Any]:
         text = text.strip()
         if not text:
             raise ServiceError(status_code=400, detail="Input text is empty for synonym suggestion.")
 
+        ranking = ranking or settings.SYNONYM_RANKING
+        if ranking == "fast" and not self.word_embeddings.available:
+            ranking = "accurate"
+        ranking_key = ranking if ranking == "accurate" else f"fast:{settings.SYNONYM_FAST_RERANK_K}"
+
         try:
-            nlp = self._get_nlp()
             sentence_model = self._get_sentence_model()
-            doc = await asyncio.to_thread(nlp, text)
+            context = resolve_context(context, text)
+            if context:
+                doc = context.doc
+            else:
+                nlp = self._get_nlp()
+                doc = await run_blocking(nlp, text)
+
+            frequencies = brown_frequencies()
+            if not frequencies.loaded:
+                # The first lookup may have to count the Brown corpus, which must not block the event loop
+                await run_blocking(frequencies.load)
 
             candidate_tokens = [
                 token for token in doc
@@ -105,99 +319,111 @@ class SynonymSuggester:
             ]
 
             if not candidate_tokens:
-                return {"suggestions": []}
+                return {"suggestions": [], "ranking": ranking}
 
             tokens_by_sentence = defaultdict(list)
             for token in candidate_tokens:
-                tokens_by_sentence[token.sent].append(token)
+                tokens_by_sentence[token.sent.start].append(token)
 
-            suggestions_map = {}
+            sentences = list(doc.sents)
+            cache_keys = [
+                SentenceResultCache.make_key(
+                    sent.text, SENTENCE_TRANSFORMER_MODEL_ID, f"{similarity_threshold}:{top_n}:{ranking_key}"
+                )
+                for sent in sentences
+            ]
+            sentence_results = [self.cache.get(key) for key in cache_keys]
 
-            for sent, tokens in tokens_by_sentence.items():
-                original_sent = sent.text
-                sent_start = sent.start_char
-                original_embedding = (await asyncio.to_thread(
-                    sentence_model.encode,
-                    [original_sent],
-                    convert_to_tensor=True,
-                    show_progress_bar=False
-                ))[0]
-
-                altered_sents = []
-                key_map = []
-
-                for token in tokens:
-                    word = token.text
-                    wordnet_pos = self.SPACY_TO_WORDNET_POS.get(token.pos_)
-                    if not wordnet_pos:
-                        continue
-
-                    synonyms = self._get_wordnet_synonyms_cached(word, wordnet_pos)
-                    if not synonyms:
-                        continue
-
-                    token_start_in_sent = token.idx - sent_start
-                    token_end_in_sent = token.idx - sent_start + len(token)
-
-                    for synonym in synonyms:
-                        if not meaning_overlap(word, synonym, wordnet_pos):
-                            continue
-
-                        candidate_sentence = (
-                            original_sent[:token_start_in_sent] + synonym + original_sent[token_end_in_sent:]
-                        )
-                        altered_sents.append(candidate_sentence)
-                        key_map.append((token, synonym))
-
-                if altered_sents:
-                    altered_embeddings = await asyncio.to_thread(
-                        sentence_model.encode,
-                        altered_sents,
-                        batch_size=settings.SENTENCE_TRANSFORMER_BATCH_SIZE,
-                        convert_to_tensor=True,
-                        show_progress_bar=False
-                    )
-
-                    for (token, synonym), alt_embed in zip(key_map, altered_embeddings):
-                        similarity = cos_sim(original_embedding, alt_embed).item()
-                        if 0.6 <= similarity < 0.98 and synonym.lower() != token.text.lower():
-                            word_key = f"{token.text}:{token.idx}-{token.idx + len(token)}"
-                            if word_key not in suggestions_map:
-                                suggestions_map[word_key] = {
-                                    "suggestions": [],
-                                    "pos": token.pos_,
-                                    "context": original_sent
-                                }
-                            suggestions_map[word_key]["suggestions"].append((similarity, synonym))
+            # Uncached sentences, one per distinct text, are all scored in a single batch
+            pending: Dict[str, int] = {}
+            for i, result in enumerate(sentence_results):
+                if result is None:
+                    pending.setdefault(sentences[i].text, i)
+            if pending:
+                computed = await run_blocking(
+                    self._suggest_for_sentences,
+                    [(sentences[i], tokens_by_sentence.get(sentences[i].start, [])) for i in pending.values()],
+                    sentence_model,
+                    similarity_threshold,
+                    top_n,
+                    ranking
+                )
+                for i, sentence_suggestions in zip(pending.values(), computed):
+                    self.cache.put(cache_keys[i], sentence_suggestions)
+                by_text = dict(zip(pending, computed))
+                sentence_results = [
+                    result if result is not None else by_text[sent.text]
+                    for sent, result in zip(sentences, sentence_results)
+                ]
 
             final_suggestions = []
-            for word_key, data in suggestions_map.items():
-                scores = data["suggestions"]
-                if scores:
-                    sorted_unique = []
-                    seen = set()
-                    for _, suggestion in sorted(scores, key=lambda x: x[0], reverse=True):
-                        if suggestion not in seen:
-                            sorted_unique.append(suggestion)
-                            seen.add(suggestion)
-                        if len(sorted_unique) >= top_n:
-                            break
-                    word_text, span = word_key.split(":")
-                    start, end = map(int, span.split("-"))
+            for sent, sentence_suggestions in zip(sentences, sentence_results):
+                for suggestion in sentence_suggestions:
                     final_suggestions.append({
-                        "original_word": word_text,
-                        "start_char": start,
-                        "end_char": end,
-                        "suggestions": sorted_unique,
-                        "context": data["context"],
-                        "pos": data["pos"]
+                        **suggestion,
+                        "start_char": suggestion["start_char"] + sent.start_char,
+                        "end_char": suggestion["end_char"] + sent.start_char,
                     })
 
-            return {"suggestions": final_suggestions}
+            return {"suggestions": final_suggestions, "ranking": ranking}
 
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             logger.error(f"Synonym suggestion error: {e}", exc_info=True)
             raise ServiceError(
                 status_code=500,
                 detail="An internal error occurred during synonym suggestion."
             ) from e
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from app.core.logging import configure_logging
+
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Compare quality and latency of the synonym ranking modes.")
+    parser.add_argument("corpus", nargs="?", default=str(BENCHMARK_CORPUS_PATH))
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N benchmark sentences")
+    args = parser.parse_args()
+
+    with Path(args.corpus).open(encoding="utf-8") as f:
+        texts = [json.loads(line)["text"] for line in f if line.strip()][:args.limit]
+    suggester = SynonymSuggester()
+    if not suggester.word_embeddings.available:
+        raise SystemExit("Build the word embedding index first: python -m app.utils.word_embedding_index")
+
+    async def run(ranking: str) -> Tuple[List[float], List[Dict[int, List[str]]]]:
+        suggester.cache.clear()
+        suggester.embedding_cache.clear()
+        await suggester.suggest("A quick warm-up sentence about gardens.", ranking=ranking)
+        timings, outputs = [], []
+        for text in texts:
+            start = time.perf_counter()
+            result = await suggester.suggest(text, ranking=ranking)
+            timings.append(time.perf_counter() - start)
+            outputs.append({s["start_char"]: s["suggestions"] for s in result["suggestions"]})
+        return timings, outputs
+
+    results = {ranking: asyncio.run(run(ranking)) for ranking in ("accurate", "fast")}
+
+    print(f"{'ranking':>10} {'p50_ms':>8} {'p95_ms':>8} {'total_s':>8} {'words':>6}")
+    for ranking, (timings, outputs) in results.items():
+        ordered = sorted(timings)
+        print(f"{ranking:>10} {ordered[len(ordered) // 2] * 1000:>8.1f} "
+              f"{ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000:>8.1f} "
+              f"{sum(timings):>8.2f} {sum(len(o) for o in outputs):>6}")
+
+    # Quality of "fast" measured against "accurate" on the words "accurate" made suggestions for
+    top1_agree, overlaps = 0, []
+    for accurate, fast in zip(results["accurate"][1], results["fast"][1]):
+        for start_char, expected in accurate.items():
+            got = fast.get(start_char, [])
+            top1_agree += bool(got) and got[0] == expected[0]
+            overlaps.append(len(set(got) & set(expected)) / len(expected))
+    if overlaps:
+        print(f"fast vs accurate: top-1 agreement {top1_agree / len(overlaps):.1%}, "
+              f"mean suggestion overlap {sum(overlaps) / len(overlaps):.1%} over {len(overlaps)} words")
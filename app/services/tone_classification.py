@@ -1,23 +1,21 @@
 import logging
-from app.services.base import load_hf_pipeline
+from app.services.inference import get_inference_engine
 from app.core.config import APP_NAME, settings
 from app.core.exceptions import ServiceError, ModelNotDownloadedError
+from app.utils.sentence_cache import SentenceResultCache, get_sentence_cache
 
 logger = logging.getLogger(f"{APP_NAME}.services.tone_classification")
 
 class ToneClassifier:
     def __init__(self):
-        self._classifier = None
-
-    def _get_classifier(self):
-        if self._classifier is None:
-            self._classifier = load_hf_pipeline(
-                model_id=settings.TONE_MODEL_ID,
-                task="text-classification",
-                feature_name="Tone Classification",
-                top_k=None
-            )
-        return self._classifier
+        self._engine = None
+        # Tone is a document-level label, so the whole text is the cache key.
+        self.cache = get_sentence_cache("tone", max_entries=settings.SENTENCE_CACHE_MAX_ENTRIES)
+
+    def _get_engine(self):
+        if self._engine is None:
+            self._engine = get_inference_engine("tone")
+        return self._engine
 
     async def classify(self, text: str) -> dict:
         try:
@@ -25,14 +23,20 @@ class ToneClassifier:
             if not text:
                 raise ServiceError(status_code=400, detail="Input text is empty for tone classification.")
 
-            classifier = self._get_classifier()
-            raw_results = classifier(text)
+            cache_key = SentenceResultCache.make_key(
+                text, settings.TONE_MODEL_ID, str(settings.TONE_CONFIDENCE_THRESHOLD)
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
 
-            if not (isinstance(raw_results, list) and raw_results and isinstance(raw_results[0], list)):
-                logger.error(f"Unexpected raw_results format from pipeline: {raw_results}")
+            # Runs off the event loop, batched with other requests' texts
+            scores_for_text = await self._get_engine().submit(text, length=len(text))
+
+            if not (isinstance(scores_for_text, list) and scores_for_text and isinstance(scores_for_text[0], dict)):
+                logger.error(f"Unexpected raw_results format from pipeline: {scores_for_text}")
                 raise ServiceError(status_code=500, detail="Unexpected model output format for tone classification.")
 
-            scores_for_text = raw_results[0]
             sorted_emotions = sorted(scores_for_text, key=lambda x: x['score'], reverse=True)
 
             logger.debug(f"Input Text: '{text}'")
@@ -47,10 +51,13 @@ class ToneClassifier:
 
             if predicted_score >= settings.TONE_CONFIDENCE_THRESHOLD:
                 logger.info(f"Final prediction for '{text[:50]}...': '{predicted_label}' (Score: {predicted_score:.4f}, Above Threshold: {settings.TONE_CONFIDENCE_THRESHOLD:.2f})")
-                return {"tone": predicted_label}
+                result = {"tone": predicted_label}
             else:
                 logger.info(f"Final prediction for '{text[:50]}...': 'neutral' (Top Score: {predicted_score:.4f}, Below Threshold: {settings.TONE_CONFIDENCE_THRESHOLD:.2f}).")
-                return {"tone": "neutral"}
+                result = {"tone": "neutral"}
+
+            self.cache.put(cache_key, result)
+            return dict(result)
 
         except Exception as e:
             logger.error(f"Tone classification unexpected error for text '{text[:50]}...': {e}", exc_info=True)
@@ -1,5 +1,5 @@
 import logging
-from app.services.base import load_hf_pipeline
+from app.services.inference import get_inference_engine
 from app.core.config import settings, APP_NAME
 from app.core.exceptions import ServiceError
 
@@ -7,17 +7,12 @@ logger = logging.getLogger(f"{APP_NAME}.services.translation")
 
 class Translator:
     def __init__(self):
-        self._pipeline = None
-
-    def _get_pipeline(self):
-        if self._pipeline is None:
-            logger.info("Loading translation pipeline...")
-            self._pipeline = load_hf_pipeline(
-                model_id=settings.TRANSLATION_MODEL_ID,
-                task="translation",
-                feature_name="Translation"
-            )
-        return self._pipeline
+        self._engine = None
+
+    def _get_engine(self):
+        if self._engine is None:
+            self._engine = get_inference_engine("translation")
+        return self._engine
 
     async def translate(self, text: str, target_lang: str) -> dict:
         text = text.strip()
@@ -35,9 +30,11 @@ class Translator:
             )
 
         try:
-            pipeline = self._get_pipeline()
             prompt = f">>{target_lang}<< {text}"
-            result = pipeline(prompt, max_length=256, num_beams=1, early_stopping=True)[0]
+            # Runs off the event loop, batched with other requests' prompts
+            result = await self._get_engine().submit(
+                prompt, length=len(prompt), max_length=256, num_beams=1, early_stopping=True
+            )
             translated_text = result.get("translation_text") or result.get("generated_text")
 
             return {"translated_text": translated_text.strip()}
@@ -1,8 +1,10 @@
-import asyncio
 import logging
+from typing import Optional
 from app.services.base import load_spacy_model
 from app.core.config import APP_NAME, SPACY_MODEL_ID
 from app.core.exceptions import ServiceError, ModelNotDownloadedError
+from app.utils.analysis_context import AnalysisContext, resolve_context
+from app.utils.cancellation import run_blocking
 
 logger = logging.getLogger(f"{APP_NAME}.services.voice_detection")
 
@@ -15,14 +17,18 @@ class VoiceDetector:
             self._nlp = load_spacy_model(SPACY_MODEL_ID)
         return self._nlp
 
-    async def classify(self, text: str) -> dict:
+    async def classify(self, text: str, context: Optional[AnalysisContext] = None) -> dict:
         try:
             text = text.strip()
             if not text:
                 raise ServiceError(status_code=400, detail="Input text is empty for voice detection.")
 
-            nlp = self._get_nlp()
-            doc = await asyncio.to_thread(nlp, text)
+            context = resolve_context(context, text)
+            if context:
+                doc = context.doc
+            else:
+                nlp = self._get_nlp()
+                doc = await run_blocking(nlp, text)
 
             passive_sentences = 0
             total_sentences = 0
@@ -3,8 +3,10 @@ import pytest
 from httpx import AsyncClient
 from unittest.mock import AsyncMock, patch, MagicMock
 import asyncio
+import json
 from app.core.app import create_app
 from app.core.config import settings
+from app.schemas.base import AnalyzeRequest
 
 app = create_app()
 TEST_API_KEY = "test_fixture_key"
@@ -113,3 +115,49 @@ async def test_voice(mock_voice, client, fresh_future_and_queue_mock):
     assert response.status_code == 200
     assert response.json()["result"] == "Passive"
     mock_put.assert_called_once()
+
+
+# --- Streaming Analysis Tests ---
+def _stream_frames(payload, per_sentence=False):
+    from app.routers.analyze import analyze_text_stream_endpoint
+
+    async def collect():
+        response = await analyze_text_stream_endpoint(payload, per_sentence=per_sentence)
+        return [json.loads(line) async for line in response.body_iterator]
+
+    # A stream that never completes fails here instead of hanging the suite
+    return asyncio.run(asyncio.wait_for(collect(), timeout=5))
+
+
+def test_stream_completes_when_grammar_budget_runs_out():
+    from app.routers import analyze
+    payload = AnalyzeRequest(text="She go to school.", analyzers=["grammar"], options={"grammar": {"budget_ms": 50}})
+    truncated = {"original_text": payload.text, "issues": [], "partial": True}
+
+    with patch.object(analyze, "build_shared_context", new=AsyncMock(return_value=None)), \
+            patch.object(analyze.grammar_service, "correct", new=AsyncMock(return_value=truncated)) as correct:
+        frames = _stream_frames(payload)
+
+    assert correct.call_args.kwargs["budget_s"] == 0.05
+    assert frames == [
+        {"analyzer": "grammar", "status": "partial", "data": truncated},
+        {"analyzer": None, "status": "complete"},
+    ]
+
+
+def test_stream_caps_the_per_sentence_grammar_budget_at_the_analyzer_timeout():
+    from app.routers import analyze
+    payload = AnalyzeRequest(text="She go to school.", analyzers=["grammar"], options={"grammar": {"budget_ms": 10 ** 9}})
+    timeouts = []
+
+    async def fake_run_analyzer(key, coro, timeout, priority):
+        coro.close()
+        timeouts.append(timeout)
+        return key, {"issues": []}
+
+    with patch.object(analyze, "build_shared_context", new=AsyncMock(return_value=None)), \
+            patch.object(analyze, "run_analyzer", new=fake_run_analyzer):
+        frames = _stream_frames(payload, per_sentence=True)
+
+    assert timeouts == [analyze.ANALYZER_TIMEOUT_SECONDS]
+    assert frames[-1] == {"analyzer": None, "status": "complete"}
@@ -1,4 +1,6 @@
+import asyncio
 import pytest
+import torch
 from app.services.translation import Translator
 from app.services.tone_classification import ToneClassifier
 from app.services.voice_detection import VoiceDetector
@@ -6,6 +8,9 @@ from app.services.gpt4_rewrite import GPT4Rewriter
 from app.services.grammar import GrammarCorrector
 from app.services.paraphrase import Paraphraser
 from app.services.inclusive_language import InclusiveLanguageChecker
+from app.services.readability import ReadabilityScorer
+from app.services import model_backends
+from app.utils.text_splitter import SentenceSegment
 
 
 # --- Translation Tests ---
@@ -147,3 +152,85 @@ def test_inclusive_check_empty(inclusive_checker):
     response = inclusive_checker.check("")
     assert response["result"] == ""
     assert response["error"] == "Input text is empty."
+
+
+def _flagged_terms(checker, text):
+    return [(issue["term"], issue["gender"]) for issue in asyncio.run(checker.check(text))["issues"]]
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Single words match whole tokens, case-insensitively
+    ("The Chairman spoke.", [("Chairman", "male")]),
+    ("The chairman-elect arrived.", [("chairman", "male")]),
+    # Words the tokenizer splits only match their first token, as they always have
+    ("He's late.", [("He", "male")]),
+    # Multi-word phrases
+    ("A birth defect was found.", [("birth defect", None)]),
+    # '*' is a run of non-space characters, including punctuation
+    ("They want to make America great again.", [("make America great again", None)]),
+    ("Let us make America's economy great again.", [("make America's economy great again", None)]),
+    ("We will make America, great again!", [("make America, great again", None)]),
+    ("The father of two.", [("father of two", None)]),
+    # ...but never whitespace, and a term has at most as many runs as it has '*'
+    ("make America  great again", []),
+    ("Make a b c d e f great again", []),
+])
+def test_inclusive_matching_follows_the_yaml_rules(inclusive_checker, text, expected):
+    assert _flagged_terms(inclusive_checker, text) == expected
+
+
+# --- Readability Tests ---
+def test_readability_issues_leave_out_smog():
+    text = "Institutional considerations necessitate comprehensive organizational reevaluation."
+    result = ReadabilityScorer()._run_scoring(text, [SentenceSegment(text, 0, len(text))])
+    assert "smog_index" in result["detailed_scores"]
+    [issue] = result["readability_issues"]
+    assert "smog_index" not in issue["scores"]
+    assert "gunning_fog" in issue["scores"]
+
+
+# --- Model Backend Tests ---
+class _TinyModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.proj = torch.nn.Linear(8, 4)
+
+    def forward(self, x):
+        return self.proj(x)
+
+
+def test_torch_backend_loads_the_torch_model():
+    model, used = model_backends.load_model_with_backend("test/torch", "text-classification", "torch", _TinyModel)
+    assert isinstance(model.proj, torch.nn.Linear)
+    assert used == "torch"
+    assert model_backends.active_backend("test/torch") == "torch"
+
+
+def test_dynamic_int8_backend_quantizes_linear_layers():
+    model, used = model_backends.load_model_with_backend(
+        "test/int8", "text-classification", "torch-dynamic-int8", _TinyModel
+    )
+    assert used == "torch-dynamic-int8"
+    assert isinstance(model.proj, torch.ao.nn.quantized.dynamic.Linear)
+    assert model(torch.ones(2, 8)).shape == (2, 4)
+    assert model_backends.active_backend("test/int8") == "torch-dynamic-int8"
+
+
+@pytest.mark.parametrize("backend", ["onnxruntime", "torch-dynamic-int8", "no-such-backend"])
+def test_failed_backend_falls_back_to_torch(backend, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ImportError("optional dependency missing")
+
+    monkeypatch.setattr(model_backends, "_load_onnx", unavailable)
+    monkeypatch.setattr(model_backends, "_load_dynamic_int8", unavailable)
+    loads = []
+
+    def load_torch_model():
+        loads.append(1)
+        return _TinyModel()
+
+    model, used = model_backends.load_model_with_backend("test/fallback", "text-classification", backend, load_torch_model)
+    assert used == "torch"
+    assert isinstance(model.proj, torch.nn.Linear)
+    assert loads == [1]
+    assert model_backends.active_backend("test/fallback") == "torch"
@@ -0,0 +1,530 @@
+import asyncio
+import re
+import numpy as np
+import pytest
+import spacy
+from app.utils.sentence_cache import SentenceResultCache
+from app.utils.line_index import LineIndex
+from app.utils.grammar_utils import rebase_issue
+from app.utils.batching import MicroBatchScheduler
+from app.utils.interval_set import IntervalSet
+from app.utils.grammar_rules import RegexRule
+from app.utils.rewrite_engine import RewriteEngine
+from app.utils.decoding_policy import DecodingPolicySelector
+from app.utils.grammar_prefilter import GrammarPrefilter, evaluate_prefilter, score_sentence
+from app.utils.synonym_index import SynonymIndex, build_synonym_index
+from app.utils.word_frequency import WordFrequencyTable
+from app.utils.word_embedding_index import (
+    WordEmbeddingIndex, build_word_embedding_index, encode_vocabulary, span_embeddings
+)
+from app.utils import embedding_cache
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils import readability_engine
+from app.utils.readability_engine import readability_scores, sentence_statistics
+from app.utils.cancellation import AnalysisCancelled, checkpoint, current_cancel_event, run_blocking
+from app.services.rule_registry import RuleRegistry
+from app.utils import inclusive_rule_pack
+from app.utils.inclusive_rule_pack import load_rule_pack, read_rule_pack
+
+
+# --- Sentence Cache Tests ---
+@pytest.fixture
+def sentence_cache():
+    return SentenceResultCache("test", max_entries=2)
+
+
+def test_sentence_cache_key_depends_on_model_and_rules():
+    key = SentenceResultCache.make_key("She go to school.", "model-a", "v1")
+    assert key == SentenceResultCache.make_key("She go to school.", "model-a", "v1")
+    assert key != SentenceResultCache.make_key("She go to school.", "model-b", "v1")
+    assert key != SentenceResultCache.make_key("She go to school.", "model-a", "v2")
+
+
+def test_sentence_cache_evicts_least_recently_used(sentence_cache):
+    sentence_cache.put("a", 1)
+    sentence_cache.put("b", 2)
+    assert sentence_cache.get("a") == 1
+    sentence_cache.put("c", 3)
+    assert sentence_cache.get("b") is None
+    assert sentence_cache.get("a") == 1
+    stats = sentence_cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+# --- Line Index Tests ---
+def test_line_index_line_col():
+    index = LineIndex("ab\ncd\n\nef")
+    assert index.line_col(0) == (1, 1)
+    assert index.line_col(4) == (2, 2)
+    assert index.line_col(7) == (4, 1)
+
+
+def test_rebase_issue_moves_offsets_onto_document():
+    text = "First line.\nShe go to school."
+    issue = {"offset": 4, "length": 2, "context_before": "", "context_after": "", "line": 1, "column": 5}
+    rebased = rebase_issue(issue, 12, text, LineIndex(text))
+    assert rebased["offset"] == 16
+    assert text[rebased["offset"]:rebased["offset"] + rebased["length"]] == "go"
+    assert (rebased["line"], rebased["column"]) == (2, 5)
+    assert issue["offset"] == 4
+
+
+# --- Micro-batching Scheduler Tests ---
+def test_scheduler_batches_concurrent_submissions():
+    seen_batches = []
+
+    def batch_fn(items):
+        seen_batches.append(list(items))
+        return [item.upper() for item in items]
+
+    scheduler = MicroBatchScheduler("test-batch", batch_fn, max_batch_size=4, max_wait_ms=20)
+
+    async def run():
+        words = ["ccc", "a", "bb", "dddd", "e"]
+        return await asyncio.gather(*(scheduler.submit(w, length=len(w)) for w in words))
+
+    assert asyncio.run(run()) == ["CCC", "A", "BB", "DDDD", "E"]
+    assert sum(len(b) for b in seen_batches) == 5
+    assert all(len(b) <= 4 for b in seen_batches)
+    assert seen_batches[0] == sorted(seen_batches[0], key=len)
+    assert scheduler.stats()["items_processed"] == 5
+
+
+def test_scheduler_propagates_batch_errors():
+    def batch_fn(items):
+        raise ValueError("model failed")
+
+    scheduler = MicroBatchScheduler("test-batch-error", batch_fn, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(scheduler.submit("x"), return_exceptions=True)
+
+    assert isinstance(asyncio.run(run())[0], ValueError)
+    assert scheduler.queue_depth == 0
+
+
+def test_scheduler_queue_depth_counts_items_until_answered():
+    import threading
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(5)
+        return items
+
+    scheduler = MicroBatchScheduler("test-batch-depth", batch_fn, max_batch_size=2, max_wait_ms=1)
+
+    async def run():
+        tasks = [asyncio.ensure_future(scheduler.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        # Two items are in the running batch and one was drained by _collect; none are left in the queue
+        depths = [scheduler.queue_depth, scheduler._queue.qsize()]
+        tasks[2].cancel()
+        await asyncio.sleep(0)
+        depths.append(scheduler.queue_depth)
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return depths + [scheduler.queue_depth]
+
+    assert asyncio.run(run()) == [3, 0, 2, 0]
+
+
+# --- Interval Set Tests ---
+def test_interval_set_rejects_overlaps():
+    covered = IntervalSet()
+    assert covered.add(10, 20)
+    assert covered.add(0, 5)
+    assert not covered.add(15, 25)
+    assert not covered.add(4, 11)
+    assert covered.add(20, 30)
+    assert covered.add(5, 10)
+    assert covered.as_list() == [(0, 5), (5, 10), (10, 20), (20, 30)]
+
+
+# --- Rewrite Engine Tests ---
+def test_rewrite_engine_matches_sequential_rules():
+    rules = [
+        RegexRule(r"\bteh\b", "the", re.IGNORECASE),
+        RegexRule(r"\s{2,}", " "),
+        RegexRule(r"\b(\d+) ?%", r"\1 percent"),
+        RegexRule(r"\balot\b", "a lot"),
+    ]
+    engine = RewriteEngine(rules)
+    text = "Teh  cost rose 5%  alot, not alots."
+
+    expected = text
+    for rule in rules:
+        expected = re.sub(rule.pattern, rule.replacement, expected, flags=rule.flags)
+
+    assert engine.apply(text) == (expected, 5)
+    assert engine.rewrite("Clean sentence.") == "Clean sentence."
+
+
+def test_rewrite_engine_keeps_rule_order_across_interleaved_word_start_rules():
+    engine = RewriteEngine([
+        RegexRule(r"\bcan not\b", "cannot"),
+        RegexRule(r"can", "CAN"),
+        RegexRule(r"\bcan\b", "could"),
+        RegexRule(r"\balot\b", "a lot"),
+    ])
+    # The unanchored rule sits between two word-start rules and must still beat the later one
+    assert engine.rewrite("I can not, can I") == "I cannot, CAN I"
+    assert engine.rewrite("alot") == "a lot"
+    assert engine._combined.pattern.count(r"(?=\w)\b") == 2
+
+
+# --- Grammar Pre-filter Tests ---
+def test_grammar_prefilter_routes_only_suspect_sentences():
+    nlp = spacy.blank("en")
+    prefilter = GrammarPrefilter(threshold=1.0)
+
+    assert not prefilter.is_suspect(nlp("The meeting has been moved to Thursday."))
+    assert prefilter.is_suspect(nlp("He don't like working on weekends."))
+    assert prefilter.is_suspect(nlp("This is a excellent opportunity."))
+    assert "repeated_word" in score_sentence(nlp("The the report is ready."))[1]
+    assert prefilter.stats()["skipped"] == 1
+    assert prefilter.stats()["routed_to_model"] == 2
+
+
+def test_evaluate_prefilter_hit_and_miss_rates():
+    scored = [(0.0, False), (0.0, False), (2.0, False), (2.0, True), (0.5, True)]
+    report = evaluate_prefilter(scored, threshold=1.0)
+    assert report["hit_rate"] == round(2 / 3, 4)
+    assert report["miss_rate"] == 0.5
+    assert report["routed_to_model"] == 2
+
+
+# --- Decoding Policy Tests ---
+def test_decoding_policy_buckets_lengths_and_degrades_under_load():
+    selector = DecodingPolicySelector(num_beams=4, buckets=(16, 32), max_new_tokens_cap=100, greedy_queue_depth=10)
+
+    short, similar = selector.select(5), selector.select(12)
+    assert short == similar
+    assert short.num_beams == 4 and short.max_new_tokens == 24
+    assert selector.select(30).max_new_tokens == 48
+    assert selector.select(500).max_new_tokens == 100
+
+    busy = selector.select(5, queue_depth=10)
+    assert busy.num_beams == 1 and busy.under_load
+    assert busy.generate_kwargs()["early_stopping"] is False
+
+
+# --- Synonym Index Tests ---
+class _FakeLemma:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class _FakeSynset:
+    def __init__(self, lemmas, definition):
+        self._lemmas = [_FakeLemma(name) for name in lemmas]
+        self._definition = definition
+
+    def lemmas(self):
+        return self._lemmas
+
+    def definition(self):
+        return self._definition
+
+
+class _FakeWordNet:
+    SYNSETS = {
+        ("big", "a"): [_FakeSynset(["big", "large", "ice_cold"], "above average in size")],
+        ("large", "a"): [_FakeSynset(["big", "large"], "above average in size")],
+        ("huge", "a"): [_FakeSynset(["huge", "big"], "unusually great")],
+    }
+
+    def all_lemma_names(self, pos):
+        return [word for word, p in self.SYNSETS if p == pos] + (["ice_cold"] if pos == "a" else [])
+
+    def synsets(self, word, pos):
+        return self.SYNSETS.get((word, pos), [])
+
+
+def test_synonym_index_stores_filtered_candidates(tmp_path):
+    path = tmp_path / "synonyms.sqlite"
+    assert build_synonym_index(path, wordnet=_FakeWordNet()) == 3
+
+    index = SynonymIndex(path)
+    assert index.available
+    assert index.get("big", "a") == ("large",)  # Multi-word lemmas are dropped
+    assert index.get("huge", "a") == ()  # "big" shares no definition words with "huge"
+    assert index.get("big", "n") is None
+    assert not SynonymIndex(tmp_path / "missing.sqlite").available
+
+
+# --- Word Frequency Tests ---
+def test_word_frequency_table_builds_once_and_maps_from_disk(tmp_path):
+    path = tmp_path / "freq.npy"
+    words = ["the", "cat", "the", "dog", "the", "The"]
+    table = WordFrequencyTable(path, lambda: words)
+    assert table.count("the") == 3
+    assert table.count("The") == 1
+    assert table.count("bird") == 0
+    assert table.frequency("cat") == pytest.approx(1 / 6)
+    assert list(table.counts(["dog", "zebra", "the"])) == [1, 0, 3]
+
+    def no_corpus():
+        raise AssertionError("table should be read from disk")
+
+    assert WordFrequencyTable(path, no_corpus).count("the") == 3
+
+
+def test_word_frequency_table_without_corpus_treats_words_as_unseen(tmp_path):
+    def missing_corpus():
+        raise LookupError("Resource brown not found")
+
+    table = WordFrequencyTable(tmp_path / "freq.npy", missing_corpus)
+    assert table.count("the") == 0
+    assert table.frequency("the") == 0.0
+
+
+# --- Word Embedding Index Tests ---
+def test_word_embedding_index_scores_known_words_against_contexts(tmp_path):
+    basis = {"glad": [1.0, 0.0], "happy": [0.0, 1.0], "merry": [0.6, 0.8]}
+    size = build_word_embedding_index(
+        ["merry", "glad", "happy", "glad"], lambda words: [basis[w] for w in words], tmp_path / "vectors"
+    )
+    assert size == 3
+
+    index = WordEmbeddingIndex(tmp_path / "vectors")
+    assert index.available
+    assert list(index.rows(["glad", "zebra", "merry"])) == [0, -1, 2]
+    scores = index.similarities(["glad", "merry", "zebra"], [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]])
+    assert scores[:2] == pytest.approx([1.0, 0.8], abs=1e-3)
+    assert scores[2] == -np.inf
+    assert not WordEmbeddingIndex(tmp_path / "missing").available
+
+
+class _FakeTokenModel:
+    """Whitespace 'subwords' whose embeddings ignore context, plus [CLS]/[SEP]."""
+    max_seq_length = 128
+
+    def tokenizer(self, texts, return_offsets_mapping=True, truncation=True, max_length=128):
+        return {"offset_mapping": [
+            [(0, 0)] + [(m.start(), m.end()) for m in re.finditer(r"\w+", text)] + [(0, 0)] for text in texts
+        ]}
+
+    def encode(self, texts, batch_size=32, output_value="token_embeddings", show_progress_bar=False):
+        def vector(token):
+            return [float(len(token)), float(ord(token[0]) % 7), 1.0]
+        return [
+            np.array([vector("[CLS]")] + [vector(m.group()) for m in re.finditer(r"\w+", text)] + [vector("[SEP]")])
+            for text in texts
+        ]
+
+
+def test_vocabulary_vectors_share_the_contextual_token_space():
+    model = _FakeTokenModel()
+    vocabulary = encode_vocabulary(model, ["glad", "joyful"], chunk_size=1)
+    text = "She was joyful and glad."
+    contexts = span_embeddings(model, [text], [[(text.index("glad"), text.index("glad") + 4), (8, 14)]])[0]
+    assert np.allclose(contexts, vocabulary[[0, 1]])
+    assert np.allclose(np.linalg.norm(vocabulary, axis=1), 1.0)
+
+
+# --- Embedding Cache Tests ---
+def test_embedding_cache_encodes_only_misses_and_evicts_by_bytes(monkeypatch):
+    # A private registry, so the test cache doesn't show up in the process-wide stats
+    monkeypatch.setattr(embedding_cache, "_CACHE_REGISTRY", {})
+    encoded = []
+
+    def encode(texts):
+        encoded.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    # Two float16 vectors of width 2 fit in 8 bytes
+    cache = EmbeddingCache("test-embeddings", max_bytes=8)
+    first = cache.encode(["a cat", "a  cat", "dog"], encode, "model")
+    assert encoded == [["a cat", "dog"]]  # Whitespace variants share one entry
+    assert first.dtype == np.float32 and first.shape == (3, 2)
+
+    again = cache.encode(["dog", "a cat"], encode, "model")
+    assert encoded == [["a cat", "dog"]]
+    assert np.array_equal(again, first[[2, 0]])
+    assert cache.encode(["dog"], encode, "model", variant="normalized") is not None
+    assert encoded[-1] == ["dog"]
+
+    cache.encode(["bird"], encode, "model")
+    stats = cache.stats()
+    assert stats["capacity"] == 2 and stats["entries"] == 2 and stats["bytes_used"] == 8
+    assert stats["evictions"] == 2
+    assert stats["hits"] == 2
+    assert embedding_cache.get_embedding_cache_stats() == [stats]
+
+
+# --- Readability Engine Tests ---
+def test_readability_counts_each_sentence_from_one_tokenization(monkeypatch):
+    # One syllable per vowel group keeps the test independent of textstat's dictionaries
+    monkeypatch.setattr(readability_engine, "count_syllables", lambda w: max(1, len(re.findall(r"[aeiouy]+", w))))
+    readability_engine._word_profile.cache_clear()
+    text = "The cat sat. Don't over-think it!\n..."
+    counts = sentence_statistics(text, [0, 13, 34])
+    readability_engine._word_profile.cache_clear()
+    assert list(counts["words"]) == [3, 3, 0]  # Contractions and hyphenated words count once
+    assert list(counts["letters"]) == [9, 15, 0]
+
+    per_sentence = readability_scores(sentences=np.ones(3), **counts)
+    document = readability_scores(sentences=2, **{name: values.sum() for name, values in counts.items()})
+    assert per_sentence["flesch_reading_ease"][2] == 0.0  # No words, no score
+    assert document["flesch_kincaid_grade"] == pytest.approx(
+        0.39 * 3 + 11.8 * counts["syllables"].sum() / 6 - 15.59
+    )
+
+
+# --- Cancellation Tests ---
+def test_run_blocking_work_stops_at_checkpoint_once_cancelled():
+    import threading
+    started, steps = threading.Event(), []
+
+    def work():
+        started.set()
+        while len(steps) < 1000:
+            checkpoint()
+            steps.append(1)
+            threading.Event().wait(0.001)
+
+    async def main():
+        cancel_event = threading.Event()
+        current_cancel_event.set(cancel_event)
+        worker = asyncio.ensure_future(run_blocking(work))
+        await asyncio.to_thread(started.wait)
+        cancel_event.set()
+        with pytest.raises(AnalysisCancelled):
+            await worker
+        # Without an event in the context, checkpoints never stop anything
+        current_cancel_event.set(None)
+        steps.clear()
+        await run_blocking(work)
+
+    asyncio.run(main())
+    assert len(steps) == 1000
+
+
+# --- Rule Registry Tests ---
+def _wait_for(condition, timeout=5.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_rule_registry_polls_and_swaps_in_new_versions(tmp_path):
+    rules_file = tmp_path / "rules.txt"
+    rules_file.write_text("v1")
+
+    def build():
+        version = rules_file.read_text()
+        if version == "broken":
+            raise ValueError("bad rules")
+        return version, {"version": version}
+
+    registry = RuleRegistry(poll_seconds=0.0)
+    first = registry.register("test", files=lambda: [rules_file], build=build)
+    assert first.version == "v1"
+    assert registry.get("test") is first  # Unchanged files keep the same snapshot
+
+    rules_file.write_text("v2 with more rules")
+    registry.get("test")  # Notices the change and rebuilds in the background
+    assert _wait_for(lambda: registry.get("test").version == "v2 with more rules")
+    assert first.rules == {"version": "v1"}  # Readers holding the old snapshot are unaffected
+
+    rules_file.write_text("broken")
+    registry.get("test")
+    assert _wait_for(lambda: registry.stats()[0]["failed_reloads"] == 1)
+    assert registry.get("test").version == "v2 with more rules"
+    assert registry.stats()[0]["reloads"] == 1
+
+
+def test_rule_registry_builds_outside_the_registry_lock(tmp_path):
+    import threading
+    release = threading.Event()
+
+    def slow_build():
+        release.wait(5)
+        return "slow", None
+
+    registry = RuleRegistry(poll_seconds=60.0)
+    slow = threading.Thread(target=registry.register, args=("slow", lambda: [], slow_build))
+    slow.start()
+    assert _wait_for(lambda: "slow" in registry._entries)
+    # Another rule set registers while the first build is still running
+    fast = threading.Thread(target=registry.register, args=("fast", lambda: [], lambda: ("fast", None)))
+    fast.start()
+    assert _wait_for(lambda: not fast.is_alive(), timeout=2.0)
+    assert registry.get("fast").version == "fast"
+    release.set()
+    slow.join(5)
+    assert registry.get("slow").version == "slow"
+
+
+# --- Inclusive Rule Pack Tests ---
+@pytest.fixture
+def inclusive_rules_dir(tmp_path):
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    (rules_dir / "gender.yml").write_text(
+        "- id: chair\n"
+        "  considerate: [chair]\n"
+        "  inconsiderate: {chairman: male, chairwoman: female}\n"
+        "- id: slogan\n"
+        "  considerate: [improve]\n"
+        "  inconsiderate: [make * great again, man hours]\n"
+    )
+    return rules_dir
+
+
+def test_rule_pack_round_trip_and_reuse(inclusive_rules_dir, tmp_path, monkeypatch):
+    nlp = spacy.blank("en")
+    pack_path = tmp_path / "inclusive.pack"
+    built = load_rule_pack(inclusive_rules_dir, nlp, pack_path)
+    assert read_rule_pack(pack_path) == built
+    assert built["single_words"] == {"chairman": ["chair", "male"], "chairwoman": ["chair", "female"]}
+    assert ["slogan", ["man", "hours"]] in built["phrases"]
+    assert [w["original_term"] for w in built["wildcards"].values()] == ["make * great again"]
+
+    # An up-to-date pack is loaded, never recompiled
+    monkeypatch.setattr(inclusive_rule_pack, "compile_rule_pack", lambda *args: pytest.fail("recompiled"))
+    assert load_rule_pack(inclusive_rules_dir, nlp, pack_path) == built
+
+
+def test_rule_pack_rebuilds_when_rules_or_spacy_change(inclusive_rules_dir, tmp_path, monkeypatch):
+    nlp = spacy.blank("en")
+    pack_path = tmp_path / "inclusive.pack"
+    hashes = [load_rule_pack(inclusive_rules_dir, nlp, pack_path)["hash"]]
+
+    with (inclusive_rules_dir / "gender.yml").open("a") as f:
+        f.write("- id: mankind\n  considerate: [humankind]\n  inconsiderate: [mankind]\n")
+    edited = load_rule_pack(inclusive_rules_dir, nlp, pack_path)
+    assert "mankind" in edited["single_words"]
+    hashes.append(edited["hash"])
+
+    monkeypatch.setattr(inclusive_rule_pack.spacy, "__version__", "0.0.0-test")
+    hashes.append(load_rule_pack(inclusive_rules_dir, nlp, pack_path)["hash"])
+    nlp.meta["version"] = "0.0.1-test"
+    hashes.append(load_rule_pack(inclusive_rules_dir, nlp, pack_path)["hash"])
+
+    assert len(set(hashes)) == 4
+    assert read_rule_pack(pack_path)["hash"] == hashes[-1]
+
+
+def test_rule_pack_falls_back_to_compiling_when_missing_or_corrupt(inclusive_rules_dir, tmp_path):
+    nlp = spacy.blank("en")
+    pack_path = tmp_path / "inclusive.pack"
+    assert read_rule_pack(pack_path) is None
+
+    pack_path.write_bytes(b"\x00not msgpack")
+    assert read_rule_pack(pack_path) is None
+    rebuilt = load_rule_pack(inclusive_rules_dir, nlp, pack_path)
+    assert read_rule_pack(pack_path) == rebuilt  # The corrupt file was replaced
+
+    # A pack that can't be saved is still returned
+    unwritable = tmp_path / "not-a-dir"
+    unwritable.write_text("")
+    assert load_rule_pack(inclusive_rules_dir, nlp, unwritable / "inclusive.pack")["hash"] == rebuilt["hash"]
@@ -0,0 +1,49 @@
+# === app/utils/analysis_context.py ===
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from spacy.tokens import Doc
+
+from app.services.base import load_spacy_model
+from app.core.config import SPACY_MODEL_ID, APP_NAME
+from app.utils.text_splitter import SentenceSegment, sentences_from_doc
+
+logger = logging.getLogger(f"{APP_NAME}.utils.analysis_context")
+
+
+@dataclass
+class AnalysisContext:
+    """
+    One spaCy parse of a request's text, shared by every analyzer so the text
+    is tokenized, tagged and parsed once instead of once per service.
+    """
+    text: str
+    doc: Doc
+    sentences: List[SentenceSegment]
+
+    @classmethod
+    def from_text(cls, text: str) -> "AnalysisContext":
+        nlp = load_spacy_model(SPACY_MODEL_ID)
+        doc = nlp(text)
+        return cls(text=text, doc=doc, sentences=sentences_from_doc(doc))
+
+
+async def build_analysis_context(text: str) -> AnalysisContext:
+    """Parses the text off the event loop and returns the shared context."""
+    return await asyncio.to_thread(AnalysisContext.from_text, text)
+
+
+def resolve_context(context: Optional[AnalysisContext], text: str) -> Optional[AnalysisContext]:
+    """
+    Returns the context only if it was built for exactly this text, so a
+    service never reads offsets from a parse of different input.
+    """
+    if context is None:
+        return None
+    if context.text != text:
+        logger.warning("Analysis context does not match the service input; parsing again.")
+        return None
+    return context
@@ -0,0 +1,174 @@
+# === app/utils/batching.py ===
+
+import asyncio
+import itertools
+import logging
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("batching")
+
+# Priority of the work submitted from the current task; higher is served first.
+# Set once per analyzer by the router and inherited by every task it spawns.
+current_priority: ContextVar[int] = ContextVar("batch_priority", default=0)
+
+
+@dataclass(order=True)
+class _PendingItem:
+    sort_key: tuple
+    item: Any = field(compare=False)
+    length: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class MicroBatchScheduler:
+    """
+    Collects items submitted by any number of concurrent requests into one
+    queue and runs them through `batch_fn` in batches.
+
+    A batch is dispatched once `max_batch_size` items are waiting or
+    `max_wait_ms` has passed since the first one arrived. Everything queued at
+    that point is sorted by priority, then length, before being cut into
+    batches, so urgent work goes first and similar lengths share a batch.
+    Batches run one at a time on a dedicated worker thread, so concurrent
+    requests no longer compete for the same CPU cores with separate small
+    model calls.
+
+    Items whose caller has gone away are dropped before dispatch. With
+    `cancellable=True`, `batch_fn(items, is_cancelled)` also receives a
+    callable that turns true once every caller in the running batch has
+    cancelled, so long model calls can stop early.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        executor: Optional[Executor] = None,
+        cancellable: bool = False,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.cancellable = cancellable
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-batch")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._sequence = itertools.count()
+
+        self.submitted = 0
+        self.in_flight = 0  # Submitted items whose future hasn't resolved yet
+        self.cancelled = 0
+        self.batches = 0
+        self.items_processed = 0
+        self.batch_sizes: Counter = Counter()
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.PriorityQueue()
+            self._worker = loop.create_task(self._run(), name=f"{self.name}-scheduler")
+
+    async def submit(self, item: Any, length: Optional[int] = None, priority: Optional[int] = None) -> Any:
+        """
+        Queues one item and waits for its result from whichever batch it lands in.
+        Priority defaults to the submitting task's `current_priority`.
+        """
+        self._ensure_worker()
+        priority = current_priority.get() if priority is None else priority
+        future = self._loop.create_future()
+        self._queue.put_nowait(_PendingItem(
+            sort_key=(-priority, next(self._sequence)), item=item, length=length or 0, future=future
+        ))
+        self.submitted += 1
+        self.in_flight += 1
+        future.add_done_callback(self._item_done)
+        return await future
+
+    def _item_done(self, future: asyncio.Future) -> None:
+        # Runs on the loop for every outcome: result, batch error or caller cancellation
+        self.in_flight -= 1
+
+    async def _collect(self) -> List[_PendingItem]:
+        """Waits for the first item, then gathers more until the batch is full or the wait expires."""
+        pending = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Take whatever else is already waiting so it can be length-sorted together
+        while not self._queue.empty() and len(pending) < self.max_batch_size * 4:
+            pending.append(self._queue.get_nowait())
+
+        return pending
+
+    async def _run(self) -> None:
+        while True:
+            pending = await self._collect()
+            # Requests that were cancelled while queued never reach the model
+            live = [p for p in pending if not p.future.done()]
+            self.cancelled += len(pending) - len(live)
+            pending = sorted(live, key=lambda p: (p.sort_key[0], p.length))
+
+            for i in range(0, len(pending), self.max_batch_size):
+                batch = [p for p in pending[i:i + self.max_batch_size] if not p.future.done()]
+                if batch:
+                    await self._dispatch(batch)
+
+    async def _dispatch(self, batch: List[_PendingItem]) -> None:
+        self.batches += 1
+        self.items_processed += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        items = [p.item for p in batch]
+        try:
+            if self.cancellable:
+                is_cancelled = lambda: all(p.future.cancelled() for p in batch)
+                call = lambda: self.batch_fn(items, is_cancelled)
+            else:
+                call = lambda: self.batch_fn(items)
+            results = await self._loop.run_in_executor(self._executor, call)
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items.")
+            for p, result in zip(batch, results):
+                if not p.future.done():
+                    p.future.set_result(result)
+        except Exception as e:
+            logger.error(f"[{self.name}] batch of {len(batch)} failed: {e}", exc_info=True)
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Items submitted and not yet answered: queued, being collected or in a
+        running batch. The queue alone misses items `_collect` has drained.
+        """
+        return self.in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "cancelled_before_dispatch": self.cancelled,
+            "batches": self.batches,
+            "items_processed": self.items_processed,
+            "average_batch_size": round(self.items_processed / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+        }
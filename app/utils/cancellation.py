@@ -0,0 +1,60 @@
+# === app/utils/cancellation.py ===
+"""
+Cooperative cancellation for analyzer work that runs on threads.
+
+Cancelling an asyncio task does not stop a function already running on a
+worker thread. run_analyzer sets a per-analyzer cancel event once the
+analyzer is over (finished, timed out or cancelled by a client disconnect).
+Blocking work started through `run_blocking` sees that event and stops at its
+next `checkpoint()`. A single call that can't be split, such as one spaCy
+parse, still runs to completion. Such work is confined to a bounded pool of
+ANALYZER_WORKER_THREADS, so abandoned work can't take more threads than that.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+# Set by run_analyzer for everything the analyzer runs, including its worker-thread calls
+current_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("analysis_cancel_event", default=None)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class AnalysisCancelled(Exception):
+    """Raised at a checkpoint once the analyzer the work belongs to is over."""
+
+
+def checkpoint() -> None:
+    """Stops the calling worker if its analyzer has been cancelled or timed out."""
+    event = current_cancel_event.get()
+    if event is not None and event.is_set():
+        raise AnalysisCancelled()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.ANALYZER_WORKER_THREADS), thread_name_prefix="analyzer"
+                )
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Like asyncio.to_thread, but on the bounded analyzer pool. The caller's
+    context, including its cancel event, is carried to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_executor(), call)
@@ -0,0 +1,105 @@
+# === app/utils/decoding_policy.py ===
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Sequence
+
+logger = logging.getLogger("decoding_policy")
+
+# Rough subword tokens per whitespace-separated word for English T5 input
+TOKENS_PER_WORD = 1.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap input length estimate, so the tokenizer isn't needed on the event loop."""
+    return math.ceil(len(text.split()) * TOKENS_PER_WORD)
+
+
+@dataclass(frozen=True)
+class DecodingPolicy:
+    """Generation settings for one sentence. Sentences with equal policies can share a batch."""
+    num_beams: int
+    max_new_tokens: int
+    bucket: int  # Upper bound, in estimated tokens, of the length bucket the input fell in
+    under_load: bool = False
+
+    @property
+    def label(self) -> str:
+        strategy = "greedy" if self.num_beams == 1 else f"beam{self.num_beams}"
+        return f"{strategy}/{self.max_new_tokens}"
+
+    def generate_kwargs(self) -> Dict[str, Any]:
+        return {
+            "num_beams": self.num_beams,
+            "max_new_tokens": self.max_new_tokens,
+            "early_stopping": self.num_beams > 1,
+            "do_sample": False,
+        }
+
+
+class DecodingPolicySelector:
+    """
+    Chooses decoding settings per sentence instead of one fixed setting for all.
+
+    Inputs are put in length buckets and `max_new_tokens` is derived from the
+    bucket's upper bound, so a 5-token sentence no longer decodes with room
+    for 512 tokens, and every sentence in a bucket gets identical settings and
+    so lands in the same batch queue. When more than `greedy_queue_depth` items
+    are already waiting for the model, beam search drops to greedy decoding
+    to keep latency bounded; those results are flagged `under_load`.
+    """
+
+    def __init__(
+        self,
+        num_beams: int = 4,
+        buckets: Sequence[int] = (16, 32, 64, 128),
+        max_new_tokens_cap: int = 512,
+        new_token_ratio: float = 1.5,
+        greedy_queue_depth: int = 32,
+        adaptive: bool = True,
+    ):
+        self.num_beams = max(1, num_beams)
+        self.buckets = sorted({b for b in buckets if b > 0}) or [max_new_tokens_cap]
+        self.max_new_tokens_cap = max_new_tokens_cap
+        self.new_token_ratio = new_token_ratio
+        self.greedy_queue_depth = greedy_queue_depth
+        self.adaptive = adaptive
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the policy configuration (not a per-sentence choice) for result caches."""
+        if not self.adaptive:
+            return f"fixed:{self.num_beams}:{self.max_new_tokens_cap}"
+        return f"adaptive:{self.num_beams}:{'-'.join(map(str, self.buckets))}:{self.new_token_ratio}:{self.max_new_tokens_cap}"
+
+    def bucket_for(self, n_tokens: int) -> int:
+        for bucket in self.buckets:
+            if n_tokens <= bucket:
+                return bucket
+        # Longer than the largest bucket: round up to a multiple of it so these still group
+        largest = self.buckets[-1]
+        return largest * math.ceil(n_tokens / largest)
+
+    def select(self, n_tokens: int, queue_depth: int = 0) -> DecodingPolicy:
+        if not self.adaptive:
+            return DecodingPolicy(self.num_beams, self.max_new_tokens_cap, self.max_new_tokens_cap)
+
+        bucket = self.bucket_for(n_tokens)
+        max_new_tokens = min(self.max_new_tokens_cap, math.ceil(bucket * self.new_token_ratio))
+        under_load = self.num_beams > 1 and queue_depth >= self.greedy_queue_depth
+        return DecodingPolicy(
+            num_beams=1 if under_load else self.num_beams,
+            max_new_tokens=max_new_tokens,
+            bucket=bucket,
+            under_load=under_load,
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "adaptive": self.adaptive,
+            "num_beams": self.num_beams,
+            "length_buckets": self.buckets,
+            "max_new_tokens_cap": self.max_new_tokens_cap,
+            "greedy_queue_depth": self.greedy_queue_depth,
+        }
@@ -0,0 +1,161 @@
+# === app/utils/embedding_cache.py ===
+
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("embedding_cache")
+
+# Every cache created in this process, by name, so they can be reported together.
+_CACHE_REGISTRY: Dict[str, "EmbeddingCache"] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Texts that differ only in Unicode composition or whitespace share an embedding."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Byte-bounded LRU cache of text embeddings.
+
+    Vectors live as float16 rows of one preallocated NumPy arena, sized from
+    `max_bytes` once the embedding width is known, so memory use is fixed and
+    there is no per-entry tensor overhead. Keys hash the normalized text with
+    the model ID and a variant (e.g. whether vectors are normalized). Returned
+    vectors are float32, and freshly encoded ones are rounded through float16
+    too, so a hit returns exactly what the miss returned.
+    """
+
+    def __init__(self, name: str, max_bytes: int = 32 * 1024 * 1024):
+        self.name = name
+        self.max_bytes = max(0, max_bytes)
+        self._arena: Optional[np.ndarray] = None
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _CACHE_REGISTRY[name] = self
+
+    @staticmethod
+    def make_key(text: str, model_id: str, variant: str = "") -> str:
+        digest = hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_id}:{variant}:{digest}"
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._arena is None else self._arena.shape[0]
+
+    def _allocate(self, dim: int) -> None:
+        capacity = self.max_bytes // (dim * np.dtype(np.float16).itemsize)
+        self._arena = np.empty((capacity, dim), dtype=np.float16)
+        logger.info(f"Embedding cache '{self.name}': {capacity} vectors of width {dim} ({self.max_bytes} bytes)")
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._rows.move_to_end(key)
+                self.hits += 1
+                # Copied out under the lock, since the row may be reused after an eviction
+                results.append(self._arena[row].astype(np.float32))
+        return results
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors)
+        if self.max_bytes == 0 or not len(keys):
+            return
+        with self._lock:
+            if self._arena is None:
+                self._allocate(vectors.shape[1])
+            if vectors.shape[1] != self._arena.shape[1]:
+                raise ValueError(f"Embedding cache '{self.name}' holds width {self._arena.shape[1]}, got {vectors.shape[1]}")
+            for key, vector in zip(keys, vectors):
+                row = self._rows.get(key)
+                if row is None:
+                    if len(self._rows) < self.capacity:
+                        row = len(self._rows)
+                    elif self.capacity:
+                        _, row = self._rows.popitem(last=False)
+                        self.evictions += 1
+                    else:
+                        return
+                    self._rows[key] = row
+                self._rows.move_to_end(key)
+                self._arena[row] = vector
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        encode: Callable[[List[str]], Any],
+        model_id: str,
+        variant: str = ""
+    ) -> np.ndarray:
+        """
+        Embeddings for `texts` as a float32 matrix. Only texts not in the cache
+        are passed to `encode`, in one call and each distinct text once.
+        """
+        keys = [self.make_key(text, model_id, variant) for text in texts]
+        vectors = self.get_many(keys)
+        missing: Dict[str, int] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            encoded = np.asarray(encode([texts[i] for i in missing.values()]), dtype=np.float32)
+            encoded = encoded.astype(np.float16).astype(np.float32)
+            self.put_many(list(missing), encoded)
+            by_key = dict(zip(missing, encoded))
+            vectors = [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        row_bytes = 0 if self._arena is None else self._arena.shape[1] * self._arena.itemsize
+        return {
+            "name": self.name,
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "bytes_used": len(self._rows) * row_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_embedding_cache(name: str, max_bytes: int = 32 * 1024 * 1024) -> EmbeddingCache:
+    """
+    Returns the process-wide embedding cache with this name, creating it on
+    first use, so every feature encoding with the same model shares it.
+    """
+    cache = _CACHE_REGISTRY.get(name)
+    if cache is None:
+        cache = EmbeddingCache(name, max_bytes=max_bytes)
+    return cache
+
+
+def get_embedding_cache_stats() -> List[Dict[str, Any]]:
+    """Returns hit/miss and memory statistics for every embedding cache in this process."""
+    return [cache.stats() for cache in _CACHE_REGISTRY.values()]
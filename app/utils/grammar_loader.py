@@ -2,6 +2,7 @@
 
 import os
 import json
+import hashlib
 import logging
 from typing import List, Any
 from app.utils.grammar_rules import RegexRule, ClassificationRule, _RE_FLAGS_MAP, _CLASSIFICATION_CONDITIONS_MAP
@@ -13,6 +14,24 @@ def _get_base_path() -> str:
     return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 
 
+def resolve_rule_path(relative_file_path: str) -> str:
+    """Absolute path of a rule file given relative to the project root."""
+    return os.path.join(_get_base_path(), relative_file_path)
+
+
+def compute_rules_version(*relative_file_paths: str) -> str:
+    """Returns a short content hash over the given rule files, used to key cached results."""
+    digest = hashlib.sha1()
+    for relative_file_path in relative_file_paths:
+        full_path = os.path.join(_get_base_path(), relative_file_path)
+        try:
+            with open(full_path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(relative_file_path.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
 def load_rules_from_json(relative_file_path: str, rule_type: str) -> List[Any]:
     full_path = os.path.join(_get_base_path(), relative_file_path)
     logger.info(f"Loading {rule_type} rules from: {full_path}")
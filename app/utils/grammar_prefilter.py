@@ -0,0 +1,303 @@
+# === app/utils/grammar_prefilter.py ===
+"""
+Cheap "likely clean" check that runs before the grammar model.
+
+Most sentences in real documents need no correction, yet each one costs a
+beam-search pass through T5. This scores a parsed sentence with wordlist and
+pattern checks (confusable words, a/an, pronoun agreement, doubled words,
+capitalisation, spacing) plus tag-based subject/verb agreement when the
+parse has tags. Only sentences scoring at or above the threshold go to the
+model. A lower threshold routes more sentences (higher recall, less speedup).
+
+Tune it against the labelled corpus with:
+    python -m app.utils.grammar_prefilter [corpus.jsonl] [--thresholds 0.5 1 1.5 2]
+"""
+
+import json
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from spacy.tokens import Doc, Span
+
+logger = logging.getLogger("grammar_prefilter")
+
+DEFAULT_CORPUS_PATH = Path(__file__).parent.parent / "data" / "benchmarks" / "grammar_prefilter.jsonl"
+
+# Words that are often swapped for one another. Common in clean text too, so a weak signal on its own
+CONFUSABLE_WORDS = frozenset({
+    "their", "there", "they're", "your", "you're", "its", "it's", "whose", "who's",
+    "then", "than", "affect", "effect", "loose", "lose", "accept", "except",
+    "advice", "advise", "weather", "whether", "principal", "principle",
+})
+
+# Words that are almost never right
+SUSPECT_WORDS = frozenset({
+    "alot", "irregardless", "effected", "informations", "advices", "furnitures",
+    "equipments", "knowledges", "feedbacks", "evidences", "luggages",
+})
+
+_BASE_VERBS = (
+    "go", "do", "have", "want", "like", "need", "know", "make", "say", "think", "come",
+    "take", "see", "get", "work", "live", "play", "use", "look", "feel", "seem", "try",
+)
+_THIRD_PERSON = {"go": "goes", "do": "does", "have": "has", "try": "tries"}
+_IRREGULAR_PAST = (
+    "said", "went", "did", "saw", "came", "took", "made", "got", "knew", "thought",
+    "told", "gave", "found", "left", "felt", "brought", "bought", "wrote", "ate",
+)
+
+# Word pairs that are almost always a mistake
+SUSPECT_BIGRAMS = frozenset(
+    {
+        ("could", "of"), ("should", "of"), ("would", "of"), ("must", "of"), ("might", "of"),
+        ("more", "better"), ("most", "best"), ("more", "easier"), ("more", "worse"), ("very", "unique"),
+        ("he", "don't"), ("she", "don't"), ("it", "don't"), ("he", "are"), ("she", "are"), ("it", "are"),
+        ("he", "were"), ("she", "were"), ("i", "is"), ("i", "are"), ("you", "is"), ("you", "was"),
+        ("we", "is"), ("we", "was"), ("they", "is"), ("they", "was"), ("they", "doesn't"),
+        ("we", "doesn't"), ("i", "doesn't"), ("you", "doesn't"),
+        ("your", "going"), ("your", "welcome"), ("your", "right"), ("there", "going"), ("their", "going"),
+        ("their", "is"), ("their", "are"), ("its", "a"), ("its", "been"), ("it's", "own"),
+        ("discuss", "about"), ("discussed", "about"), ("explained", "me"), ("explain", "me"),
+        ("suggested", "me"), ("suggest", "me"), ("return", "back"), ("repeat", "again"),
+    }
+    | {(p, verb) for p in ("he", "she", "it") for verb in _BASE_VERBS}
+    | {(p, _THIRD_PERSON.get(verb, verb + "s")) for p in ("i", "you", "we", "they") for verb in _BASE_VERBS}
+    | {(aux, past) for aux in ("didn't", "doesn't", "don't", "did", "does", "to", "can", "will", "should")
+       for past in _IRREGULAR_PAST}
+)
+
+# Singular and plural subject pronouns, for the tag-based agreement check
+_SINGULAR_SUBJECTS = frozenset({"he", "she", "it", "this", "that"})
+_PLURAL_SUBJECTS = frozenset({"i", "you", "we", "they", "these", "those"})
+
+# "an" before these consonant letters and "a" before these vowel letters is usually right
+_SILENT_H = ("hour", "honest", "honou", "honor", "heir")
+_CONSONANT_SOUND_VOWELS = ("uni", "use", "usu", "uti", "eu", "one", "once", "ubiq", "ura", "ure")
+
+# Doubled words that are often correct ("had had", "that that")
+_VALID_REPEATS = frozenset({"had", "that", "is", "do"})
+
+_ELONGATED = re.compile(r"(\w)\1{2,}")
+_SPACE_BEFORE_PUNCT = re.compile(r"\s[,.;:!?]")
+_TERMINAL_PUNCT = ('.', '!', '?', '"', "'", ')', '”', '’', ':')
+
+# (check name, weight). A single strong signal reaches the default threshold of 1.0
+WEIGHTS = {
+    "suspect_word": 2.0,
+    "suspect_bigram": 2.0,
+    "repeated_word": 2.0,
+    "agreement": 1.5,
+    "article": 1.0,
+    "comparative_then": 1.5,
+    "me_and": 1.5,
+    "confusable_word": 0.5,
+    "lowercase_i": 1.0,
+    "lowercase_start": 1.0,
+    "space_before_punct": 1.0,
+    "double_space": 1.0,
+    "elongated_word": 1.0,
+    "missing_end_punct": 0.5,
+    "long_sentence": 0.5,
+}
+
+LONG_SENTENCE_TOKENS = 40
+
+
+def _article_mismatch(article: str, following: str) -> bool:
+    if not following or not following[0].isalpha():
+        return False
+    starts_with_vowel = following[0] in "aeiou"
+    if article == "a":
+        return starts_with_vowel and not following.startswith(_CONSONANT_SOUND_VOWELS)
+    if article == "an":
+        return not starts_with_vowel and not following.startswith(_SILENT_H)
+    return False
+
+
+def _word_forms(words) -> List[str]:
+    """Lowercase words with clitics joined back on, so "do" + "n't" reads as "don't"."""
+    forms: List[str] = []
+    for token in words:
+        lower = token.lower_.replace("’", "'")
+        if forms and token.i > 0 and not token.nbor(-1).whitespace_ and (lower.startswith("'") or lower == "n't"):
+            forms[-1] += lower
+        else:
+            forms.append(lower)
+    return forms
+
+
+def _tag_agreement(token) -> bool:
+    """True when a nominal subject and its verb (or auxiliary) disagree in number."""
+    if token.dep_ not in ("nsubj", "expl"):
+        return False
+    head = token.head
+    verbs = [head] + [child for child in head.children if child.dep_ in ("aux", "auxpass")]
+    lower = token.lower_
+    singular = lower in _SINGULAR_SUBJECTS or token.tag_ in ("NN", "NNP")
+    plural = (lower in _PLURAL_SUBJECTS or token.tag_ in ("NNS", "NNPS")) and lower != "i"
+    for verb in verbs:
+        if singular and verb.tag_ == "VBP":
+            return True
+        if plural and (verb.tag_ == "VBZ" or verb.lower_ == "was"):
+            return True
+    return False
+
+
+def score_sentence(doc: Union[Doc, Span]) -> Tuple[float, List[str]]:
+    """Returns the sentence's suspicion score and the names of the checks that fired."""
+    text = doc.text.strip()
+    words = [t for t in doc if not t.is_space and not t.is_punct]
+    if not words:
+        return 0.0, []
+
+    has_tags = (doc.doc if isinstance(doc, Span) else doc).has_annotation("TAG")
+    reasons = set()
+
+    first_alpha = next((t for t in words if t.is_alpha), None)
+    if first_alpha is not None and first_alpha.i == words[0].i and first_alpha.text[0].islower():
+        reasons.add("lowercase_start")
+    if not text.endswith(_TERMINAL_PUNCT):
+        reasons.add("missing_end_punct")
+    if len(words) > LONG_SENTENCE_TOKENS:
+        reasons.add("long_sentence")
+    if _SPACE_BEFORE_PUNCT.search(text):
+        reasons.add("space_before_punct")
+    if "  " in text:
+        reasons.add("double_space")
+
+    for token in words:
+        if token.text == "i":
+            reasons.add("lowercase_i")
+        if _ELONGATED.search(token.lower_) and not token.is_digit:
+            reasons.add("elongated_word")
+        if has_tags and _tag_agreement(token):
+            reasons.add("agreement")
+
+    forms = _word_forms(words)
+    for i, form in enumerate(forms):
+        if form in CONFUSABLE_WORDS:
+            reasons.add("confusable_word")
+        if form in SUSPECT_WORDS:
+            reasons.add("suspect_word")
+        if i == 0:
+            if form == "me" and len(forms) > 1 and forms[1] == "and":
+                reasons.add("me_and")
+            continue
+        previous = forms[i - 1]
+        if previous == form and form.isalpha() and form not in _VALID_REPEATS:
+            reasons.add("repeated_word")
+        if (previous, form) in SUSPECT_BIGRAMS:
+            reasons.add("suspect_bigram")
+        if _article_mismatch(previous, form):
+            reasons.add("article")
+        if form == "then" and previous.endswith("er") and len(previous) > 4:
+            reasons.add("comparative_then")
+
+    names = sorted(reasons)
+    return sum(WEIGHTS[name] for name in names), names
+
+
+class GrammarPrefilter:
+    """
+    Decides which sentences are worth sending to the grammar model and keeps
+    process-wide counts of how many were routed and skipped.
+    """
+
+    def __init__(self, threshold: float = 1.0, enabled: bool = True):
+        self.threshold = threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.routed = 0
+        self.skipped = 0
+
+    @property
+    def cache_key(self) -> str:
+        """Part of the sentence cache key, so a threshold change never serves old decisions."""
+        return f"prefilter={self.threshold}" if self.enabled else "prefilter=off"
+
+    def is_suspect(self, doc: Union[Doc, Span]) -> bool:
+        if not self.enabled:
+            return True
+        score, _ = score_sentence(doc)
+        suspect = score >= self.threshold
+        with self._lock:
+            self.checked += 1
+            if suspect:
+                self.routed += 1
+            else:
+                self.skipped += 1
+        return suspect
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "checked": self.checked,
+            "routed_to_model": self.routed,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / self.checked, 4) if self.checked else 0.0,
+        }
+
+
+def load_benchmark_corpus(path: Path = DEFAULT_CORPUS_PATH) -> List[Tuple[str, bool]]:
+    """Reads (sentence, needs_correction) pairs from a JSON-lines file."""
+    corpus = []
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                corpus.append((row["text"], bool(row["needs_correction"])))
+    return corpus
+
+
+def evaluate_prefilter(scored: Iterable[Tuple[float, bool]], threshold: float) -> Dict[str, Any]:
+    """
+    Scores the filter on labelled (score, needs_correction) pairs. A hit is a
+    clean sentence the filter skips; a miss is a sentence needing correction
+    that it skips (the model never sees it). The speedup assumes skipped
+    sentences cost nothing next to a model call.
+    """
+    scored = list(scored)
+    clean = [score for score, needs_correction in scored if not needs_correction]
+    faulty = [score for score, needs_correction in scored if needs_correction]
+    hits = sum(score < threshold for score in clean)
+    misses = sum(score < threshold for score in faulty)
+    routed = len(scored) - hits - misses
+    return {
+        "threshold": threshold,
+        "sentences": len(scored),
+        "hit_rate": round(hits / len(clean), 4) if clean else 0.0,
+        "miss_rate": round(misses / len(faulty), 4) if faulty else 0.0,
+        "recall": round(1 - misses / len(faulty), 4) if faulty else 1.0,
+        "routed_to_model": routed,
+        "estimated_speedup": round(len(scored) / routed, 2) if routed else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.config import SPACY_MODEL_ID, settings
+    from app.services.base import load_spacy_model
+
+    parser = argparse.ArgumentParser(description="Measure the grammar pre-filter against a labelled corpus.")
+    parser.add_argument("corpus", nargs="?", default=str(DEFAULT_CORPUS_PATH))
+    parser.add_argument("--thresholds", nargs="+", type=float,
+                        default=sorted({0.5, 1.0, 1.5, 2.0, settings.GRAMMAR_PREFILTER_THRESHOLD}))
+    args = parser.parse_args()
+
+    nlp = load_spacy_model(SPACY_MODEL_ID)
+    corpus = load_benchmark_corpus(Path(args.corpus))
+    docs = nlp.pipe(text for text, _ in corpus)
+    scored = [(score_sentence(doc)[0], needs_correction) for doc, (_, needs_correction) in zip(docs, corpus)]
+
+    print(f"{len(scored)} sentences, {sum(n for _, n in scored)} needing correction ({args.corpus})")
+    print(f"{'threshold':>9} {'hit rate':>9} {'miss rate':>9} {'recall':>7} {'routed':>7} {'speedup':>8}")
+    for threshold in args.thresholds:
+        r = evaluate_prefilter(scored, threshold)
+        print(f"{threshold:>9} {r['hit_rate']:>9} {r['miss_rate']:>9} {r['recall']:>7} "
+              f"{r['routed_to_model']:>7} {r['estimated_speedup']:>7}x")
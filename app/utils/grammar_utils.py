@@ -2,10 +2,11 @@
 
 import difflib
 import logging
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from spacy.language import Doc
 from spacy.tokens import Span
 from app.utils.grammar_rules import GrammarCorrectionIssue, ClassificationRule
+from app.utils.line_index import LineIndex
 
 logger = logging.getLogger("grammar_utils")
 
@@ -43,9 +44,12 @@ def generate_diff_issues_for_sentence(
     global_offset_start: int,
     full_text: str,
     spacy_nlp,
-    rules: List[ClassificationRule]
+    rules: Sequence[ClassificationRule],
+    original_doc: Optional[Doc] = None
 ) -> List[GrammarCorrectionIssue]:
-    original_doc = spacy_nlp(original_sentence)
+    # Reuse the caller's parse of the original sentence when one is available
+    if original_doc is None:
+        original_doc = spacy_nlp(original_sentence)
     corrected_doc = spacy_nlp(corrected_sentence)
 
     original_tokens = list(original_doc)
@@ -124,7 +128,7 @@ def generate_diff_issues_for_sentence(
     return issues
 
 
-def classify_diff_span(original_span: Span, corrected_span: Span, tag: str, rules: List[ClassificationRule]) -> Tuple[str, str, str, str]:
+def classify_diff_span(original_span: Span, corrected_span: Span, tag: str, rules: Sequence[ClassificationRule]) -> Tuple[str, str, str, str]:
     for rule in rules:
         if rule.tag_specific == 'any' or rule.tag_specific == tag:
             try:
@@ -144,3 +148,22 @@ def offset_to_line_col(text: str, offset: int) -> Tuple[int, int]:
             return idx + 1, offset - total + 1
         total += len(line)
     return len(lines), 1
+
+
+def rebase_issue(issue: Dict[str, Any], sentence_offset: int, full_text: str, line_index: LineIndex) -> Dict[str, Any]:
+    """
+    Moves a sentence-relative issue (as stored in the sentence cache) onto the
+    current document: shifts the offset and recomputes context and line/column.
+    Returns a new dict; the cached issue is left untouched.
+    """
+    offset = issue["offset"] + sentence_offset
+    length = issue["length"]
+    line, column = line_index.line_col(offset)
+    return {
+        **issue,
+        "offset": offset,
+        "context_before": full_text[max(0, offset - 25):offset],
+        "context_after": full_text[offset + length:offset + length + 25],
+        "line": line,
+        "column": column,
+    }
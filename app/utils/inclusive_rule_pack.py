@@ -0,0 +1,230 @@
+# === app/utils/inclusive_rule_pack.py ===
+"""
+Precompiled inclusive-language rule pack.
+
+Parsing the YAML rule files and tokenizing every term is the slow part of
+starting the inclusive-language checker. This module does it once and
+stores the result as a single msgpack file: rule data, the pre-tokenized
+phrase patterns, wildcard token patterns and term indexes. The file is keyed
+by a content hash of the YAML and the tokenizer that produced it, so any
+rule edit or spaCy upgrade rebuilds it automatically, and every worker
+loads exactly the same rules.
+
+Build ahead of time (e.g. in the Docker image) with:
+    python -m app.utils.inclusive_rule_pack
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import spacy
+import srsly
+import yaml
+from spacy.language import Language
+
+from app.core.config import settings, APP_NAME
+
+logger = logging.getLogger(f"{APP_NAME}.utils.inclusive_rule_pack")
+
+# Bump when the layout of the pack or the meaning of its patterns changes
+PACK_FORMAT_VERSION = 2
+
+
+def _rule_files(rules_dir: Path) -> List[Path]:
+    # Sorted so rule IDs and match order are the same on every machine
+    return sorted(rules_dir.glob("*.yml"))
+
+
+def compute_rules_hash(rules_dir: Path, nlp: Language) -> str:
+    """Content hash over the rule files, the pack format and the tokenizer's model/version."""
+    digest = hashlib.sha1()
+    digest.update(f"{PACK_FORMAT_VERSION}:{spacy.__version__}:{nlp.meta.get('name')}:{nlp.meta.get('version')}".encode("utf-8"))
+    for yaml_file in _rule_files(rules_dir):
+        digest.update(yaml_file.name.encode("utf-8"))
+        digest.update(yaml_file.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def wildcard_regex(term: str) -> re.Pattern:
+    """
+    The regex a wildcard term has always meant: '*' is a run of non-space
+    characters and the term must start and end at word boundaries.
+    """
+    return re.compile(r"\b" + re.escape(term).replace(r"\*", r"\S+") + r"\b", re.IGNORECASE)
+
+
+def _wildcard_pattern(nlp: Language, term: str) -> List[Dict]:
+    r"""
+    Turns a wildcard term into Matcher token patterns. A part containing '*'
+    becomes a run of tokens with no whitespace between them (one
+    whitespace-delimited chunk, like the regex's \S+); the other words must
+    match case-insensitively. The Matcher only proposes candidates; each is
+    confirmed against `wildcard_regex`, which also decides where a chunk ends.
+    """
+    pattern = []
+    for part in term.split():
+        if "*" in part:
+            pattern.append({"IS_SPACE": False, "SPACY": False, "OP": "*"})
+            pattern.append({"IS_SPACE": False})
+        else:
+            pattern.extend({"LOWER": token.lower_} for token in nlp.make_doc(part))
+    return pattern
+
+
+def compile_rule_pack(rules_dir: Path, nlp: Language) -> Dict[str, Any]:
+    """
+    Parses every YAML rule file and returns the pack as plain data:
+      rules         rule_id -> rule as written in the YAML
+      phrases       [rule_id, [lowercase tokens]] for single-token words and phrases
+      single_words  lowercase word -> [rule_id, gender] of the first rule listing it
+      term_genders  rule_id -> {lowercase term: gender}
+      wildcards     matcher key -> {rule_id, original_term, gender, pattern}
+    """
+    rules: Dict[str, Dict] = {}
+    phrases: List[List[Any]] = []
+    single_words: Dict[str, List[Optional[str]]] = {}
+    term_genders: Dict[str, Dict[str, Optional[str]]] = {}
+    wildcards: Dict[str, Dict[str, Any]] = {}
+
+    for yaml_file in _rule_files(rules_dir):
+        try:
+            with yaml_file.open(encoding="utf-8") as f:
+                file_rules = yaml.safe_load(f)
+
+            if not isinstance(file_rules, list):
+                logger.warning(f"Skipping non-list rule file: {yaml_file.name}")
+                continue
+
+            for rule in file_rules:
+                # Generate a unique rule ID if not explicitly provided in the YAML
+                rule_id = rule.get("id") or f"{yaml_file.stem}_{len(rules)}"
+                inconsiderate_terms = rule.get("inconsiderate", [])
+
+                # Dictionary format associates additional data (like gender) with each term
+                if isinstance(inconsiderate_terms, dict):
+                    terms_to_process = list(inconsiderate_terms.items())
+                elif isinstance(inconsiderate_terms, list):
+                    terms_to_process = [(t, None) for t in inconsiderate_terms]
+                else:
+                    logger.warning(f"Invalid 'inconsiderate' field in rule {rule_id}: {inconsiderate_terms}")
+                    continue
+
+                rules[rule_id] = rule
+                genders = term_genders.setdefault(rule_id, {})
+
+                for term, gender in terms_to_process:
+                    term_lower = str(term).lower().strip()
+                    if not term_lower:
+                        logger.warning(f"Skipping empty term in rule {rule_id}")
+                        continue
+                    # Skip single-character terms unless they are common single-letter words like 'a' or 'i'
+                    if len(term_lower) <= 1 and term_lower not in ["a", "i"]:
+                        logger.warning(f"Skipping single-character term (unless 'a' or 'i'): {term_lower} in rule {rule_id}")
+                        continue
+
+                    # The first gender listed for a term wins
+                    genders.setdefault(term_lower, gender)
+
+                    if "*" in term_lower:
+                        # Each wildcard term gets its own key so its gender can be looked up on a match
+                        key = f"{rule_id}#wildcard{len(wildcards)}"
+                        wildcards[key] = {
+                            "rule_id": rule_id,
+                            "original_term": term_lower,
+                            "gender": gender,
+                            "pattern": _wildcard_pattern(nlp, term_lower),
+                        }
+                    elif " " in term_lower:
+                        phrases.append([rule_id, [t.text for t in nlp.make_doc(term_lower)]])
+                    elif term_lower not in single_words:
+                        # Single words are matched under the first rule that lists them only,
+                        # and only as a whole token: words the tokenizer splits ("he's",
+                        # "a.d.d.") have never matched and are kept out of the matcher
+                        single_words[term_lower] = [rule_id, gender]
+                        words = [t.text for t in nlp.make_doc(term_lower)]
+                        if len(words) == 1:
+                            phrases.append([rule_id, words])
+
+        except yaml.YAMLError as e:
+            logger.error(f"YAML error in file {yaml_file.name}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error loading rules from {yaml_file.name}: {e}")
+
+    return {
+        "format": PACK_FORMAT_VERSION,
+        "hash": compute_rules_hash(rules_dir, nlp),
+        "built_at": time.time(),
+        "rules": rules,
+        "phrases": phrases,
+        "single_words": single_words,
+        "term_genders": term_genders,
+        "wildcards": wildcards,
+    }
+
+
+def write_rule_pack(pack: Dict[str, Any], path: Path) -> None:
+    """Writes the pack atomically, so concurrent workers never read a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(srsly.msgpack_dumps(pack))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_rule_pack(path: Path) -> Optional[Dict[str, Any]]:
+    """Reads a pack with a single read. Returns None if it is missing or unreadable."""
+    try:
+        pack = srsly.msgpack_loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable inclusive rule pack {path}: {e}")
+        return None
+    return pack if isinstance(pack, dict) and pack.get("format") == PACK_FORMAT_VERSION else None
+
+
+def load_rule_pack(rules_dir: Path, nlp: Language, pack_path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Returns the pack for the current rule files, rebuilding and saving it if the
+    cached one is missing or was built from different rules. A failure to save
+    is logged and the freshly compiled pack is still returned.
+    """
+    pack_path = Path(pack_path or settings.INCLUSIVE_RULE_PACK_PATH)
+    expected_hash = compute_rules_hash(rules_dir, nlp)
+
+    pack = read_rule_pack(pack_path)
+    if pack is not None and pack.get("hash") == expected_hash:
+        logger.info(f"Loaded inclusive rule pack {expected_hash} from {pack_path}")
+        return pack
+
+    start_time = time.time()
+    pack = compile_rule_pack(rules_dir, nlp)
+    logger.info(f"Compiled inclusive rule pack {pack['hash']} in {time.time() - start_time:.2f} seconds")
+    try:
+        write_rule_pack(pack, pack_path)
+    except OSError as e:
+        logger.warning(f"Could not save inclusive rule pack to {pack_path}: {e}")
+    return pack
+
+
+if __name__ == "__main__":
+    from app.core.config import INCLUSIVE_RULES_DIR, SPACY_MODEL_ID
+    from app.core.logging import configure_logging
+    from app.services.base import load_spacy_model
+
+    configure_logging()
+    built = load_rule_pack(Path(INCLUSIVE_RULES_DIR), load_spacy_model(SPACY_MODEL_ID))
+    print(f"Inclusive rule pack {built['hash']}: {len(built['rules'])} rules, "
+          f"{len(built['phrases'])} phrases, {len(built['wildcards'])} wildcards -> {settings.INCLUSIVE_RULE_PACK_PATH}")
@@ -0,0 +1,46 @@
+# === app/utils/interval_set.py ===
+
+from bisect import bisect_right
+from typing import List, Tuple
+
+
+class IntervalSet:
+    """
+    Sorted, non-overlapping half-open intervals [start, end) with
+    binary-search overlap checks, for greedy "accept unless it overlaps
+    something already accepted" selection.
+
+    Intervals added in start order (the usual case) are appended, so a whole
+    selection pass is O(n log n).
+    """
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """True if [start, end) shares at least one position with an accepted interval."""
+        idx = bisect_right(self._starts, start)
+        # The interval starting at or before `start` may run past it
+        if idx > 0 and self._ends[idx - 1] > start:
+            return True
+        # The next interval may start before `end`
+        return idx < len(self._starts) and self._starts[idx] < end
+
+    def add(self, start: int, end: int) -> bool:
+        """Accepts [start, end) unless it overlaps. Returns whether it was added."""
+        if self.overlaps(start, end):
+            return False
+        idx = bisect_right(self._starts, start)
+        self._starts.insert(idx, start)
+        self._ends.insert(idx, end)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def as_list(self) -> List[Tuple[int, int]]:
+        return list(self)
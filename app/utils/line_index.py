@@ -0,0 +1,23 @@
+# === app/utils/line_index.py ===
+
+from bisect import bisect_right
+from typing import List, Tuple
+
+
+class LineIndex:
+    """
+    Precomputed line start offsets for a text, so offset -> (line, column)
+    lookups are a binary search instead of a rescan of the text.
+    """
+
+    def __init__(self, text: str):
+        self._line_starts: List[int] = [0]
+        pos = text.find("\n")
+        while pos != -1:
+            self._line_starts.append(pos + 1)
+            pos = text.find("\n", pos + 1)
+
+    def line_col(self, offset: int) -> Tuple[int, int]:
+        """Returns the 1-based (line, column) for a character offset."""
+        line_idx = bisect_right(self._line_starts, offset) - 1
+        return line_idx + 1, offset - self._line_starts[line_idx] + 1
@@ -0,0 +1,83 @@
+# === app/utils/readability_engine.py ===
+
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import textstat
+
+logger = logging.getLogger("readability_engine")
+
+# A word, keeping contractions ("don't") and hyphenated compounds ("well-known") whole
+_WORD = re.compile(r"\w+(?:[-'’]\w+)*")
+
+SCORE_NAMES = ("flesch_reading_ease", "flesch_kincaid_grade", "gunning_fog", "smog_index", "coleman_liau_index")
+
+# SMOG is only defined for samples of three or more sentences, so single sentences don't get one
+SENTENCE_SCORE_NAMES = tuple(name for name in SCORE_NAMES if name != "smog_index")
+
+
+@lru_cache(maxsize=100000)
+def count_syllables(word: str) -> int:
+    """Syllables in one lowercase word, cached for the life of the process."""
+    return sum(max(1, textstat.syllable_count(part)) for part in re.split(r"[-'’]", word) if part)
+
+
+@lru_cache(maxsize=100000)
+def _word_profile(word: str) -> Tuple[int, int]:
+    """(syllables, letters) of one lowercase word."""
+    return count_syllables(word), len(word) - word.count("-") - word.count("'") - word.count("’")
+
+
+def sentence_statistics(text: str, sentence_starts: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Tokenizes `text` once and returns per-sentence counts of words, syllables,
+    polysyllabic (3+ syllable) words and letters. Each word belongs to the
+    sentence with the last start offset at or before it.
+    """
+    n = len(sentence_starts)
+    matches = list(_WORD.finditer(text))
+    if not n or not matches:
+        return {name: np.zeros(n, dtype=np.int64) for name in ("words", "syllables", "polysyllables", "letters")}
+
+    word_starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    owner = np.clip(np.searchsorted(np.asarray(sentence_starts), word_starts, side="right") - 1, 0, n - 1)
+    profiles = np.array([_word_profile(m.group().lower()) for m in matches], dtype=np.int64)
+    syllables, letters = profiles[:, 0], profiles[:, 1]
+    return {
+        "words": np.bincount(owner, minlength=n),
+        "syllables": np.bincount(owner, weights=syllables, minlength=n).astype(np.int64),
+        "polysyllables": np.bincount(owner, weights=syllables >= 3, minlength=n).astype(np.int64),
+        "letters": np.bincount(owner, weights=letters, minlength=n).astype(np.int64),
+    }
+
+
+def readability_scores(words, sentences, syllables, polysyllables, letters) -> Dict[str, np.ndarray]:
+    """
+    Flesch reading ease, Flesch-Kincaid grade, Gunning Fog, SMOG and
+    Coleman-Liau from counts. Arguments may be scalars (a document) or arrays
+    (one entry per sentence); texts without words score 0.0, as in textstat.
+    Gunning Fog counts every polysyllabic word as complex, without the usual
+    exclusions for proper nouns or words made polysyllabic by a suffix.
+    """
+    words, sentences, syllables, polysyllables, letters = (
+        np.asarray(a, dtype=np.float64) for a in (words, sentences, syllables, polysyllables, letters)
+    )
+    scored = (words > 0) & (sentences > 0)
+    words_safe = np.where(scored, words, 1.0)
+    sentences_safe = np.where(scored, sentences, 1.0)
+    words_per_sentence = words_safe / sentences_safe
+    syllables_per_word = syllables / words_safe
+
+    scores = {
+        "flesch_reading_ease": 206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word,
+        "flesch_kincaid_grade": 0.39 * words_per_sentence + 11.8 * syllables_per_word - 15.59,
+        "gunning_fog": 0.4 * (words_per_sentence + 100.0 * polysyllables / words_safe),
+        "smog_index": 1.043 * np.sqrt(polysyllables * 30.0 / sentences_safe) + 3.1291,
+        "coleman_liau_index": (
+            0.0588 * (letters / words_safe * 100.0) - 0.296 * (sentences_safe / words_safe * 100.0) - 15.8
+        ),
+    }
+    return {name: np.where(scored, score, 0.0) for name, score in scores.items()}
@@ -0,0 +1,104 @@
+# === app/utils/rewrite_engine.py ===
+
+import logging
+import re
+from typing import List, Optional, Sequence, Tuple, Union
+
+from app.utils.grammar_rules import RegexRule
+
+logger = logging.getLogger("rewrite_engine")
+
+# Inline letters for the flags that can be scoped to one part of a pattern
+_SCOPED_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+
+# A replacement that refers to groups (\1, \g<name>) or uses escapes has to be expanded per match
+_TEMPLATE_CHARS = re.compile(r"\\")
+
+# Patterns that can only start at the beginning of a word, e.g. r"\bteh\b"
+_WORD_START = re.compile(r"\\b\w")
+
+# Backreferences in a pattern (\1, (?P=name)) would point at the wrong group once merged
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def _scoped(pattern: str, flags: int) -> str:
+    letters = "".join(letter for flag, letter in _SCOPED_FLAGS if flags & flag)
+    return f"(?{letters}:{pattern})" if letters else f"(?:{pattern})"
+
+
+class RewriteEngine:
+    r"""
+    Applies a list of RegexRule rewrites in a single scan.
+
+    All patterns are merged into one alternation, `(?P<r0>...)|(?P<r1>...)`,
+    each wrapped in its own scoped inline flags, so the text is searched once
+    whatever the number of rules. Each run of adjacent rules anchored at a
+    word start (r"\bword...") shares one `(?=\w)\b(?:...)` branch, so
+    positions that can't begin a word are rejected once per run rather than
+    once per rule; only adjacent rules are merged, which keeps every rule in
+    its place in the alternation. At any position the leftmost
+    match wins and, between rules matching at the same position, the earlier
+    rule. Unlike chained re.sub calls, a rule never sees another rule's output.
+    Group names must not be reused across rules, and the rare rule whose
+    pattern uses a backreference runs on its own after the combined scan.
+    """
+
+    def __init__(self, rules: Sequence[RegexRule]):
+        self.rules: List[RegexRule] = []
+        # Per-rule compiled pattern, kept only for rules whose replacement is a template
+        self._templates: List[Optional[re.Pattern]] = []
+        # A list holds a run of adjacent word-start rules that become one branch
+        alternatives: List[Union[str, List[str]]] = []
+        self._standalone: List[Tuple[re.Pattern, str]] = []
+        standalone: List[RegexRule] = []
+
+        for rule in rules:
+            try:
+                compiled = re.compile(rule.pattern, rule.flags)
+            except re.error as e:
+                logger.warning(f"Skipping invalid rewrite pattern {rule.pattern!r}: {e}")
+                continue
+            if _BACKREFERENCE.search(rule.pattern):
+                standalone.append(rule)
+                self._standalone.append((compiled, rule.replacement))
+                continue
+            idx = len(self.rules)
+            if _WORD_START.match(rule.pattern):
+                if not alternatives or not isinstance(alternatives[-1], list):
+                    alternatives.append([])
+                alternatives[-1].append(f"(?P<r{idx}>{_scoped(rule.pattern[2:], rule.flags)})")
+            else:
+                alternatives.append(f"(?P<r{idx}>{_scoped(rule.pattern, rule.flags)})")
+            self.rules.append(rule)
+            self._templates.append(compiled if _TEMPLATE_CHARS.search(rule.replacement) else None)
+
+        branches = [r"(?=\w)\b(?:" + "|".join(alt) + ")" if isinstance(alt, list) else alt for alt in alternatives]
+        self._combined: Optional[re.Pattern] = re.compile("|".join(branches)) if branches else None
+        self.rules.extend(standalone)
+
+    def apply(self, text: str) -> Tuple[str, int]:
+        """Returns the rewritten text and how many rewrites were made."""
+        count = 0
+
+        def replace(match: re.Match) -> str:
+            nonlocal count
+            idx = int(match.lastgroup[1:])
+            template = self._templates[idx]
+            count += 1
+            if template is None:
+                return self.rules[idx].replacement
+            # Re-match the rule on its own, at the same position, so its group numbers apply
+            return template.match(match.string, match.start()).expand(self.rules[idx].replacement)
+
+        if self._combined is not None:
+            text = self._combined.sub(replace, text)
+        for pattern, replacement in self._standalone:
+            text, n = pattern.subn(replacement, text)
+            count += n
+        return text, count
+
+    def rewrite(self, text: str) -> str:
+        return self.apply(text)[0]
+
+    def __len__(self) -> int:
+        return len(self.rules)
@@ -0,0 +1,99 @@
+# === app/utils/sentence_cache.py ===
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("sentence_cache")
+
+# Every cache created in this process, by name, so they can be reported together.
+_CACHE_REGISTRY: Dict[str, "SentenceResultCache"] = {}
+
+
+class SentenceResultCache:
+    """
+    Content-addressed LRU cache for per-sentence analyzer results.
+
+    Keys combine a hash of the sentence text with the model ID and rule version
+    that produced the result, so a model or rule change never serves stale
+    entries. Values must store offsets relative to the sentence; callers rebase
+    them onto the current document after a hit.
+
+    Only model-backed work is cached (grammar, synonyms, paraphrase and tone).
+    Inclusive language, voice and readability read the request's shared spaCy
+    parse, which /analyze builds whenever any of them runs, and do one matcher
+    or counting pass over its tokens on top of it; a lookup would not skip the
+    parse, and readability already caches syllable counts per word.
+    """
+
+    def __init__(self, name: str, max_entries: int = 5000):
+        self.name = name
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _CACHE_REGISTRY[name] = self
+
+    @staticmethod
+    def make_key(sentence: str, model_id: str, rule_version: str = "") -> str:
+        digest = hashlib.sha1(sentence.encode("utf-8")).hexdigest()
+        return f"{model_id}:{rule_version}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def get_sentence_cache(name: str, max_entries: int = 5000) -> SentenceResultCache:
+    """
+    Returns the process-wide cache with this name, creating it on first use,
+    so every service instance for the same model shares one cache.
+    """
+    cache = _CACHE_REGISTRY.get(name)
+    if cache is None:
+        cache = SentenceResultCache(name, max_entries=max_entries)
+    return cache
+
+
+def get_sentence_cache_stats() -> List[Dict[str, Any]]:
+    """Returns hit/miss statistics for every sentence cache in this process."""
+    return [cache.stats() for cache in _CACHE_REGISTRY.values()]
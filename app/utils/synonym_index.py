@@ -0,0 +1,163 @@
+# === app/utils/synonym_index.py ===
+"""
+Precomputed WordNet synonym index for the synonym service.
+
+Looking up synonyms live means two `wn.synsets` calls and re-tokenizing every
+definition for each (word, synonym) pair. This builds, once, a table of
+(word, WordNet POS) -> synonyms that already passed the definition-overlap
+check, and stores it in a small read-only SQLite file, so a lookup is a
+single primary-key hit.
+
+Build ahead of time (e.g. in the Docker image) with:
+    python -m app.utils.synonym_index
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("synonym_index")
+
+# Bump when the table layout or the filtering rules change
+INDEX_FORMAT_VERSION = 1
+
+WORDNET_POS = ("n", "v", "a", "r")
+
+
+def _synonyms(wordnet, word: str, pos: str) -> List[str]:
+    """Single-word lemma names sharing a synset with `word`, as the synonym service used to compute them."""
+    return sorted({
+        lemma.name().replace("_", " ").lower()
+        for syn in wordnet.synsets(word, pos=pos)
+        for lemma in syn.lemmas()
+        if lemma.name().replace("_", " ").isalpha() and lemma.name().lower() != word.lower()
+    })
+
+
+def iter_index_rows(wordnet) -> Iterator[Tuple[str, str, str]]:
+    """Yields (word, pos, tab-separated synonyms) for every single-word WordNet lemma."""
+    definition_words: Dict[Tuple[str, str], FrozenSet[str]] = {}
+
+    def definitions(word: str, pos: str) -> FrozenSet[str]:
+        key = (word, pos)
+        if key not in definition_words:
+            definition_words[key] = frozenset(
+                w for s in wordnet.synsets(word, pos=pos) for w in s.definition().split()
+            )
+        return definition_words[key]
+
+    for pos in WORDNET_POS:
+        for name in sorted(set(wordnet.all_lemma_names(pos=pos))):
+            # The service only looks up single alphabetic tokens
+            if not name.isalpha():
+                continue
+            word = name.lower()
+            own = definitions(word, pos)
+            kept = [synonym for synonym in _synonyms(wordnet, word, pos) if own & definitions(synonym, pos)]
+            yield word, pos, "\t".join(kept)
+
+
+def build_synonym_index(path: Path, wordnet=None) -> int:
+    """Builds the index and atomically replaces `path` with it. Returns the number of entries."""
+    if wordnet is None:
+        from nltk.corpus import wordnet
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+            conn.execute(
+                "CREATE TABLE synonyms (word TEXT, pos TEXT, candidates TEXT, PRIMARY KEY (word, pos)) WITHOUT ROWID"
+            )
+            conn.executemany("INSERT OR IGNORE INTO synonyms VALUES (?, ?, ?)", iter_index_rows(wordnet))
+            count = conn.execute("SELECT COUNT(*) FROM synonyms").fetchone()[0]
+            get_version = getattr(wordnet, "get_version", None)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("format", str(INDEX_FORMAT_VERSION)),
+                ("wordnet_version", str(get_version() if get_version else "unknown")),
+                ("built_at", str(time.time())),
+            ])
+            conn.commit()
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return count
+
+
+class SynonymIndex:
+    """
+    Read-only view of a built index, opened on first lookup. Each thread gets
+    its own SQLite connection. `available` is False when the file is missing
+    or was built in another format, so callers can fall back to WordNet.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._available: Optional[bool] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                row = self._connect().execute("SELECT value FROM meta WHERE key = 'format'").fetchone()
+                self._available = row is not None and row[0] == str(INDEX_FORMAT_VERSION)
+                if not self._available:
+                    logger.warning(f"Ignoring synonym index {self.path} built in another format")
+            except sqlite3.Error as e:
+                logger.warning(f"Synonym index {self.path} unavailable ({e}); build it with python -m app.utils.synonym_index")
+                self._available = False
+        return self._available
+
+    @lru_cache(maxsize=20000)
+    def get(self, word: str, pos: str) -> Optional[Tuple[str, ...]]:
+        """Filtered synonyms of a lowercase word, or None if the word isn't a WordNet lemma for this POS."""
+        row = self._connect().execute(
+            "SELECT candidates FROM synonyms WHERE word = ? AND pos = ?", (word, pos)
+        ).fetchone()
+        if row is None:
+            return None
+        return tuple(row[0].split("\t")) if row[0] else ()
+
+    def vocabulary(self) -> List[str]:
+        """Every indexed word and every candidate, sorted."""
+        words = set()
+        for word, candidates in self._connect().execute("SELECT word, candidates FROM synonyms"):
+            words.add(word)
+            if candidates:
+                words.update(candidates.split("\t"))
+        return sorted(words)
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+    from app.core.logging import configure_logging
+    from app.services.base import ensure_nltk_resource
+
+    configure_logging()
+    ensure_nltk_resource("wordnet")
+    start_time = time.time()
+    entries = build_synonym_index(Path(settings.SYNONYM_INDEX_PATH))
+    print(f"Synonym index: {entries} entries in {time.time() - start_time:.1f}s -> {settings.SYNONYM_INDEX_PATH}")
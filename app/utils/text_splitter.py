@@ -1,11 +1,12 @@
 import re
 import logging
-from typing import List, Literal
-from dataclasses import dataclass
+from typing import List, Literal, Optional
+from dataclasses import dataclass, field
 from functools import lru_cache
 
 import spacy
 from spacy.language import Language
+from spacy.tokens import Doc, Span
 
 from app.services.base import load_spacy_model
 from app.core.config import SPACY_MODEL_ID, APP_NAME
@@ -21,19 +22,20 @@ class SentenceSegment:
     text: str
     start: int  # Character offset in the original text
     end: int
+    span: Optional[Span] = field(default=None, repr=False, compare=False)  # Source span, when split from a Doc
 
 # -----------------------------
-# Load spaCy model with caching
+# Sentence-splitting view of the shared spaCy model
 # -----------------------------
 
 @lru_cache(maxsize=1)
 def get_nlp_instance() -> Language:
-    """Load and cache spaCy NLP model with only necessary components."""
+    """
+    Returns a view of the shared spaCy model with only the components needed
+    for splitting. The model itself is loaded once by the registry.
+    """
     try:
-        logger.info(f"Loading spaCy model '{SPACY_MODEL_ID}'...")
-        nlp = load_spacy_model(SPACY_MODEL_ID, disable=("ner", "textcat", "lemmatizer", "tagger"))
-        logger.info(f"spaCy model '{SPACY_MODEL_ID}' loaded.")
-        return nlp
+        return load_spacy_model(SPACY_MODEL_ID, disable=("ner", "textcat", "lemmatizer", "tagger"))
     except Exception as e:
         logger.error(f"Failed to load spaCy model: {e}", exc_info=True)
         raise RuntimeError(f"spaCy model '{SPACY_MODEL_ID}' could not be loaded.") from e
@@ -42,27 +44,56 @@ def get_nlp_instance() -> Language:
 # Sentence splitter
 # -----------------------------
 
+def sentences_from_doc(doc: Doc) -> List[SentenceSegment]:
+    """Builds sentence segments from an already parsed Doc, trimming edge whitespace tokens."""
+    segments = []
+    for sent in doc.sents:
+        start, end = sent.start, sent.end
+        while start < end and doc[start].is_space:
+            start += 1
+        while end > start and doc[end - 1].is_space:
+            end -= 1
+        if start == end:
+            continue
+        span = doc[start:end]
+        segments.append(SentenceSegment(text=span.text, start=span.start_char, end=span.end_char, span=span))
+    return segments
+
+
 def split_text_into_sentences(text: str) -> List[SentenceSegment]:
     """Splits text into sentences and returns segments with start/end offsets."""
     if not text.strip():
         return []
 
     nlp = get_nlp_instance()
-    doc = nlp(text)
-
-    return [
-        SentenceSegment(text=sent.text.strip(), start=sent.start_char, end=sent.end_char)
-        for sent in doc.sents
-        if sent.text.strip()
-    ]
+    return sentences_from_doc(nlp(text))
 
 # -----------------------------
 # Paragraph splitter
 # -----------------------------
 
+PARAGRAPH_BREAK = re.compile(r'\n{2,}')
+
 def split_text_into_paragraphs(text: str) -> List[str]:
     """Splits text into paragraphs based on 2+ newlines."""
-    return [p.strip() for p in re.split(r'\n{2,}', text) if p.strip()]
+    return [p.strip() for p in PARAGRAPH_BREAK.split(text) if p.strip()]
+
+
+def split_text_into_paragraph_segments(text: str) -> List[SentenceSegment]:
+    """Same split as split_text_into_paragraphs, but keeps each paragraph's offsets."""
+    bounds = [0]
+    for match in PARAGRAPH_BREAK.finditer(text):
+        bounds.extend((match.start(), match.end()))
+    bounds.append(len(text))
+
+    segments = []
+    for start, end in zip(bounds[::2], bounds[1::2]):
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            start += len(piece) - len(piece.lstrip())
+            segments.append(SentenceSegment(text=stripped, start=start, end=start + len(stripped)))
+    return segments
 
 # -----------------------------
 # Chunk splitter with sentence-aware logic
@@ -0,0 +1,183 @@
+# === app/utils/word_embedding_index.py ===
+"""
+Precomputed embeddings for the WordNet synonym vocabulary.
+
+Every word the synonym index can suggest is encoded once with the
+sentence-transformer model and stored as a normalized float16 matrix
+(`vectors.npy`, one row per word) next to the sorted word list (`words.npy`).
+Both are memory-mapped on first use, so scoring a candidate against a context
+vector is a row gather and a dot product instead of a model forward pass.
+
+Vocabulary and context vectors come from the same place, so their dot product
+is meaningful: both are the mean of the model's unpooled token embeddings over
+the subwords of one word (`span_embeddings`). A vocabulary word is read inside
+the neutral VOCABULARY_TEMPLATE; a context word inside its own sentence.
+
+Build after the synonym index (e.g. in the Docker image) with:
+    python -m app.utils.word_embedding_index
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("word_embedding_index")
+
+# Bump when the way vectors are computed changes; older indexes are then ignored
+INDEX_FORMAT_VERSION = 2
+
+VOCABULARY_TEMPLATE = "The word is {word}."
+
+
+def index_dir_for(root: Path, model_id: str) -> Path:
+    """Vectors only make sense for the model that produced them, so each model gets its own directory."""
+    return Path(root) / model_id.replace("/", "--")
+
+
+def span_embeddings(
+    model: Any, texts: List[str], spans: List[List[Tuple[int, int]]], batch_size: int = 32
+) -> List[np.ndarray]:
+    """
+    One normalized embedding per (start, end) character span of each text: the
+    mean of the model's token embeddings for the subword tokens the span
+    covers. Each text is encoded once, whatever the number of spans.
+    """
+    token_embeddings = model.encode(
+        texts, batch_size=batch_size, output_value="token_embeddings", show_progress_bar=False
+    )
+    encoded = model.tokenizer(texts, return_offsets_mapping=True, truncation=True, max_length=model.max_seq_length)
+    vectors = []
+    for embeddings, offsets, text_spans in zip(token_embeddings, encoded["offset_mapping"], spans):
+        embeddings = embeddings.cpu().numpy() if hasattr(embeddings, "cpu") else np.asarray(embeddings)
+        offsets = np.asarray(offsets[:len(embeddings)])
+        embeddings = embeddings[:len(offsets)]
+        starts, ends = offsets[:, 0], offsets[:, 1]
+        rows = []
+        for start, end in text_spans:
+            # Special tokens have empty offsets and never count as covered
+            covered = (starts < end) & (ends > start) & (ends > starts)
+            vector = embeddings[covered].mean(axis=0) if covered.any() else embeddings.mean(axis=0)
+            rows.append(vector / (np.linalg.norm(vector) or 1.0))
+        vectors.append(np.stack(rows))
+    return vectors
+
+
+def encode_vocabulary(model: Any, words: Sequence[str], batch_size: int = 256, chunk_size: int = 4096) -> np.ndarray:
+    """Token-level vector of each word read inside VOCABULARY_TEMPLATE, in chunks to bound memory."""
+    offset = VOCABULARY_TEMPLATE.index("{word}")
+    vectors = []
+    for i in range(0, len(words), chunk_size):
+        chunk = list(words[i:i + chunk_size])
+        texts = [VOCABULARY_TEMPLATE.format(word=word) for word in chunk]
+        spans = [[(offset, offset + len(word))] for word in chunk]
+        vectors.extend(rows[0] for rows in span_embeddings(model, texts, spans, batch_size))
+    return np.stack(vectors)
+
+
+def build_word_embedding_index(
+    words: Sequence[str], encode: Callable[[Sequence[str]], np.ndarray], directory: Path
+) -> int:
+    """
+    Encodes `words` and atomically replaces `directory` with the index.
+    `encode` must return one L2-normalized row per word, normally through
+    `encode_vocabulary`. Returns the vocabulary size.
+    """
+    vocabulary = np.array(sorted(set(words)))
+    vectors = np.asarray(encode(list(vocabulary)), dtype=np.float16)
+    if vectors.shape[0] != len(vocabulary):
+        raise ValueError(f"Expected {len(vocabulary)} vectors, got {vectors.shape[0]}")
+
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}.")
+    try:
+        np.save(Path(tmp_dir) / "words.npy", vocabulary)
+        np.save(Path(tmp_dir) / "vectors.npy", vectors)
+        (Path(tmp_dir) / "meta.json").write_text(json.dumps({"format": INDEX_FORMAT_VERSION}))
+        os.chmod(tmp_dir, 0o755)
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(tmp_dir, directory)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return len(vocabulary)
+
+
+class WordEmbeddingIndex:
+    """Read-only, memory-mapped view of a built index, opened on first use."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._words: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            with self._lock:
+                if self._available is None:
+                    try:
+                        meta = json.loads((self.directory / "meta.json").read_text())
+                        if meta.get("format") != INDEX_FORMAT_VERSION:
+                            raise ValueError(f"built in format {meta.get('format')}, expected {INDEX_FORMAT_VERSION}")
+                        self._words = np.load(self.directory / "words.npy", mmap_mode="r")
+                        self._vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+                        self._available = len(self._words) == len(self._vectors) > 0
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Word embedding index {self.directory} unavailable ({e}); "
+                                       f"build it with python -m app.utils.word_embedding_index")
+                        self._available = False
+        return self._available
+
+    def rows(self, words: Sequence[str]) -> np.ndarray:
+        """Row index of each word, -1 for words outside the vocabulary."""
+        if not self.available or not len(words):
+            return np.full(len(words), -1, dtype=np.int64)
+        query = np.asarray(words, dtype=self._words.dtype)
+        idx = np.minimum(np.searchsorted(self._words, query), len(self._words) - 1)
+        return np.where(self._words[idx] == query, idx, -1)
+
+    def similarities(self, words: Sequence[str], contexts: np.ndarray) -> np.ndarray:
+        """
+        Dot product of each word's vector with the matching row of `contexts`
+        (normalized, so cosine similarity). Unknown words score -inf.
+        """
+        rows = self.rows(words)
+        scores = np.full(len(words), -np.inf, dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            vectors = self._vectors[rows[known]].astype(np.float32)
+            scores[known] = np.einsum("ij,ij->i", vectors, np.asarray(contexts, dtype=np.float32)[known])
+        return scores
+
+
+if __name__ == "__main__":
+    import time
+
+    from app.core.config import settings, SENTENCE_TRANSFORMER_MODEL_ID
+    from app.core.logging import configure_logging
+    from app.services.base import load_sentence_transformer_model
+    from app.utils.synonym_index import SynonymIndex
+
+    configure_logging()
+    synonym_index = SynonymIndex(Path(settings.SYNONYM_INDEX_PATH))
+    if not synonym_index.available:
+        raise SystemExit("Build the synonym index first: python -m app.utils.synonym_index")
+    model = load_sentence_transformer_model(SENTENCE_TRANSFORMER_MODEL_ID)
+    directory = index_dir_for(Path(settings.WORD_EMBEDDING_INDEX_DIR), SENTENCE_TRANSFORMER_MODEL_ID)
+    start_time = time.time()
+    size = build_word_embedding_index(
+        synonym_index.vocabulary(),
+        lambda words: encode_vocabulary(model, words),
+        directory
+    )
+    print(f"Word embedding index: {size} words in {time.time() - start_time:.1f}s -> {directory}")
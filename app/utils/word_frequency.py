@@ -0,0 +1,159 @@
+# === app/utils/word_frequency.py ===
+"""
+Corpus word-frequency table, stored as a memory-mapped NumPy file.
+
+Counting the Brown corpus (~1.16M tokens) on every worker start is replaced by
+a table built once: row 0 holds the sorted 64-bit hashes of the distinct words,
+row 1 their counts. Lookups hash the word and binary-search row 0, so loading
+is an mmap and nothing is counted at import time.
+
+Build ahead of time (e.g. in the Docker image) with:
+    python -m app.utils.word_frequency
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("word_frequency")
+
+
+def word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build_frequency_table(words: Iterable[str]) -> np.ndarray:
+    """Counts `words` (case-sensitive, as given) into a (2, n) uint64 table sorted by hash."""
+    counts = Counter(words)
+    table = np.empty((2, len(counts)), dtype=np.uint64)
+    table[0] = np.fromiter((word_hash(w) for w in counts), dtype=np.uint64, count=len(counts))
+    table[1] = np.fromiter(counts.values(), dtype=np.uint64, count=len(counts))
+    return table[:, np.argsort(table[0], kind="stable")]
+
+
+def write_frequency_table(table: np.ndarray, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written to a temporary file and renamed, so concurrent workers never map a partial table
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, table)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def read_frequency_table(path: Path) -> Optional[np.ndarray]:
+    try:
+        table = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if table.ndim != 2 or table.shape[0] != 2 or table.dtype != np.uint64:
+        logger.warning(f"Ignoring word frequency table {path} in an unexpected format")
+        return None
+    return table
+
+
+class WordFrequencyTable:
+    """
+    Word counts from a corpus, loaded on first lookup. The table is read from
+    `path` or, failing that, counted from `corpus_words()` and saved there. If
+    the corpus can't be loaded either, every word counts as unseen.
+    """
+
+    def __init__(self, path: Path, corpus_words: Callable[[], Iterable[str]]):
+        self.path = Path(path)
+        self._corpus_words = corpus_words
+        self._lock = threading.Lock()
+        self._hashes: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self.total = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._hashes is not None
+
+    def load(self) -> None:
+        """Maps the saved table, or counts the corpus if there is none. Blocking; may take seconds."""
+        with self._lock:
+            if self._hashes is not None:
+                return
+            table = read_frequency_table(self.path)
+            if table is None:
+                try:
+                    table = build_frequency_table(self._corpus_words())
+                except Exception as e:
+                    logger.warning(f"Word frequencies unavailable, treating all words as unseen: {e}")
+                    table = np.empty((2, 0), dtype=np.uint64)
+                else:
+                    try:
+                        write_frequency_table(table, self.path)
+                        logger.info(f"Saved word frequency table ({table.shape[1]} words) to {self.path}")
+                    except OSError as e:
+                        logger.warning(f"Could not save word frequency table to {self.path}: {e}")
+            self._counts = table[1]
+            self.total = int(table[1].sum())
+            self._hashes = table[0]
+
+    def counts(self, words: Sequence[str]) -> np.ndarray:
+        """Occurrences of each word in the corpus, 0 for unseen words."""
+        if self._hashes is None:
+            self.load()
+        if not len(self._hashes):
+            return np.zeros(len(words), dtype=np.uint64)
+        keys = np.fromiter((word_hash(w) for w in words), dtype=np.uint64, count=len(words))
+        idx = np.minimum(np.searchsorted(self._hashes, keys), len(self._hashes) - 1)
+        return np.where(self._hashes[idx] == keys, self._counts[idx], 0)
+
+    def count(self, word: str) -> int:
+        return int(self.counts([word])[0])
+
+    def frequency(self, word: str) -> float:
+        """Share of corpus tokens that are `word`."""
+        count = self.count(word)
+        return count / self.total if self.total else 0.0
+
+
+def _brown_words() -> Iterable[str]:
+    from nltk.corpus import brown
+    from app.services.base import ensure_nltk_resource
+
+    ensure_nltk_resource("brown")
+    return brown.words()
+
+
+_brown_frequencies: Optional[WordFrequencyTable] = None
+
+
+def brown_frequencies() -> WordFrequencyTable:
+    """Shared Brown corpus frequency table."""
+    global _brown_frequencies
+    if _brown_frequencies is None:
+        from app.core.config import settings
+        _brown_frequencies = WordFrequencyTable(Path(settings.WORD_FREQUENCY_PATH), _brown_words)
+    return _brown_frequencies
+
+
+if __name__ == "__main__":
+    import time
+
+    from app.core.logging import configure_logging
+
+    configure_logging()
+    start_time = time.time()
+    table = brown_frequencies()
+    table.load()
+    if not table.total:
+        # An empty table would silently treat every word as rare; fail the build instead
+        raise SystemExit("Word frequency table is empty; install the corpus with: python -m nltk.downloader brown")
+    print(f"Word frequency table: {len(table._hashes)} words, {table.total} tokens "
+          f"in {time.time() - start_time:.1f}s -> {table.path}")